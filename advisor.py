@@ -0,0 +1,332 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import lru_cache
+
+import groq
+import httpx
+
+import chat_store
+from answer_length import estimate_tokens
+from cassette import CassetteTransport
+from crs_catalog import answer_crs_question, crs_context
+from gis_tools import GIS_TOOLS, TOOL_PROMPT, run_tool
+from history_search import index_turn
+
+# System prompt for GIS expertise
+SYSTEM_PROMPT = """You are GeoAdvisor, an expert AI assistant specializing in Geographic Information Systems (GIS), geospatial analysis, and spatial data science. Your expertise includes:
+
+- GIS software (ArcGIS, QGIS, GeoDa, etc.)
+- Spatial analysis techniques
+- Remote sensing and satellite imagery
+- Coordinate systems and projections
+- Geodatabases and spatial databases
+- Cartography and map design
+- Python libraries (GeoPandas, Shapely, Rasterio, Folium, etc.)
+- Geospatial data formats (Shapefiles, GeoJSON, KML, etc.)
+- GPS and location-based services
+- Spatial statistics and geostatistics
+
+Provide clear, accurate, and helpful responses. When explaining technical concepts, break them down into understandable terms. If providing code examples, use Python with common GIS libraries."""
+
+AVAILABLE_MODELS = [
+    "llama-3.3-70b-versatile",
+    "llama-3.1-70b-versatile",
+    "llama-3.1-8b-instant",
+    "mixtral-8x7b-32768",
+    "gemma2-9b-it"
+]
+
+DEFAULT_MODEL = AVAILABLE_MODELS[0]
+
+# Point GEOADVISOR_CASSETTE at a file to record (GEOADVISOR_CASSETTE_MODE=record)
+# or replay Groq traffic offline, scaling recorded timing by GEOADVISOR_CASSETTE_SPEED
+CASSETTE_PATH = os.environ.get("GEOADVISOR_CASSETTE")
+CASSETTE_MODE = os.environ.get("GEOADVISOR_CASSETTE_MODE", "replay")
+CASSETTE_SPEED = float(os.environ.get("GEOADVISOR_CASSETTE_SPEED", 1.0))
+
+# Earlier turns sent with a question: the most recent ones, up to this many
+# and about this many tokens. Frontends may show far more of the thread.
+PROMPT_HISTORY_TURNS = 20
+PROMPT_HISTORY_TOKENS = 6000
+
+# Maximum number of local tool-call rounds per question
+MAX_TOOL_ROUNDS = 3
+
+# Follow-up requests allowed for an answer cut off at max_tokens
+MAX_CONTINUATIONS = 2
+CONTINUE_PROMPT = "Your answer was cut off. Continue exactly where it stopped, without repeating anything."
+
+# Small, fast model that writes the suggested follow-up questions
+FOLLOWUP_MODEL = "llama-3.1-8b-instant"
+FOLLOWUP_PROMPT = """Suggest the {count} questions this user is most likely to ask next about the GIS topic below.
+Reply with the questions only, one per line, each under 100 characters, with no numbering.
+
+Question: {question}
+
+Answer: {answer}"""
+
+
+@lru_cache(maxsize=None)
+def _cassette_transport():
+    return CassetteTransport(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_SPEED)
+
+
+def _limiter_hook(limiter, async_client):
+    # httpx calls this before sending each request, tool rounds and continuations included
+    if not async_client:
+        return lambda request: limiter.acquire()
+
+    async def acquire(request):
+        while wait := limiter.try_acquire():
+            await asyncio.sleep(wait)
+    return acquire
+
+
+def make_client(api_key=None, async_client=False, limiter=None, **kwargs):
+    """Groq client, routed through the cassette transport when GEOADVISOR_CASSETTE is set
+
+    With a RateLimiter, every HTTP request the client sends first takes a token.
+    """
+    http_kwargs = {}
+    if CASSETTE_PATH:
+        http_kwargs["transport"] = _cassette_transport()
+        # Replays never reach the API, so no real key is needed
+        api_key = api_key or "replay"
+    if limiter is not None:
+        http_kwargs["event_hooks"] = {"request": [_limiter_hook(limiter, async_client)]}
+    if http_kwargs:
+        http_client_class = httpx.AsyncClient if async_client else httpx.Client
+        kwargs["http_client"] = http_client_class(timeout=60, **http_kwargs)
+    return (groq.AsyncGroq if async_client else groq.Groq)(api_key=api_key, **kwargs)
+
+
+def build_context(message, attachments=()):
+    """Extra system context: catalog entries for any EPSG codes mentioned, plus attachment summaries"""
+    return "\n\n".join(filter(None, [crs_context(message), *attachments]))
+
+
+def prompt_history(history, max_turns=PROMPT_HISTORY_TURNS, max_tokens=PROMPT_HISTORY_TOKENS):
+    """The most recent turns of history within the prompt's turn and token budget, oldest first"""
+    kept = []
+    budget = max_tokens
+    for turn in reversed(list(history)[-max_turns:]):
+        budget -= estimate_tokens(turn["user"]) + estimate_tokens(turn["assistant"])
+        if budget < 0:
+            break
+        kept.append(turn)
+    kept.reverse()
+    return kept
+
+
+def build_messages(message, history=(), context=""):
+    """Build the prompt from the system prompt, recent earlier turns and new message"""
+    system_prompt = SYSTEM_PROMPT + "\n\n" + TOOL_PROMPT
+    if context:
+        system_prompt += "\n\n" + context
+
+    messages = [{"role": "system", "content": system_prompt}]
+
+    for chat_msg in prompt_history(history):
+        messages.append({"role": "user", "content": chat_msg["user"]})
+        messages.append({"role": "assistant", "content": chat_msg["assistant"]})
+
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+def _continue_answer(client, model_name, messages, temperature, response, max_total_tokens):
+    # Ask for the rest of an answer cut off at max_tokens while the total
+    # budget lasts; returns (content, total_tokens of the follow-ups)
+    content = response.choices[0].message.content or ""
+    produced = response.usage.completion_tokens if response.usage else 0
+    total_tokens = 0
+    for _ in range(MAX_CONTINUATIONS):
+        if response.choices[0].finish_reason != "length" or produced >= max_total_tokens:
+            break
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=messages + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": CONTINUE_PROMPT},
+            ],
+            temperature=temperature,
+            max_tokens=max_total_tokens - produced,
+        )
+        if response.usage:
+            total_tokens += response.usage.total_tokens
+            produced += response.usage.completion_tokens
+        content += response.choices[0].message.content or ""
+    return content, total_tokens
+
+
+def request_completion(client, model_name, messages, temperature, max_tokens, max_total_tokens=None):
+    """Run a completion, executing any GIS tool calls locally; returns (content, total_tokens)"""
+    # With max_total_tokens, answers cut off at max_tokens are continued up to that budget
+    max_total_tokens = max(max_total_tokens or max_tokens, max_tokens)
+    total_tokens = 0
+    # Let the model delegate exact GIS computations to local tools
+    for _ in range(MAX_TOOL_ROUNDS):
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            tools=GIS_TOOLS,
+            tool_choice="auto",
+        )
+        total_tokens += response.usage.total_tokens if response.usage else 0
+        reply = response.choices[0].message
+        if not reply.tool_calls:
+            content, extra_tokens = _continue_answer(
+                client, model_name, messages, temperature, response, max_total_tokens
+            )
+            return content, total_tokens + extra_tokens
+        messages.append({
+            "role": "assistant",
+            "content": reply.content or "",
+            "tool_calls": [
+                {
+                    "id": call.id,
+                    "type": "function",
+                    "function": {"name": call.function.name, "arguments": call.function.arguments},
+                }
+                for call in reply.tool_calls
+            ],
+        })
+        for call in reply.tool_calls:
+            messages.append({
+                "role": "tool",
+                "tool_call_id": call.id,
+                "content": run_tool(call.function.name, call.function.arguments),
+            })
+
+    # Tool budget exhausted, ask for a plain answer from the results so far
+    response = client.chat.completions.create(
+        model=model_name,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+    total_tokens += response.usage.total_tokens if response.usage else 0
+    content, extra_tokens = _continue_answer(client, model_name, messages, temperature, response, max_total_tokens)
+    return content, total_tokens + extra_tokens
+
+
+def stream_completion(client, model_name, messages, temperature, max_tokens):
+    """Stream a completion without tools as (text, total_tokens) pairs; total_tokens is only set once known"""
+    stream = client.chat.completions.create(
+        model=model_name,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True,
+    )
+    for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        # Groq reports usage on the final chunk of a stream
+        usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+        yield delta or "", usage.total_tokens if usage else None
+
+
+def answer_question(client, message, model_name=DEFAULT_MODEL, temperature=0.7, max_tokens=2048,
+                    history=(), attachments=(), predictor=None):
+    """Answer one question the way the chat does; returns (answer, total_tokens)"""
+    # Plain EPSG lookups are answered from the local catalog without an LLM round trip
+    local_answer = answer_crs_question(message)
+    if local_answer is not None:
+        return local_answer, 0
+    messages = build_messages(message, history, build_context(message, attachments))
+    if predictor is None:
+        return request_completion(client, model_name, messages, temperature, max_tokens)
+    # Reserve only the predicted length; max_tokens stays the budget including continuations
+    answer, tokens_used = request_completion(
+        client, model_name, messages, temperature, predictor.predict(message, max_tokens), max_tokens
+    )
+    predictor.record(message, answer)
+    return answer, tokens_used
+
+
+def suggest_followups(client, message, answer, count=3):
+    """Likely next questions after an answer, at most count of them"""
+    response = client.chat.completions.create(
+        model=FOLLOWUP_MODEL,
+        messages=[{"role": "user", "content": FOLLOWUP_PROMPT.format(
+            count=count, question=message, answer=answer[:2000]
+        )}],
+        temperature=0.3,
+        max_tokens=60 * count,
+    )
+    lines = (response.choices[0].message.content or "").splitlines()
+    # Models number or bullet their lists even when told not to
+    questions = [line.strip().lstrip("-*•0123456789.) ").strip() for line in lines]
+    return [question for question in questions if question.endswith("?")][:count]
+
+
+def new_thread_id():
+    """Random id for a new conversation thread"""
+    return uuid.uuid4().hex[:12]
+
+
+def make_thread_title(message, max_length=48):
+    """Derive a conversation title from its first question"""
+    title = message.strip().splitlines()[0] if message.strip() else "New conversation"
+    return title if len(title) <= max_length else title[:max_length - 1].rstrip() + "…"
+
+
+def persist_turn(store, username, thread_id, message, answer, tokens_used):
+    """Store a turn, index it for search and update the thread index; returns (turn, position, user_record)"""
+    turn = {
+        "user": message,
+        "assistant": answer,
+        "timestamp": datetime.now().isoformat()
+    }
+    # The thread file assigns the position, even if another replica appended concurrently
+    position = chat_store.append_turn(username, thread_id, turn)
+    index_turn(username, (thread_id, position), turn)
+
+    def record_turn(data):
+        user_record = data[username]
+        thread = user_record["threads"].setdefault(
+            thread_id, {"title": make_thread_title(message), "updated_at": "", "turns": 0, "tokens": 0}
+        )
+        thread["turns"] = max(thread["turns"], position + 1)
+        thread["tokens"] += tokens_used
+        thread["updated_at"] = max(thread["updated_at"], turn["timestamp"])
+        user_record["chat_count"] = user_record.get("chat_count", 0) + 1
+        return user_record
+
+    return turn, position, store.update(record_turn)
+
+
+class RateLimiter:
+    """Token bucket shared by threads: rate requests per period seconds, bursting up to burst"""
+
+    def __init__(self, rate, period=60.0, burst=None):
+        self.interval = period / rate
+        self.capacity = float(burst or 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token if one is available; otherwise return the seconds until one is"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) * self.interval
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
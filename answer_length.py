@@ -0,0 +1,85 @@
+import re
+
+from latency_stats import Histogram, SharedStatsFile
+
+DEFAULT_LENGTH_STATS_FILE = "answer_lengths.json"
+
+# Question categories, checked in order; the first matching pattern wins
+CATEGORIES = [
+    ("code", re.compile(
+        r"\b(code|script|snippet|function|python|sql|arcpy|pyqgis|geopandas|shapely|gdal|ogr2ogr|"
+        r"rasterio|postgis query|write a|implement)\b", re.I)),
+    ("howto", re.compile(r"\b(how (do|to|can|should)|steps?|guide|tutorial|workflow|set up|install)\b", re.I)),
+    ("compare", re.compile(r"\b(difference|differences|compare|comparison|versus|vs\.?|better|pros and cons)\b", re.I)),
+    ("definition", re.compile(r"^\s*(what('s| is| are)|define|meaning of|explain what)\b", re.I)),
+]
+
+# Completion budgets used until a category has MIN_SAMPLES observed answers
+DEFAULT_BUDGETS = {"code": 1536, "howto": 1024, "compare": 768, "definition": 512, "general": 768}
+MIN_SAMPLES = 10
+
+# The budget covers this percentile of past answer lengths, plus headroom;
+# answers that still run over are continued rather than cut off
+LENGTH_PERCENTILE = 90
+HEADROOM = 1.25
+MIN_BUDGET = 256
+BUDGET_STEP = 64
+
+
+def classify_question(message):
+    """Coarse question type that predicts answer length"""
+    for category, pattern in CATEGORIES:
+        if pattern.search(message):
+            return category
+    return "general"
+
+
+def estimate_tokens(text):
+    """Rough token count of generated text, about four characters per token"""
+    return len(text or "") // 4 + 1
+
+
+class LengthPredictor(SharedStatsFile):
+    """Picks max_tokens per question from the lengths of past answers to similar questions
+
+    Past lengths are kept as one histogram per question category in a JSON
+    file shared by processes (see SharedStatsFile), so they pool their samples.
+    The prediction never exceeds the caller's ceiling, which stays the
+    total budget for an answer and its continuations.
+    """
+
+    def __init__(self, path=DEFAULT_LENGTH_STATS_FILE):
+        super().__init__(path)
+        self.stats = {"requests": 0, "reserved": 0, "ceiling": 0}
+
+    def _merge(self, target, source):
+        for category, counts in source.items():
+            target[category] = Histogram(target.get(category)).merge(counts).to_dict()
+
+    def predict(self, message, ceiling):
+        """Completion budget for a question, between MIN_BUDGET and ceiling"""
+        category = classify_question(message)
+        with self._lock:
+            lengths = Histogram(self._saved.get(category)).merge(Histogram(self._pending.get(category)))
+        if lengths.total >= MIN_SAMPLES:
+            budget = lengths.percentile(LENGTH_PERCENTILE) * HEADROOM
+        else:
+            budget = DEFAULT_BUDGETS[category]
+        budget = -(-int(budget) // BUDGET_STEP) * BUDGET_STEP
+        budget = min(ceiling, max(MIN_BUDGET, budget))
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["reserved"] += budget
+            self.stats["ceiling"] += ceiling
+        return budget
+
+    def record(self, message, answer):
+        """Add the length of a finished answer to its question's category"""
+        category = classify_question(message)
+        with self._lock:
+            lengths = Histogram(self._pending.get(category))
+            lengths.record(estimate_tokens(answer))
+            self._pending[category] = lengths.to_dict()
+            due = self._flush_due()
+        if due:
+            self.flush()
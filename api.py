@@ -0,0 +1,266 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+import groq
+from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from pydantic import BaseModel, Field, field_validator
+from starlette.concurrency import run_in_threadpool
+
+import chat_store
+from advisor import (
+    AVAILABLE_MODELS, DEFAULT_MODEL, PROMPT_HISTORY_TURNS, RateLimiter, answer_question, build_context,
+    build_messages, make_client, new_thread_id, persist_turn
+)
+from answer_length import DEFAULT_LENGTH_STATS_FILE, LengthPredictor
+from crs_catalog import answer_crs_question
+from event_log import log_event, setup_event_logging
+from history_search import search_history
+from passwords import check_login
+from user_store import DEFAULT_USER_DATA_FILE, UserStore
+from usage_rollups import RollupHandler, UsageRollups
+from warmup import Warmup
+
+USER_DATA_FILE = os.environ.get("GEOADVISOR_USER_DATA", DEFAULT_USER_DATA_FILE)
+
+# Chat requests allowed per user per minute, with bursts up to API_BURST
+API_RATE_PER_MINUTE = float(os.environ.get("GEOADVISOR_API_RPM", 30))
+API_BURST = 5
+
+store = UserStore(USER_DATA_FILE)
+predictor = LengthPredictor(DEFAULT_LENGTH_STATS_FILE)
+
+
+@lru_cache(maxsize=None)
+def sync_client():
+    # Reads GROQ_API_KEY from the environment
+    return make_client()
+
+
+@lru_cache(maxsize=None)
+def async_client():
+    return make_client(async_client=True)
+
+
+warmup = Warmup(store, client_factory=sync_client)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    setup_event_logging(extra_handlers=[RollupHandler(UsageRollups())])
+    # Serve /health and /ready at once; /ready turns 200 when warm-up finishes
+    warmup.start()
+    yield
+
+
+app = FastAPI(title="GeoAdvisor API", description="GeoAdvisor chat and history without the Streamlit UI",
+              lifespan=lifespan)
+security = HTTPBasic()
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class ChatRequest(BaseModel):
+    message: str = Field(min_length=1)
+    thread_id: str | None = None
+    model: str = DEFAULT_MODEL
+    temperature: float = Field(0.7, ge=0.0, le=2.0)
+    max_tokens: int = Field(2048, ge=1, le=8192)
+    stream: bool = False
+
+    @field_validator("model")
+    @classmethod
+    def known_model(cls, model):
+        if model not in AVAILABLE_MODELS:
+            raise ValueError(f"unknown model; choose one of {', '.join(AVAILABLE_MODELS)}")
+        return model
+
+
+def authenticate(credentials: HTTPBasicCredentials = Depends(security)):
+    """Resolve HTTP Basic credentials to a GeoAdvisor username"""
+    # Recently verified credentials skip the hash, so per-request auth stays cheap
+    if not check_login(store, credentials.username, credentials.password):
+        log_event("login", level=logging.WARNING, username=credentials.username, outcome="rejected", frontend="api")
+        raise HTTPException(401, "Invalid username or password", headers={"WWW-Authenticate": "Basic"})
+    return credentials.username
+
+
+def _user_threads(username):
+    record = store.snapshot().get(username)
+    if record is None:
+        # Deleted after its credentials were checked
+        raise HTTPException(401, "Unknown user", headers={"WWW-Authenticate": "Basic"})
+    return record.get("threads", {})
+
+
+def _check_rate(username):
+    with _limiters_lock:
+        limiter = _limiters.get(username)
+        if limiter is None:
+            limiter = _limiters[username] = RateLimiter(API_RATE_PER_MINUTE, burst=API_BURST)
+    wait = limiter.try_acquire()
+    if wait:
+        log_event("rate_limited", level=logging.WARNING, username=username, retry_after=round(wait, 3))
+        raise HTTPException(429, "Rate limit exceeded", headers={"Retry-After": str(math.ceil(wait))})
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """200 once this process has warmed up, 503 until then; route traffic only when ready"""
+    return JSONResponse(warmup.report(), status_code=200 if warmup.ready else 503)
+
+
+@app.get("/threads")
+def list_threads(username: str = Depends(authenticate)):
+    """Conversation threads of the user, most recently updated first"""
+    threads = _user_threads(username)
+    ordered = sorted(threads.items(), key=lambda item: item[1]["updated_at"], reverse=True)
+    return [{"thread_id": thread_id, **thread} for thread_id, thread in ordered]
+
+
+@app.get("/threads/{thread_id}/turns")
+def thread_turns(thread_id: str, before: int | None = Query(None, ge=0), limit: int = Query(20, ge=1, le=200),
+                 username: str = Depends(authenticate)):
+    """A page of turns ending before the cursor; pass the returned cursor to page backwards"""
+    if thread_id not in _user_threads(username):
+        raise HTTPException(404, "Conversation not found")
+    turns, cursor = chat_store.load_page(username, thread_id, before=before, limit=limit)
+    return {"thread_id": thread_id, "cursor": cursor, "turns": turns}
+
+
+@app.get("/search")
+def search(q: str = Query(min_length=1), limit: int = Query(5, ge=1, le=50), username: str = Depends(authenticate)):
+    """BM25 search over all of the user's turns"""
+    threads = _user_threads(username)
+
+    def user_turns():
+        for thread_id in list(threads):
+            for position, turn in enumerate(chat_store.iter_turns(username, thread_id)):
+                yield (thread_id, position), turn
+    results = []
+    hits = search_history(username, q, user_turns(), limit=limit,
+                          thread_turns={thread_id: thread["turns"] for thread_id, thread in threads.items()})
+    for (thread_id, position), score in hits:
+        turn = chat_store.load_turns(username, thread_id, position, position + 1)[0]
+        results.append({"thread_id": thread_id, "position": position, "score": round(score, 4), **turn})
+    return results
+
+
+def _log_response(username, thread_id, request, source, answer, tokens_used, started):
+    log_event("chat_response", username=username, thread_id=thread_id, model=request.model, source=source,
+              stream=request.stream, tokens=tokens_used, chars=len(answer),
+              ms=round((time.perf_counter() - started) * 1000, 1), frontend="api")
+
+
+def _log_error(username, request, error):
+    log_event("chat_error", level=logging.ERROR, username=username, model=request.model, stream=request.stream,
+              error_type=type(error).__name__, error=str(error), frontend="api")
+
+
+async def _stream_answer(username, thread_id, request, history, started):
+    # Plain EPSG lookups are answered locally, as in the chat
+    answer = answer_crs_question(request.message)
+    tokens_used = 0
+    source = "crs_catalog" if answer is not None else "model"
+    if answer is not None:
+        yield _sse("delta", {"content": answer})
+    else:
+        messages = build_messages(request.message, history, build_context(request.message))
+        parts = []
+        try:
+            stream = await async_client().chat.completions.create(
+                model=request.model,
+                messages=messages,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                stream=True,
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield _sse("delta", {"content": delta})
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if usage:
+                    tokens_used = usage.total_tokens
+        except groq.GroqError as e:
+            _log_error(username, request, e)
+            yield _sse("error", {"detail": str(e)})
+            return
+        answer = "".join(parts)
+    turn, position, _ = await run_in_threadpool(
+        persist_turn, store, username, thread_id, request.message, answer, tokens_used
+    )
+    _log_response(username, thread_id, request, source, answer, tokens_used, started)
+    yield _sse("done", {"thread_id": thread_id, "position": position, "tokens": tokens_used,
+                        "timestamp": turn["timestamp"]})
+
+
+@app.post("/chat")
+async def chat(request: ChatRequest, username: str = Depends(authenticate)):
+    """Answer a question in a new or existing thread; with stream=true the answer arrives as SSE"""
+    _check_rate(username)
+    started = time.perf_counter()
+    log_event("chat_request", username=username, thread_id=request.thread_id, model=request.model,
+              chars=len(request.message), max_tokens=request.max_tokens, stream=request.stream, frontend="api")
+    # Re-reads the user database after every stored turn; keep it off the event loop
+    threads = await run_in_threadpool(_user_threads, username)
+    if request.thread_id is None:
+        thread_id, history = new_thread_id(), []
+    elif request.thread_id in threads:
+        thread_id = request.thread_id
+        history, _ = await run_in_threadpool(
+            chat_store.load_page, username, thread_id, None, PROMPT_HISTORY_TURNS
+        )
+    else:
+        raise HTTPException(404, "Conversation not found")
+
+    if request.stream:
+        # Tool calls need the full reply before continuing, so streamed answers go without them
+        return StreamingResponse(
+            _stream_answer(username, thread_id, request, history, started),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    try:
+        answer, tokens_used = await run_in_threadpool(
+            answer_question, sync_client(), request.message, request.model, request.temperature,
+            request.max_tokens, history, predictor=predictor
+        )
+    except groq.APIStatusError as e:
+        _log_error(username, request, e)
+        raise HTTPException(502, f"Model provider error: {e}")
+    except groq.APIConnectionError as e:
+        _log_error(username, request, e)
+        raise HTTPException(503, f"Model provider unreachable: {e}")
+    turn, position, _ = await run_in_threadpool(
+        persist_turn, store, username, thread_id, request.message, answer, tokens_used
+    )
+    source = "crs_catalog" if answer_crs_question(request.message) is not None else "model"
+    _log_response(username, thread_id, request, source, answer, tokens_used, started)
+    return {"thread_id": thread_id, "position": position, "answer": answer, "tokens": tokens_used,
+            "timestamp": turn["timestamp"]}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api:app", host=os.environ.get("HOST", "127.0.0.1"), port=int(os.environ.get("PORT", 8000)))
@@ -1,38 +1,150 @@
 import streamlit as st
-from groq import Groq
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from datetime import datetime
-import json
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import os
+import queue
+import time
+import chat_store
+from advisor import (
+    AVAILABLE_MODELS, answer_question, build_context, build_messages, make_client, make_thread_title,
+    new_thread_id, persist_turn, request_completion, suggest_followups
+)
+from crs_catalog import answer_crs_question, format_crs, get_crs, search_crs
+from geojson_summary import summarize_geojson, format_geojson_summary
+from point_csv import summarize_points, format_point_summary
+from history_search import search_history
+from export_history import EXPORT_FORMATS, export_bytes
+from latency_stats import ModelStats
+from answer_length import DEFAULT_LENGTH_STATS_FILE, LengthPredictor
+from prefetch import Prefetcher
+from warmup import Warmup
+from event_log import log_event, setup_event_logging
+from usage_rollups import RollupHandler, UsageRollups
+from passwords import check_login, hash_password_pooled
+from profiling import hot_frames, profile_file, profiled, slowest_reruns, start_rerun_profile
+from session_manager import SessionManager
+from user_store import UserStore
 
-# System prompt for GIS expertise
-SYSTEM_PROMPT = """You are GeoAdvisor, an expert AI assistant specializing in Geographic Information Systems (GIS), geospatial analysis, and spatial data science. Your expertise includes:
-
-- GIS software (ArcGIS, QGIS, GeoDa, etc.)
-- Spatial analysis techniques
-- Remote sensing and satellite imagery
-- Coordinate systems and projections
-- Geodatabases and spatial databases
-- Cartography and map design
-- Python libraries (GeoPandas, Shapely, Rasterio, Folium, etc.)
-- Geospatial data formats (Shapefiles, GeoJSON, KML, etc.)
-- GPS and location-based services
-- Spatial statistics and geostatistics
-
-Provide clear, accurate, and helpful responses. When explaining technical concepts, break them down into understandable terms. If providing code examples, use Python with common GIS libraries."""
+# Opt-in profiling of this rerun, from here until main() returns; enabled by
+# GEOADVISOR_PROFILE or ?profile=<GEOADVISOR_PROFILE_TOKEN> (see profiling.py).
+# Started this early to cover CSS injection and session setup; if that code
+# raises, the session's next rerun closes this profile out as abandoned
+_profile_ctx = get_script_run_ctx()
+rerun_profile = start_rerun_profile(
+    st.query_params.get("profile"), st.query_params.get("profiler"), root_file=__file__,
+    session_id=_profile_ctx.session_id if _profile_ctx else None
+)
 
 # File to store user data
 USER_DATA_FILE = "user_data.json"
 
+# Number of stored turns loaded per history page
+HISTORY_PAGE_SIZE = 20
+
+# Turns of the active thread kept in the session; the thread file is the only
+# full copy and anything older is re-read from it on demand
+SESSION_WINDOW_TURNS = 60
+
+# Conversations listed directly in the sidebar before the "older" expander
+RECENT_THREADS_SHOWN = 8
+
+# Models preselected for side-by-side comparison, and the most shown at once
+COMPARE_DEFAULT_MODELS = ["llama-3.3-70b-versatile", "mixtral-8x7b-32768", "gemma2-9b-it"]
+MAX_COMPARE_MODELS = 4
+
+# Per-model latency histograms, shared by every process serving the app
+MODEL_STATS_FILE = "model_stats.json"
+
+# Set GEOADVISOR_FASTEST_DEFAULT=1 to preselect the fastest healthy model
+FASTEST_MODEL_DEFAULT = os.environ.get("GEOADVISOR_FASTEST_DEFAULT") == "1"
+
+# Comma-separated usernames allowed to open the usage analytics page
+ADMIN_USERS = {name.strip() for name in os.environ.get("GEOADVISOR_ADMINS", "").split(",") if name.strip()}
+
+@st.cache_resource
+def get_usage_rollups():
+    """Process-wide handle on the usage summary tables"""
+    return UsageRollups()
+
+# Structured events go to a rotating JSONL file from a background writer,
+# which also keeps the usage rollups current
+setup_event_logging(extra_handlers=[RollupHandler(get_usage_rollups())])
+
+@st.cache_resource
+def get_user_store():
+    """Process-wide store so concurrent sessions share group commits"""
+    return UserStore(USER_DATA_FILE)
+
+def wake_session(session_id):
+    """Rerun another session, so it can offload its own state at the end of the run"""
+    try:
+        info = Runtime.instance()._session_mgr.get_active_session_info(session_id)
+    except Exception:
+        return
+    # Sessions without a browser connection are not rerun; Streamlit drops them itself
+    if info is not None:
+        info.session.request_rerun(None)
+
+@st.cache_resource
+def get_session_manager():
+    """Process-wide tracker of session memory and idle offloading"""
+    # Chat windows and attachments are spooled to disk; the user database is
+    # simply dropped and reloaded from USER_DATA_FILE by the block below
+    return SessionManager(
+        spooled_keys=("chat_history", "attachments", "processed_uploads", "comparison", "followups"),
+        dropped_keys=("user_database",),
+        wake=wake_session
+    )
+
+@st.cache_resource
+def get_model_stats():
+    """Process-wide latency and throughput histograms per model"""
+    return ModelStats(MODEL_STATS_FILE)
+
+@st.cache_resource
+def get_length_predictor():
+    """Process-wide predictor of answer lengths, which sets each request's max_tokens"""
+    return LengthPredictor(DEFAULT_LENGTH_STATS_FILE)
+
+@st.cache_resource
+def get_prefetcher():
+    """Process-wide background answerer of suggested follow-up questions"""
+    return Prefetcher()
+
+@st.cache_resource
+def get_client(api_key):
+    """Process-wide Groq client, so requests reuse pooled connections"""
+    return make_client(api_key)
+
+@st.cache_resource
+def get_warmup():
+    """Cold-start work, run once per process in the background from the first session"""
+    # Read like get_api_key, but without stopping the page: with no key the
+    # warm-up skips the model steps and the login page still renders
+    try:
+        api_key = st.secrets["GROQ_API_KEY"]
+    except Exception:
+        api_key = None
+    client_factory = (lambda: get_client(api_key)) if api_key else None
+    return Warmup(get_user_store(), client_factory=client_factory).start()
+
+get_warmup()
+
+# Restore this session's state if it was offloaded while idle; the manager
+# needs the session's own state object, not the thread-bound st.session_state
+run_ctx = get_script_run_ctx()
+if run_ctx is not None:
+    get_session_manager().touch(run_ctx.session_id, run_ctx.session_state)
+
 # Initialize session state
 if 'user_database' not in st.session_state:
     # Load user data from file if it exists
-    if os.path.exists(USER_DATA_FILE):
-        try:
-            with open(USER_DATA_FILE, 'r') as f:
-                st.session_state.user_database = json.load(f)
-        except:
-            st.session_state.user_database = {}
-    else:
+    try:
+        st.session_state.user_database = get_user_store().load()
+    except:
         st.session_state.user_database = {}
 
 if 'current_user' not in st.session_state:
@@ -41,22 +153,45 @@ if 'current_user' not in st.session_state:
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
+# Index in the stored thread of the oldest turn loaded into the session
+if 'history_cursor' not in st.session_state:
+    st.session_state.history_cursor = 0
+
+# Conversation thread shown in the session (None until its first message)
+if 'active_thread' not in st.session_state:
+    st.session_state.active_thread = None
+
 if 'page' not in st.session_state:
     st.session_state.page = 'auth'
 
 if 'show_typing' not in st.session_state:
     st.session_state.show_typing = False
 
+if 'attachments' not in st.session_state:
+    st.session_state.attachments = {}
+
+if 'processed_uploads' not in st.session_state:
+    st.session_state.processed_uploads = set()
+
+# Last side-by-side model comparison, kept until the next one
+if 'comparison' not in st.session_state:
+    st.session_state.comparison = None
+
+# Suggested next questions for the latest answer, prefetched in the background
+if 'followups' not in st.session_state:
+    st.session_state.followups = []
+
 # Function to save user data to file
-def save_user_data():
-    """Save user database to JSON file"""
-    try:
-        with open(USER_DATA_FILE, 'w') as f:
-            json.dump(st.session_state.user_database, f, indent=2)
-        return True
-    except Exception as e:
-        st.error(f"Error saving user data: {str(e)}")
-        return False
+def update_user_record(username, mutate):
+    """Apply mutate(record) to the latest stored record of a user and refresh the session copy"""
+    # The change is made against the file's current contents, never this
+    # session's copy, so writes from other sessions and replicas are kept
+    def apply(data):
+        record = data[username]
+        return record, mutate(record)
+    record, result = get_user_store().update(apply)
+    st.session_state.user_database[username] = record
+    return result
 
 # Page configuration
 st.set_page_config(
@@ -868,50 +1003,312 @@ def signup_user(username, password, confirm_password, email):
     if password != confirm_password:
         return False, "❌ Passwords do not match!"
     
-    if username in st.session_state.user_database:
-        return False, "❌ Username already exists! Please choose another one."
-    
-    st.session_state.user_database[username] = {
-        "password": password,
+    user_record = {
+        # Hashed on the shared pool, which bounds the CPU a signup storm can take
+        "password": hash_password_pooled(password),
         "email": email,
         "created_at": datetime.now().isoformat(),
-        "chat_history": []
+        "threads": {},
+        "chat_count": 0
     }
     
+    def add_user(data):
+        # Checked against the stored file so two replicas cannot claim one name
+        if username in data:
+            return False
+        data[username] = user_record
+        return True
+    
     # Save to file
-    if save_user_data():
-        return True, f"✅ Account created successfully! Welcome, {username}!"
-    else:
+    try:
+        created = get_user_store().update(add_user)
+    except Exception as e:
+        log_event("signup", level=logging.ERROR, username=username, outcome="error", error=str(e))
+        st.error(f"Error saving user data: {str(e)}")
         return False, "❌ Error saving account data. Please try again."
+    if not created:
+        log_event("signup", username=username, outcome="exists")
+        return False, "❌ Username already exists! Please choose another one."
+    log_event("signup", username=username, outcome="created")
+    st.session_state.user_database[username] = user_record
+    return True, f"✅ Account created successfully! Welcome, {username}!"
+
+def migrate_legacy_history(username):
+    """Move a flat chat_history list into its own thread file"""
+    if "chat_history" not in st.session_state.user_database[username]:
+        return
+    legacy_history = st.session_state.user_database[username]["chat_history"]
+    
+    # The thread file is written before the record changes: if writing fails,
+    # the record keeps its legacy history and the next login tries again
+    thread_id = new_thread_id()
+    if legacy_history:
+        chat_store.append_turns(username, thread_id, legacy_history)
+    
+    def migrate(user_record):
+        # Runs under the store's lock, so only one replica migrates a record
+        if user_record.get("chat_history") != legacy_history:
+            return False
+        user_record.pop("chat_history")
+        threads = user_record.setdefault("threads", {})
+        if legacy_history:
+            threads[thread_id] = {
+                "title": make_thread_title(legacy_history[0]["user"]),
+                "updated_at": legacy_history[-1]["timestamp"],
+                "turns": len(legacy_history),
+                "tokens": 0
+            }
+        user_record.setdefault("chat_count", sum(thread["turns"] for thread in threads.values()))
+        return True
+    
+    if not update_user_record(username, migrate):
+        # Migrated (or changed) elsewhere meanwhile; our copy of the thread is unused
+        chat_store.delete_thread(username, thread_id)
+
+def open_thread(thread_id):
+    """Show a thread in the session, loading only its latest page of turns"""
+    st.session_state.active_thread = thread_id
+    st.session_state.followups = []
+    get_prefetcher().discard(session_owner())
+    if thread_id is None:
+        st.session_state.chat_history, st.session_state.history_cursor = [], 0
+    else:
+        st.session_state.chat_history, st.session_state.history_cursor = chat_store.load_page(
+            st.session_state.current_user, thread_id, limit=HISTORY_PAGE_SIZE
+        )
+
+def append_to_window(turn):
+    """Add a stored turn to the session window, dropping the oldest beyond its size"""
+    window = st.session_state.chat_history
+    window.append(turn)
+    overflow = len(window) - SESSION_WINDOW_TURNS
+    if overflow > 0:
+        del window[:overflow]
+        # Dropped turns stay reachable through "Load earlier messages"
+        st.session_state.history_cursor += overflow
+
+def iter_user_turns(username):
+    """Yield ((thread_id, position), turn) for every stored turn of a user"""
+    thread_ids = list(st.session_state.user_database[username].get("threads", {}))
+    for thread_id in thread_ids:
+        for position, turn in enumerate(chat_store.iter_turns(username, thread_id)):
+            yield (thread_id, position), turn
 
 def login_user(username, password):
     """Handle user login"""
     if not username or not password:
         return False, "❌ Please enter both username and password!"
     
+    # Verified on the hashing pool; plaintext and outdated hashes are upgraded here
+    valid = check_login(get_user_store(), username, password)
+    
+    # Pick up accounts and messages written by other sessions or replicas
+    st.session_state.user_database = get_user_store().load()
+    
     if username not in st.session_state.user_database:
+        log_event("login", level=logging.WARNING, username=username, outcome="unknown_user")
         return False, "❌ Username not found! Please sign up first."
     
-    if st.session_state.user_database[username]["password"] != password:
+    if not valid:
+        log_event("login", level=logging.WARNING, username=username, outcome="bad_password")
         return False, "❌ Incorrect password! Please try again."
     
+    log_event("login", username=username, outcome="ok")
+    
+    # Records from before conversation threads get migrated once
+    try:
+        migrate_legacy_history(username)
+    except Exception as e:
+        log_event("login", level=logging.ERROR, username=username, outcome="migration_error", error=str(e))
+        return False, f"❌ Could not move your saved conversations: {str(e)}. Please try again."
+    
     st.session_state.current_user = username
     st.session_state.page = 'chat'
-    st.session_state.chat_history = []
+    # Resume the most recent thread with its latest page only; older pages load on demand
+    threads = st.session_state.user_database[username]["threads"]
+    open_thread(max(threads, key=lambda thread_id: threads[thread_id]["updated_at"], default=None))
+    st.session_state.attachments = {}
     
     return True, f"✅ Welcome back, {username}!"
 
 def logout_user():
     """Handle user logout"""
+    log_event("logout", username=st.session_state.current_user)
     st.session_state.current_user = None
     st.session_state.page = 'auth'
     st.session_state.chat_history = []
+    st.session_state.history_cursor = 0
+    st.session_state.active_thread = None
+    st.session_state.attachments = {}
+    st.session_state.followups = []
+    get_prefetcher().discard(session_owner())
 
 def format_timestamp(iso_timestamp):
     """Format timestamp for display"""
     dt = datetime.fromisoformat(iso_timestamp)
     return dt.strftime("%I:%M %p")
 
+def summarize_upload(uploaded_file):
+    """Summarize an uploaded data file into compact prompt context"""
+    if uploaded_file.name.lower().endswith(".csv"):
+        return format_point_summary(uploaded_file.name, summarize_points(uploaded_file))
+    return format_geojson_summary(uploaded_file.name, summarize_geojson(uploaded_file))
+
+def stream_model_answer(client, model_name, messages, temperature, max_tokens, index, events):
+    """Stream one model's answer into the event queue as (index, kind, payload) tuples"""
+    started = time.perf_counter()
+    first_token = None
+    chunks = 0
+    completion_tokens = None
+    try:
+        stream = client.chat.completions.create(
+            model=model_name,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                chunks += 1
+                events.put((index, "delta", delta))
+            # Groq reports usage on the final chunk of a stream
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+            if usage:
+                completion_tokens = usage.completion_tokens
+        events.put((index, "done", {
+            "seconds": time.perf_counter() - started,
+            "first_token": first_token,
+            # Without reported usage, each streamed chunk is roughly one token
+            "tokens": completion_tokens if completion_tokens is not None else chunks,
+        }))
+    except Exception as e:
+        events.put((index, "error", str(e)))
+
+def format_model_stats(stats):
+    """One-line latency and throughput summary for a compared model"""
+    if "error" in stats:
+        return f"❌ {stats['error']}"
+    rate = stats["tokens"] / stats["seconds"] if stats["seconds"] else 0
+    first = f" · first token {stats['first_token']:.2f} s" if stats["first_token"] is not None else ""
+    return f"⏱️ {stats['seconds']:.2f} s{first} · 🔤 {stats['tokens']} tokens · ⚡ {rate:.0f} tok/s"
+
+def format_model_option(model, summary):
+    """Model name with its recent median and p95 response times, once it has any"""
+    figures = summary.get(model)
+    if not figures or not figures["total_ms"].total:
+        return model
+    total = figures["total_ms"]
+    return f"{model} · p50 {total.percentile(50) / 1000:.1f}s · p95 {total.percentile(95) / 1000:.1f}s"
+
+def select_fastest_model():
+    """Switch the model selectbox to the fastest healthy model when the setting is turned on"""
+    if st.session_state.fastest_default:
+        fastest = get_model_stats().fastest(AVAILABLE_MODELS)
+        if fastest:
+            st.session_state.model_name = fastest
+
+def render_comparison(comparison):
+    """Show a finished model comparison in side-by-side columns"""
+    st.markdown(f"#### ⚖️ {comparison['question']}")
+    for column, model, answer, stats in zip(
+        st.columns(len(comparison["models"])), comparison["models"], comparison["answers"], comparison["stats"]
+    ):
+        with column:
+            st.markdown(f"**🤖 {model}**")
+            st.caption(format_model_stats(stats))
+            st.markdown(answer)
+    st.caption(f"🕒 Wall time {comparison['wall_seconds']:.2f} s for {len(comparison['models'])} models")
+
+def compare_models(message, models, temperature, max_tokens):
+    """Ask several models the same question at once, streaming answers into side-by-side columns"""
+    client = get_client(get_api_key())
+    context = build_context(message, st.session_state.attachments.values())
+    messages = build_messages(message, st.session_state.chat_history, context)
+    
+    st.markdown(f"#### ⚖️ {message}")
+    stat_slots, answer_slots = [], []
+    for column, model in zip(st.columns(len(models)), models):
+        with column:
+            st.markdown(f"**🤖 {model}**")
+            stat_slots.append(st.empty())
+            answer_slots.append(st.empty())
+            stat_slots[-1].caption("⏳ Waiting for first token...")
+    
+    # Workers only produce events; elements are updated from the script thread
+    answers = [""] * len(models)
+    stats = [None] * len(models)
+    events = queue.Queue()
+    started = time.perf_counter()
+    with get_prefetcher().foreground(), ThreadPoolExecutor(max_workers=len(models)) as pool:
+        for index, model in enumerate(models):
+            pool.submit(stream_model_answer, client, model, messages, temperature, max_tokens, index, events)
+        pending = len(models)
+        while pending:
+            # Apply everything queued since the last redraw in one pass
+            batch = [events.get()]
+            while True:
+                try:
+                    batch.append(events.get_nowait())
+                except queue.Empty:
+                    break
+            changed = set()
+            for index, kind, payload in batch:
+                if kind == "delta":
+                    answers[index] += payload
+                    changed.add(index)
+                else:
+                    pending -= 1
+                    stats[index] = payload if kind == "done" else {"error": payload}
+                    stat_slots[index].caption(format_model_stats(stats[index]))
+                    answer_slots[index].markdown(answers[index])
+            for index in changed:
+                if stats[index] is None:
+                    answer_slots[index].markdown(answers[index] + " ▌")
+    wall_seconds = time.perf_counter() - started
+    st.caption(f"🕒 Wall time {wall_seconds:.2f} s for {len(models)} models")
+    for model, model_stats in zip(models, stats):
+        if "error" in model_stats:
+            get_model_stats().record(model, error=True)
+        else:
+            get_model_stats().record(model, model_stats["seconds"], model_stats["first_token"], model_stats["tokens"])
+    
+    st.session_state.comparison = {
+        "question": message,
+        "models": list(models),
+        "answers": answers,
+        "stats": stats,
+        "wall_seconds": wall_seconds
+    }
+
+def session_owner():
+    """Key grouping this session's prefetched answers"""
+    return run_ctx.session_id if run_ctx is not None else "local"
+
+def refresh_followups(client, message, answer, model_name, temperature, max_tokens):
+    """Suggest follow-ups to the latest answer and queue their answers for background prefetch"""
+    try:
+        with get_prefetcher().foreground():
+            followups = suggest_followups(client, message, answer)
+    except Exception:
+        # Suggestions are a convenience; without them the chat works as before
+        followups = []
+    st.session_state.followups = followups
+    
+    # Prefetches run on the worker thread, so they get copies of what they need
+    history = list(st.session_state.chat_history)
+    attachments = list(st.session_state.attachments.values())
+    predictor = get_length_predictor()
+    def prefetch_answer(question):
+        return answer_question(
+            client, question, model_name, temperature, max_tokens, history, attachments, predictor=predictor
+        )
+    get_prefetcher().schedule(session_owner(), followups, prefetch_answer)
+
+@profiled("chat")
 def chat_with_geoadvisor(message, model_name, temperature, max_tokens):
     """Main chat function for GeoAdvisor"""
     if not message or message.strip() == "":
@@ -921,46 +1318,143 @@ def chat_with_geoadvisor(message, model_name, temperature, max_tokens):
         st.error("⚠️ Please login to use GeoAdvisor.")
         return
     
-    api_key = get_api_key()
+    request_started = time.perf_counter()
+    log_event("chat_request", username=st.session_state.current_user, thread_id=st.session_state.active_thread,
+              model=model_name, chars=len(message), max_tokens=max_tokens)
+    
+    # Answer plain EPSG lookups from the local catalog without an LLM round trip
+    assistant_message = answer_crs_question(message)
+    tokens_used = 0
+    source = "crs_catalog"
+    
+    if assistant_message is None:
+        client = get_client(get_api_key())
+        source = "model"
+        # A clicked suggestion may already have been answered in the background
+        if message in st.session_state.followups:
+            prefetched = get_prefetcher().take(session_owner(), message)
+            if prefetched is not None:
+                assistant_message, tokens_used = prefetched
+                source = "prefetch"
+    else:
+        client = None
     
     try:
-        client = Groq(api_key=api_key)
-        
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        if assistant_message is None:
+            context = build_context(message, st.session_state.attachments.values())
+            messages = build_messages(message, st.session_state.chat_history, context)
+            # Reserve the predicted answer length; the sidebar value caps the
+            # answer including any continuations of a cut-off reply
+            predicted_tokens = get_length_predictor().predict(message, max_tokens)
+            started = time.perf_counter()
+            try:
+                with get_prefetcher().foreground():
+                    assistant_message, tokens_used = request_completion(
+                        client, model_name, messages, temperature, predicted_tokens, max_tokens
+                    )
+            except Exception:
+                get_model_stats().record(model_name, error=True)
+                raise
+            # Only the total time is known here: the reply is not streamed and
+            # its token count includes the prompt
+            get_model_stats().record(model_name, time.perf_counter() - started)
+            get_length_predictor().record(message, assistant_message)
         
-        for chat_msg in st.session_state.chat_history:
-            messages.append({"role": "user", "content": chat_msg["user"]})
-            messages.append({"role": "assistant", "content": chat_msg["assistant"]})
+        username = st.session_state.current_user
+        thread_id = st.session_state.active_thread
+        if thread_id not in st.session_state.user_database[username]["threads"]:
+            thread_id = st.session_state.active_thread = new_thread_id()
         
-        messages.append({"role": "user", "content": message})
-        
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
+        # One turn record: written to the thread file, then shared by the session window
+        turn, _, user_record = persist_turn(
+            get_user_store(), username, thread_id, message, assistant_message, tokens_used
         )
+        st.session_state.user_database[username] = user_record
+        append_to_window(turn)
+        log_event("chat_response", username=username, thread_id=thread_id, model=model_name, source=source,
+                  tokens=tokens_used, chars=len(assistant_message),
+                  ms=round((time.perf_counter() - request_started) * 1000, 1))
         
-        assistant_message = response.choices[0].message.content
-        
-        st.session_state.chat_history.append({
-            "user": message,
-            "assistant": assistant_message,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        if st.session_state.current_user in st.session_state.user_database:
-            st.session_state.user_database[st.session_state.current_user]["chat_history"].append({
-                "user": message,
-                "assistant": assistant_message,
-                "timestamp": datetime.now().isoformat()
-            })
-            # Save to file after each message
-            save_user_data()
+        if client is None:
+            st.session_state.followups = []
+            get_prefetcher().discard(session_owner())
+        else:
+            refresh_followups(client, message, assistant_message, model_name, temperature, max_tokens)
         
     except Exception as e:
+        log_event("chat_error", level=logging.ERROR, username=st.session_state.current_user, model=model_name,
+                  error_type=type(e).__name__, error=str(e), ms=round((time.perf_counter() - request_started) * 1000, 1))
         st.error(f"❌ **Error:** {str(e)}\n\nPlease check your API key and try again.")
 
+def render_usage_analytics():
+    """Admin view of who uses what, read only from the usage rollup tables"""
+    rollups = get_usage_rollups()
+    st.markdown("## 📈 Usage Analytics")
+    days = st.radio("Period", [1, 7, 30], index=1, horizontal=True,
+                    format_func=lambda d: "Today" if d == 1 else f"Last {d} days")
+    
+    by_user = rollups.by_user(days)
+    by_model = rollups.by_model(days)
+    requests = sum(row["requests"] for row in by_model)
+    errors = sum(row["errors"] for row in by_model)
+    tokens = sum(row["tokens"] for row in by_model)
+    answered = [row for row in by_model if row["avg_latency_ms"] is not None]
+    avg_latency = (
+        sum(row["avg_latency_ms"] * (row["requests"] - row["errors"]) for row in answered) / (requests - errors)
+        if requests > errors else None
+    )
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Requests", f"{requests:,}")
+    col2.metric("Tokens", f"{tokens:,}")
+    col3.metric("Avg latency", f"{avg_latency / 1000:.2f} s" if avg_latency is not None else "–")
+    col4.metric("Error rate", f"{errors / requests:.1%}" if requests else "–")
+    
+    if not requests:
+        st.info("No requests recorded in this period yet.")
+        return
+    st.markdown("#### Requests per day")
+    st.bar_chart(rollups.daily(30), x="bucket", y="requests", x_label="Day (UTC)", y_label="Requests")
+    st.markdown("#### Tokens per hour")
+    st.line_chart(rollups.hourly(48), x="bucket", y="tokens", x_label="Hour (UTC)", y_label="Tokens")
+    st.markdown("#### By user")
+    st.dataframe(sorted(by_user, key=lambda row: row["tokens"], reverse=True), hide_index=True,
+                 use_container_width=True)
+    st.markdown("#### By model")
+    st.dataframe(sorted(by_model, key=lambda row: row["requests"], reverse=True), hide_index=True,
+                 use_container_width=True)
+
+def render_slow_reruns():
+    """Admin view of the slowest profiled reruns and where their time went"""
+    st.markdown("## 🔬 Slow Reruns")
+    reruns = slowest_reruns(limit=25)
+    if not reruns:
+        st.info("No profiled reruns yet. Set GEOADVISOR_PROFILE=sample, or GEOADVISOR_PROFILE_TOKEN and open "
+                "the app with ?profile=<token>, then use the app as usual.")
+        return
+    st.dataframe([
+        {
+            "rerun": rerun["id"], "seconds": rerun["seconds"], "chat s": rerun["spans"].get("chat"),
+            "user": rerun.get("user"), "page": rerun.get("page"), "ended by": rerun["ended_by"],
+            "profiler": rerun["mode"],
+        }
+        for rerun in reruns
+    ], hide_index=True, use_container_width=True)
+    
+    rerun = st.selectbox("Rerun", reruns, format_func=lambda r: f"{r['id']} · {r['seconds']:.2f} s · {r.get('page')}")
+    st.caption(f"{rerun['samples']} stack samples. Total is the share of samples inside a function, "
+               "self the share spent in the function itself.")
+    st.dataframe(hot_frames(rerun["id"], limit=25), hide_index=True, use_container_width=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        # Collapsed stacks open in speedscope.app or flamegraph.pl
+        st.download_button("🔥 Flamegraph stacks", profile_file(rerun["id"], "folded"),
+                           file_name=rerun["files"]["folded"], mime="text/plain", use_container_width=True)
+    with col2:
+        if "prof" in rerun["files"]:
+            st.download_button("📄 cProfile dump", profile_file(rerun["id"], "prof"),
+                               file_name=rerun["files"]["prof"], mime="application/octet-stream",
+                               use_container_width=True)
+
 # Main app
 def main():
     
@@ -1066,22 +1560,34 @@ def main():
                 logout_user()
                 st.rerun()
             
+            if st.session_state.current_user in ADMIN_USERS:
+                if st.button("📈 Usage Analytics", key="open_analytics", use_container_width=True):
+                    st.session_state.page = 'admin'
+                    st.rerun()
+                if st.button("🔬 Slow Reruns", key="open_profiles", use_container_width=True):
+                    st.session_state.page = 'profiles'
+                    st.rerun()
+            
             st.markdown("---")
             
             # Enhanced chat stats
             st.markdown("### 📊 Session Stats")
             
+            # The session only holds a window of the thread, so count from the thread index
+            active_turns = st.session_state.user_database[st.session_state.current_user]["threads"].get(
+                st.session_state.active_thread, {}
+            ).get("turns", 0)
             col1, col2 = st.columns(2)
             with col1:
                 st.markdown(f"""
                 <div class="stats-card">
-                    <div class="stats-number">{len(st.session_state.chat_history)}</div>
+                    <div class="stats-number">{active_turns}</div>
                     <div class="stats-label">Messages</div>
                 </div>
                 """, unsafe_allow_html=True)
             
             with col2:
-                total_user_chats = len(st.session_state.user_database.get(st.session_state.current_user, {}).get("chat_history", []))
+                total_user_chats = st.session_state.user_database.get(st.session_state.current_user, {}).get("chat_count", 0)
                 st.markdown(f"""
                 <div class="stats-card">
                     <div class="stats-number">{total_user_chats}</div>
@@ -1089,21 +1595,134 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
             
+            storage = chat_store.storage_stats(
+                st.session_state.current_user,
+                st.session_state.user_database[st.session_state.current_user]["threads"]
+            )
+            if storage["cold_turns"]:
+                cold_note = f"🧊 {storage['cold_turns']} older messages compressed {storage['ratio']:.1f}×"
+                if storage["avg_block_ms"] is not None:
+                    cold_note += f" · cold read {storage['avg_block_ms']:.2f} ms avg, {storage['max_block_ms']:.2f} ms max"
+                st.caption(cold_note)
+            
+            memory = get_session_manager().metrics(run_ctx.session_id if run_ctx else None)
+            st.caption(
+                f"🧠 This session ≈ {memory.get('session_bytes', 0) / 1024:.0f} KB · "
+                f"{memory['sessions']} sessions, {memory['offloaded_sessions']} offloaded to disk, "
+                f"{memory['resident_bytes'] / (1024 * 1024):.1f} MB resident"
+            )
+            
+            prefetch = get_prefetcher().metrics()
+            if prefetch["hits"] + prefetch["misses"]:
+                st.caption(
+                    f"🔮 {prefetch['hits']} of {prefetch['hits'] + prefetch['misses']} suggestions answered "
+                    f"instantly ({prefetch['hit_rate']:.0%}) · {prefetch['wasted_tokens']} prefetched tokens unused"
+                )
+            
+            budgets = get_length_predictor().stats
+            if budgets["requests"]:
+                st.caption(
+                    f"📏 Requests reserved {budgets['reserved'] / budgets['ceiling']:.0%} of Max Tokens "
+                    f"on average ({budgets['reserved'] // budgets['requests']} tokens)"
+                )
+            
+            st.markdown("---")
+            st.markdown("### 💬 Conversations")
+            
+            if st.button("➕ New Conversation", key="new_thread", use_container_width=True):
+                open_thread(None)
+                st.rerun()
+            
+            user_threads = st.session_state.user_database[st.session_state.current_user]["threads"]
+            recent_threads = sorted(user_threads.items(), key=lambda item: item[1]["updated_at"], reverse=True)
+            for position, (thread_id, thread) in enumerate(recent_threads):
+                if position == RECENT_THREADS_SHOWN:
+                    older_threads = st.expander(f"🗂️ Older conversations ({len(recent_threads) - position})")
+                marker = "▶️" if thread_id == st.session_state.active_thread else "💬"
+                with older_threads if position >= RECENT_THREADS_SHOWN else st.container():
+                    if st.button(f"{marker} {thread['title']} · {thread['turns']}", key=f"thread_{thread_id}", use_container_width=True):
+                        open_thread(thread_id)
+                        st.rerun()
+            
+            st.markdown("---")
+            st.markdown("### 🔎 Search History")
+            
+            history_query = st.text_input(
+                "Search your past conversations",
+                key="history_query",
+                placeholder="e.g. buffer analysis",
+                label_visibility="collapsed"
+            )
+            if history_query.strip():
+                user_threads = st.session_state.user_database[st.session_state.current_user]["threads"]
+                results = search_history(
+                    st.session_state.current_user, history_query, iter_user_turns(st.session_state.current_user),
+                    limit=5, thread_turns={thread_id: thread["turns"] for thread_id, thread in user_threads.items()}
+                )
+                if not results:
+                    st.caption("No matching conversations found.")
+                for (thread_id, position), score in results:
+                    turn = chat_store.load_turns(st.session_state.current_user, thread_id, position, position + 1)[0]
+                    when = datetime.fromisoformat(turn["timestamp"]).strftime("%b %d, %I:%M %p")
+                    with st.expander(f"🕑 {when} · {turn['user'][:60]}"):
+                        st.caption(f"💬 {user_threads[thread_id]['title']}")
+                        st.markdown(f"**You:** {turn['user']}")
+                        st.markdown(turn["assistant"])
+                        if st.button("📂 Open conversation", key=f"open_result_{thread_id}_{position}", use_container_width=True):
+                            open_thread(thread_id)
+                            st.rerun()
+            
+            st.markdown("---")
+            st.markdown("### 📤 Export History")
+            
+            export_format = st.selectbox(
+                "Format",
+                list(EXPORT_FORMATS),
+                format_func=lambda fmt: {"jsonl": "JSON Lines", "markdown": "Markdown"}[fmt],
+                key="export_format"
+            )
+            export_user = st.session_state.current_user
+            _, export_ext, export_mime = EXPORT_FORMATS[export_format]
+            # Passing a callable defers rendering until the button is clicked
+            st.download_button(
+                "📥 Download",
+                data=lambda: export_bytes(export_format, USER_DATA_FILE, {export_user}),
+                file_name=f"geoadvisor_{export_user}.{export_ext}",
+                mime=export_mime,
+                use_container_width=True
+            )
+            
             st.markdown("---")
             st.markdown("### ⚙️ Model Settings")
             
+            fastest_default = st.toggle(
+                "⚡ Default to fastest model",
+                value=FASTEST_MODEL_DEFAULT,
+                key="fastest_default",
+                on_change=select_fastest_model,
+                help="Preselect the model with the lowest median response time over the last few days, skipping models with many errors"
+            )
+            model_summary = get_model_stats().summary()
+            if 'model_name' not in st.session_state:
+                default_model = get_model_stats().fastest(AVAILABLE_MODELS, model_summary) if fastest_default else None
+                st.session_state.model_name = default_model or AVAILABLE_MODELS[0]
             model_name = st.selectbox(
                 "🤖 Model",
-                [
-                    "llama-3.3-70b-versatile",
-                    "llama-3.1-70b-versatile",
-                    "llama-3.1-8b-instant",
-                    "mixtral-8x7b-32768",
-                    "gemma2-9b-it"
-                ],
-                index=0
+                AVAILABLE_MODELS,
+                format_func=lambda model: format_model_option(model, model_summary),
+                key="model_name"
             )
             
+            compare_mode = st.toggle("⚖️ Compare models", help="Send each question to several models at once")
+            compare_selection = []
+            if compare_mode:
+                compare_selection = st.multiselect(
+                    "Models to compare",
+                    AVAILABLE_MODELS,
+                    default=COMPARE_DEFAULT_MODELS,
+                    max_selections=MAX_COMPARE_MODELS
+                )
+            
             temperature = st.slider("🌡️ Temperature", 0.0, 2.0, 0.7, 0.1, help="Controls randomness in responses")
             max_tokens = st.slider("📏 Max Tokens", 256, 8192, 2048, 256, help="Maximum response length")
             
@@ -1123,9 +1742,31 @@ def main():
             for topic in topics:
                 st.markdown(f"- {topic}")
             
+            st.markdown("---")
+            st.markdown("### 🧭 CRS Lookup")
+            
+            crs_query = st.text_input(
+                "Find a coordinate system by EPSG code or name",
+                key="crs_query",
+                placeholder="e.g. 27700 or mercator",
+                label_visibility="collapsed"
+            )
+            crs_query = crs_query.strip().lower().removeprefix("epsg:").strip()
+            if crs_query:
+                # Answered from the bundled catalog, without a model round trip
+                crs_code = get_crs(crs_query) if crs_query.isdigit() else None
+                crs_matches = [crs_code] if crs_code else search_crs(crs_query, limit=5)
+                if not crs_matches:
+                    st.caption("No matching coordinate systems in the local catalog.")
+                for crs in crs_matches:
+                    with st.expander(f"EPSG:{crs.code} · {crs.name}"):
+                        st.markdown(format_crs(crs))
+            
             st.markdown("---")
             if st.button("🗑️ Clear Chat History", use_container_width=True):
                 st.session_state.chat_history = []
+                # Earlier turns stay reachable through "Load earlier messages"
+                st.session_state.history_cursor = user_threads.get(st.session_state.active_thread, {}).get("turns", 0)
                 st.rerun()
         
         # Main chat area with enhanced header
@@ -1140,6 +1781,17 @@ def main():
         # Chat container with empty state
         chat_container = st.container()
         with chat_container:
+            if st.session_state.history_cursor > 0:
+                if st.button(f"⬆️ Load earlier messages ({st.session_state.history_cursor} more)", key="load_earlier", use_container_width=True):
+                    older_turns, st.session_state.history_cursor = chat_store.load_page(
+                        st.session_state.current_user,
+                        st.session_state.active_thread,
+                        before=st.session_state.history_cursor,
+                        limit=HISTORY_PAGE_SIZE
+                    )
+                    st.session_state.chat_history = older_turns + st.session_state.chat_history
+                    st.rerun()
+            
             if len(st.session_state.chat_history) == 0:
                 st.markdown("""
                 <div class="empty-state">
@@ -1172,6 +1824,15 @@ def main():
                     </div>
                     """, unsafe_allow_html=True)
         
+        # Suggested follow-ups, answered in the background while the user reads
+        if st.session_state.followups and st.session_state.chat_history:
+            st.markdown("### 🔮 Suggested Follow-ups")
+            for idx, followup in enumerate(st.session_state.followups):
+                if st.button(f"➡️ {followup}", key=f"followup_{idx}", use_container_width=True):
+                    with st.spinner("🤔 GeoAdvisor is analyzing your question..."):
+                        chat_with_geoadvisor(followup, model_name, temperature, max_tokens)
+                    st.rerun()
+        
         # Example questions with better design
         st.markdown("---")
         st.markdown("### 💡 Popular Questions")
@@ -1195,6 +1856,28 @@ def main():
         
         st.markdown("---")
         
+        # Data attachments are summarized locally so raw files never reach the prompt
+        with st.expander("📎 Attach Data", expanded=bool(st.session_state.attachments)):
+            uploaded_file = st.file_uploader(
+                "Upload a GeoJSON file or a CSV of lat/lon points",
+                type=["geojson", "json", "csv"],
+                key="data_upload",
+                help="Only a compact summary of the file is sent to GeoAdvisor"
+            )
+            if uploaded_file is not None and uploaded_file.file_id not in st.session_state.processed_uploads:
+                st.session_state.processed_uploads.add(uploaded_file.file_id)
+                with st.spinner("🗺️ Summarizing your data..."):
+                    try:
+                        st.session_state.attachments[uploaded_file.name] = summarize_upload(uploaded_file)
+                    except Exception as e:
+                        st.error(f"❌ Could not read {uploaded_file.name}: {str(e)}")
+            
+            for name, summary_text in list(st.session_state.attachments.items()):
+                st.code(summary_text, language=None)
+                if st.button(f"✖️ Remove {name}", key=f"detach_{name}", use_container_width=True):
+                    del st.session_state.attachments[name]
+                    st.rerun()
+        
         # Enhanced chat input area
         st.markdown("### ✍️ Your Question")
         user_input = st.text_area(
@@ -1215,7 +1898,7 @@ def main():
             send_button = st.button("🚀 Send Message", type="primary", use_container_width=True)
         with col2:
             if st.button("🔄 New Topic", use_container_width=True):
-                st.session_state.chat_history = []
+                open_thread(None)
                 st.rerun()
         with col3:
             if st.button("📋 Copy Last", use_container_width=True):
@@ -1224,11 +1907,33 @@ def main():
         
         if send_button:
             if user_input and user_input.strip():
-                with st.spinner("🤔 GeoAdvisor is analyzing your question..."):
-                    chat_with_geoadvisor(user_input, model_name, temperature, max_tokens)
-                st.rerun()
+                if compare_mode:
+                    if len(compare_selection) < 2:
+                        st.warning("⚠️ Pick at least two models to compare!")
+                    else:
+                        # Comparisons are shown side by side and not added to the conversation
+                        compare_models(user_input, compare_selection, temperature, max_tokens)
+                else:
+                    with st.spinner("🤔 GeoAdvisor is analyzing your question..."):
+                        chat_with_geoadvisor(user_input, model_name, temperature, max_tokens)
+                    st.rerun()
             else:
                 st.warning("⚠️ Please enter a question first!")
+        elif compare_mode and st.session_state.comparison:
+            render_comparison(st.session_state.comparison)
+    
+    # Admin analytics and profiling pages
+    elif st.session_state.page in ('admin', 'profiles'):
+        if st.session_state.current_user not in ADMIN_USERS:
+            st.session_state.page = 'chat' if st.session_state.current_user else 'auth'
+            st.rerun()
+        if st.button("⬅️ Back to Chat", key="close_analytics"):
+            st.session_state.page = 'chat'
+            st.rerun()
+        if st.session_state.page == 'admin':
+            render_usage_analytics()
+        else:
+            render_slow_reruns()
     
     # Enhanced footer
     st.markdown("---")
@@ -1249,4 +1954,11 @@ def main():
     """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # An idle session rerun by the sweep offloads its state once the page is drawn
+        if run_ctx is not None:
+            get_session_manager().finish_run(run_ctx.session_id)
+        if rerun_profile is not None:
+            rerun_profile.stop(user=st.session_state.current_user, page=st.session_state.page)
@@ -0,0 +1,142 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import groq
+
+from advisor import DEFAULT_MODEL, RateLimiter, answer_question, make_client
+from answer_length import DEFAULT_LENGTH_STATS_FILE, LengthPredictor
+
+# Errors worth retrying after a pause; anything else is recorded as failed
+RETRYABLE_ERRORS = (groq.RateLimitError, groq.APIConnectionError, groq.InternalServerError)
+
+
+def iter_questions(path):
+    """Yield (id, question) from a JSONL file or a CSV file with a 'question' column"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            for line_no, row in enumerate(csv.DictReader(f), start=1):
+                yield str(row.get("id") or line_no), row["question"]
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    item = json.loads(line)
+                    yield str(item.get("id", line_no)), item["question"]
+
+
+def load_checkpoint(output_path):
+    """Ids already answered in an earlier run of the same output file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short when an earlier run was killed
+                continue
+            if "answer" in record:
+                done.add(record["id"])
+    return done
+
+
+def _end_line(path):
+    # Start on a fresh line if an earlier run was killed mid-write
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+
+def answer_one(client, predictor, question_id, question, args):
+    """Answer one question with retries; returns an output record"""
+    record = {"id": question_id, "question": question, "model": args.model}
+    for attempt in range(args.retries + 1):
+        started = time.perf_counter()
+        try:
+            answer, tokens = answer_question(
+                client, question, args.model, args.temperature, args.max_tokens, predictor=predictor
+            )
+        except RETRYABLE_ERRORS as e:
+            if attempt == args.retries:
+                record["error"] = str(e)
+                return record
+            time.sleep(args.backoff * 2 ** attempt)
+        except Exception as e:
+            record["error"] = str(e)
+            return record
+        else:
+            record.update(answer=answer, tokens=tokens, seconds=round(time.perf_counter() - started, 3))
+            return record
+
+
+def run_batch(args, client=None):
+    """Answer every pending question, appending one JSON line per result as it completes
+
+    A client passed in is used as is; rate limiting applies to the client built here.
+    """
+    # One question can take several requests (tool rounds, continuations), so
+    # the limit is applied to each HTTP request the client sends
+    client = client or make_client(max_retries=0, limiter=RateLimiter(args.rpm, burst=args.concurrency))
+    # Predicted budgets reserve less of the token rate limit per request
+    predictor = None if args.fixed_max_tokens else LengthPredictor(DEFAULT_LENGTH_STATS_FILE)
+    done = load_checkpoint(args.output)
+    pending = ((qid, q) for qid, q in iter_questions(args.input) if qid not in done)
+    counts = {"answered": 0, "failed": 0, "skipped": len(done)}
+
+    _end_line(args.output)
+    with open(args.output, "a", encoding="utf-8") as out, ThreadPoolExecutor(args.concurrency) as pool:
+        in_flight = set()
+        exhausted = False
+        while in_flight or not exhausted:
+            # Keep a bounded window of questions in flight so huge inputs stream
+            while not exhausted and len(in_flight) < args.concurrency * 2:
+                try:
+                    qid, question = next(pending)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight.add(pool.submit(answer_one, client, predictor, qid, question, args))
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                counts["failed" if "error" in record else "answered"] += 1
+                status = "failed: " + record["error"] if "error" in record else "ok"
+                print(f"[{counts['answered'] + counts['failed']}] {record['id']} {status}", file=sys.stderr)
+    if predictor is not None:
+        predictor.flush()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a file of GIS questions with GeoAdvisor")
+    parser.add_argument("input", help="JSONL with 'question' (and optional 'id') fields, or CSV with those columns")
+    parser.add_argument("--output", "-o", required=True, help="JSONL results file; rerun with the same file to resume")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--max-tokens", type=int, default=2048, help="Most tokens per answer, continuations included")
+    parser.add_argument("--fixed-max-tokens", action="store_true",
+                        help="Reserve --max-tokens on every request instead of the predicted answer length")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions answered at once")
+    parser.add_argument("--rpm", type=float, default=30, help="Maximum requests per minute")
+    parser.add_argument("--retries", type=int, default=3, help="Retries on rate limits and connection errors")
+    parser.add_argument("--backoff", type=float, default=2.0, help="Seconds before the first retry, doubling each time")
+    args = parser.parse_args(argv)
+
+    counts = run_batch(args)
+    print(f"{counts['answered']} answered, {counts['failed']} failed, {counts['skipped']} already done", file=sys.stderr)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Requests per second of the HTTP API, served by uvicorn on one worker
+
+Uses questions the local EPSG catalog answers, so the measurement covers
+HTTP, auth, storage and indexing without model latency or API cost.
+
+    python benchmarks/api_throughput.py --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from passwords import hash_password
+from user_store import UserStore
+
+USERNAME, PASSWORD = "bench", "bench-password"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _run(base_url, requests, concurrency, request):
+    latencies = []
+    counter = iter(range(requests))
+    async with httpx.AsyncClient(base_url=base_url, auth=(USERNAME, PASSWORD), timeout=30) as client:
+        async def worker():
+            for i in counter:
+                started = time.perf_counter()
+                response = await request(client, i)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return requests / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        UserStore(os.path.join(data_dir, "user_data.json")).update(
+            lambda data: data.setdefault(USERNAME, {"password": hash_password(PASSWORD), "threads": {}, "chat_count": 0})
+        )
+        port = _free_port()
+        env = dict(os.environ, PYTHONPATH=ROOT, GEOADVISOR_API_RPM="1e9", GROQ_API_KEY="unused")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+            cwd=data_dir, env=env,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            for _ in range(100):
+                try:
+                    httpx.get(base_url + "/health")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+
+            thread_id = httpx.post(
+                base_url + "/chat", auth=(USERNAME, PASSWORD), json={"message": "What is EPSG:4326?"}
+            ).json()["thread_id"]
+
+            def chat(client, i):
+                return client.post("/chat", json={"message": f"What is EPSG:{32601 + i % 60}?", "thread_id": thread_id})
+
+            def threads(client, i):
+                return client.get("/threads")
+
+            def health(client, i):
+                return client.get("/health")
+
+            requests = [("GET /health", health), ("POST /chat (local EPSG answer)", chat), ("GET /threads", threads)]
+            for name, request in requests:
+                rps, p50, p95 = asyncio.run(_run(base_url, args.requests, args.concurrency, request))
+                print(f"{name}: {rps:.0f} req/s, p50 {p50 * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
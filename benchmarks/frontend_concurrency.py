@@ -0,0 +1,182 @@
+"""Concurrent question throughput of the Gradio and Streamlit front ends
+
+A local stand-in for the Groq API (selected through GROQ_BASE_URL) streams
+every answer over --latency seconds, so the model behaves like a slow
+network service without API cost. Gradio is served by gradio_app.py on its
+queue and driven over HTTP by concurrent gradio_client users. Streamlit is
+driven in-process with AppTest, one script run per interaction as the
+server does it; AppTest cannot run sessions concurrently, so its ceiling is
+reported from the measured per-interaction cost instead.
+
+    python benchmarks/frontend_concurrency.py --users 1 8 32 --questions 5 --latency 1.0
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from passwords import hash_password
+from user_store import UserStore
+
+PASSWORD = "bench-password"
+CHUNKS = 20
+
+
+def fake_model_server(latency):
+    """Start an OpenAI-compatible endpoint that answers after `latency` seconds; returns (server, url)"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            words = [f"word{i} " for i in range(CHUNKS)]
+            usage = {"prompt_tokens": 100, "completion_tokens": CHUNKS, "total_tokens": 100 + CHUNKS}
+            base = {"id": "bench", "created": int(time.time()), "model": request["model"]}
+            if not request.get("stream"):
+                time.sleep(latency)
+                body = json.dumps({**base, "object": "chat.completion", "usage": usage, "choices": [{
+                    "index": 0, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "".join(words)},
+                }]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for i, word in enumerate(words):
+                time.sleep(latency / CHUNKS)
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [{
+                    "index": 0, "delta": {"content": word}, "finish_reason": "stop" if i == CHUNKS - 1 else None,
+                }]}
+                if i == CHUNKS - 1:
+                    chunk["x_groq"] = {"id": "bench", "usage": usage}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _drive(users, questions, ask):
+    # Run `users` threads that each call ask(user_no, question_no) `questions` times
+    latencies = []
+    lock = threading.Lock()
+
+    def user(user_no):
+        for question_no in range(questions):
+            started = time.perf_counter()
+            ask(user_no, question_no)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def bench_gradio(data_dir, model_url, user_counts, questions, concurrency, port=7861):
+    from gradio_client import Client
+
+    env = dict(os.environ, PYTHONPATH=ROOT, PORT=str(port), GROQ_API_KEY="unused", GROQ_BASE_URL=model_url,
+               GEOADVISOR_GRADIO_CONCURRENCY=str(concurrency), GRADIO_ANALYTICS_ENABLED="False")
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "gradio_app.py")], cwd=data_dir, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/"
+    try:
+        for _ in range(300):
+            try:
+                httpx.get(url)
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        for users in user_counts:
+            clients = [Client(url, auth=(f"user{n}", PASSWORD), verbose=False) for n in range(users)]
+
+            def ask(user_no, question_no):
+                clients[user_no].predict(f"How do I buffer layer {question_no}?", [], api_name="/chat")
+            rate, p50, p95 = _drive(users, questions, ask)
+            print(f"gradio    {users:4} users: {rate:6.2f} questions/s, p50 {p50:6.2f} s, p95 {p95:6.2f} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def bench_streamlit(data_dir, model_url, questions, latency):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ.update(GROQ_BASE_URL=model_url)
+    os.chdir(data_dir)
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    at.secrets["GROQ_API_KEY"] = "unused"
+    at.run()
+    at.text_input(key="login_username").input("user0")
+    at.text_input(key="login_password").input(PASSWORD)
+    at.button(key="login_btn").click()
+    at.run()
+
+    def ask(user_no, question_no):
+        at.text_area(key="user_input").input(f"How do I buffer layer {question_no}?")
+        next(b for b in at.button if "Send" in b.label).click()
+        at.run()
+    cpu_started = time.process_time()
+    rate, p50, p95 = _drive(1, questions, ask)
+    cpu = (time.process_time() - cpu_started) / questions
+    print(f"streamlit    1 user:  {rate:6.2f} questions/s, p50 {p50:6.2f} s, p95 {p95:6.2f} s, "
+          f"{cpu * 1000:.0f} ms CPU per question (script reruns hold the GIL: "
+          f"at most {1 / cpu:.0f} questions/s per server process)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--questions", type=int, default=5, help="Questions per user")
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds the stand-in model takes per answer")
+    parser.add_argument("--concurrency", type=int, default=16, help="Gradio queue workers")
+    parser.add_argument("--frontend", choices=["gradio", "streamlit", "both"], default="both")
+    args = parser.parse_args()
+
+    model_server, model_url = fake_model_server(args.latency)
+    with tempfile.TemporaryDirectory() as data_dir:
+        # Every user shares one hash, so setup stays quick at any user count
+        password_hash = hash_password(PASSWORD)
+        UserStore(os.path.join(data_dir, "user_data.json")).update(lambda data: data.update({
+            f"user{n}": {"password": password_hash, "email": "", "created_at": "", "threads": {}, "chat_count": 0}
+            for n in range(max(args.users))
+        }))
+        if args.frontend in ("gradio", "both"):
+            bench_gradio(data_dir, model_url, args.users, args.questions, args.concurrency)
+        if args.frontend in ("streamlit", "both"):
+            bench_streamlit(data_dir, model_url, args.questions, args.latency)
+    model_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
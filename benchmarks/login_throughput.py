@@ -0,0 +1,90 @@
+"""Password hash cost against login throughput, for choosing GEOADVISOR_SCRYPT_N
+
+For each scrypt work factor, times a single hash and then a burst of
+concurrent logins verified on a bounded pool like the app's, and recommends
+the largest N whose single-hash time stays under the target.
+
+    python benchmarks/login_throughput.py --costs 4096 16384 65536 --logins 40 --workers 4 --target-ms 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from passwords import HASH_WORKERS, SCRYPT_N, hash_password, verify_password
+
+PASSWORD = "correct horse battery staple"
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def _timed_verify(stored, submitted):
+    started = time.perf_counter()
+    ok, _ = verify_password(stored, PASSWORD)
+    assert ok
+    # Latency as a user sees it, queueing for a pool worker included
+    return time.perf_counter() - submitted, time.perf_counter() - started
+
+
+def run(n, logins, workers):
+    """Single-hash time, plus login latencies and throughput through a pool of workers"""
+    stored = hash_password(PASSWORD, n)
+    started = time.perf_counter()
+    verify_password(stored, PASSWORD)
+    single = time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        started = time.perf_counter()
+        futures = [pool.submit(_timed_verify, stored, time.perf_counter()) for _ in range(logins)]
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+    latencies = [latency for latency, _ in results]
+    return {
+        "single": single,
+        "hash_mean": statistics.mean(hash_time for _, hash_time in results),
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "per_second": logins / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--costs", type=int, nargs="+", default=[2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16],
+                        help="scrypt N values to compare (powers of two)")
+    parser.add_argument("--logins", type=int, default=20, help="Concurrent logins per cost")
+    parser.add_argument("--workers", type=int, default=HASH_WORKERS, help="Hashing pool size")
+    parser.add_argument("--target-ms", type=float, default=100.0,
+                        help="Longest acceptable time for a single hash")
+    args = parser.parse_args()
+    if any(n < 2 or n & (n - 1) for n in args.costs):
+        parser.error("--costs must be powers of two")
+
+    print(f"{args.logins} logins per cost on {args.workers} workers ({os.cpu_count()} CPUs); current N={SCRYPT_N}")
+    print(f"{'N':>8} {'memory':>8} {'hash ms':>9} {'pooled ms':>10} {'p50 ms':>9} {'p95 ms':>9} {'logins/s':>9}")
+    recommended = None
+    for n in sorted(args.costs):
+        figures = run(n, args.logins, args.workers)
+        memory_mb = 128 * n * 8 / (1024 * 1024)
+        print(f"{n:>8} {memory_mb:>6.0f}MB {figures['single'] * 1000:>9.1f} {figures['hash_mean'] * 1000:>10.1f}"
+              f" {figures['p50'] * 1000:>9.1f} {figures['p95'] * 1000:>9.1f} {figures['per_second']:>9.1f}")
+        if figures["single"] * 1000 <= args.target_ms:
+            recommended = n
+
+    if recommended is None:
+        print(f"No cost hashes within {args.target_ms:g} ms; try smaller values", file=sys.stderr)
+        return 1
+    print(f"Recommended: GEOADVISOR_SCRYPT_N={recommended} (largest N hashing within {args.target_ms:g} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Answer latency replayed from a cassette, for regression checks without network access
+
+Record once against the real API (or any GROQ_BASE_URL), commit the cassette,
+then replay it in CI; --max-p95 makes the run fail when latency regresses.
+
+    GROQ_API_KEY=... python benchmarks/replay_latency.py --record benchmarks/geoadvisor.cassette.jsonl
+    python benchmarks/replay_latency.py benchmarks/geoadvisor.cassette.jsonl --rounds 20 --max-p95 3.0
+
+Replay with --speed 0 to measure only GeoAdvisor's own overhead.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import groq
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from advisor import DEFAULT_MODEL, answer_question, build_context, build_messages, stream_completion
+from cassette import RECORD, REPLAY, CassetteTransport
+
+QUESTIONS = [
+    "How do I reproject a shapefile from WGS84 to UTM zone 33N with GDAL?",
+    "What is the difference between a spatial join and an overlay?",
+    "Which interpolation method suits sparse rainfall gauges?",
+    "What is the distance between Paris and Berlin?",
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def run(client, questions, rounds, model):
+    """Time answer_question and stream_completion over every question; returns samples in seconds"""
+    samples = {"answer": [], "stream_first": [], "stream_total": []}
+    for _ in range(rounds):
+        for question in questions:
+            started = time.perf_counter()
+            answer_question(client, question, model, temperature=0.0, max_tokens=512)
+            samples["answer"].append(time.perf_counter() - started)
+
+            messages = build_messages(question, context=build_context(question))
+            started = time.perf_counter()
+            first = None
+            for text, _ in stream_completion(client, model, messages, 0.0, 512):
+                if text and first is None:
+                    first = time.perf_counter() - started
+            samples["stream_total"].append(time.perf_counter() - started)
+            samples["stream_first"].append(first if first is not None else samples["stream_total"][-1])
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cassette", help="Cassette file (JSONL)")
+    parser.add_argument("--record", action="store_true", help="Call the real API and append to the cassette")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay timing multiplier; 0 replays at once")
+    parser.add_argument("--rounds", type=int, default=5, help="Passes over the questions when replaying")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--max-p95", type=float, help="Fail when the p95 answer latency exceeds this many seconds")
+    args = parser.parse_args()
+
+    if not args.record and not os.path.exists(args.cassette):
+        parser.error(f"{args.cassette} does not exist; record it first with --record")
+    transport = CassetteTransport(args.cassette, RECORD if args.record else REPLAY, args.speed)
+    client = groq.Groq(
+        api_key=os.environ.get("GROQ_API_KEY", "replay"),
+        http_client=httpx.Client(transport=transport, timeout=60),
+        max_retries=0,
+    )
+    samples = run(client, QUESTIONS, 1 if args.record else args.rounds, args.model)
+
+    mode = "recorded" if args.record else f"replayed at speed {args.speed:g}"
+    print(f"{len(samples['answer'])} questions {mode}")
+    for name, values in samples.items():
+        print(f"  {name:<13} p50 {_percentile(values, 50) * 1000:8.1f} ms   p95 {_percentile(values, 95) * 1000:8.1f} ms"
+              f"   mean {statistics.mean(values) * 1000:8.1f} ms")
+    if args.max_p95 is not None and _percentile(samples["answer"], 95) > args.max_p95:
+        print(f"p95 answer latency above {args.max_p95:g} s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Concurrent writers across processes against user_store and chat_store
+
+Every process runs several threads that sign up their own users and append
+turns to one shared thread while bumping the shared user's counters. At the
+end every signup, every turn and every counter increment must be present.
+
+    python benchmarks/storage_stress.py --processes 8 --threads 4 --messages 50
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_store
+from user_store import UserStore
+
+SHARED_USER = "shared"
+SHARED_THREAD = "stress"
+
+
+def worker(args):
+    worker_id, data_dir, threads, messages = args
+    os.chdir(data_dir)
+    store = UserStore()
+
+    def run(thread_no):
+        username = f"user-{worker_id}-{thread_no}"
+        store.update(lambda data: data.setdefault(username, {"threads": {}, "chat_count": 0}))
+        for i in range(messages):
+            turn = {"user": f"{username} q{i}", "assistant": "a" * 200, "timestamp": f"{time.time():.6f}"}
+            position = chat_store.append_turn(SHARED_USER, SHARED_THREAD, turn)
+
+            def record(data):
+                record = data[SHARED_USER]
+                thread = record["threads"][SHARED_THREAD]
+                thread["turns"] = max(thread["turns"], position + 1)
+                record["chat_count"] += 1
+            store.update(record)
+
+    pool = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return store.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.chdir(data_dir)
+        UserStore().update(lambda data: data.setdefault(
+            SHARED_USER, {"threads": {SHARED_THREAD: {"turns": 0}}, "chat_count": 0}
+        ))
+        started = time.perf_counter()
+        with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+            stats = pool.map(worker, [(n, data_dir, args.threads, args.messages) for n in range(args.processes)])
+        elapsed = time.perf_counter() - started
+
+        expected = args.processes * args.threads * args.messages
+        data = UserStore().load()
+        turns = list(chat_store.iter_turns(SHARED_USER, SHARED_THREAD))
+        missing_users = [
+            f"user-{p}-{t}" for p in range(args.processes) for t in range(args.threads)
+            if f"user-{p}-{t}" not in data
+        ]
+        updates = sum(s["updates"] for s in stats)
+        commits = sum(s["commits"] for s in stats)
+        print(f"{updates} updates in {commits} commits ({updates / commits:.2f} per fsync), {elapsed:.2f}s")
+        print(f"turns stored: {len(turns)} / {expected}, distinct: {len({t['user'] for t in turns})}")
+        print(f"chat_count: {data[SHARED_USER]['chat_count']} / {expected}")
+        print(f"thread index turns: {data[SHARED_USER]['threads'][SHARED_THREAD]['turns']} / {expected}")
+        print(f"missing users: {len(missing_users)}")
+        ok = (
+            len(turns) == len({t["user"] for t in turns}) == expected
+            and data[SHARED_USER]["chat_count"] == expected
+            and data[SHARED_USER]["threads"][SHARED_THREAD]["turns"] == expected
+            and not missing_users
+        )
+        print("OK: no lost writes" if ok else "FAILED: writes were lost")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+
+import httpx
+
+RECORD, REPLAY = "record", "replay"
+
+
+# Body fields left out of the match key. max_tokens comes from the answer
+# length predictor and drifts as its stats file fills, which would otherwise
+# stop recordings of the chat and API paths from replaying.
+UNMATCHED_FIELDS = ("max_tokens",)
+
+
+def request_key(request):
+    """Match key of a request: method, path and a hash of its canonical JSON body"""
+    body = request.content
+    try:
+        payload = json.loads(body)
+        if isinstance(payload, dict):
+            for field in UNMATCHED_FIELDS:
+                payload.pop(field, None)
+        body = json.dumps(payload, sort_keys=True).encode("utf-8")
+    except ValueError:
+        pass
+    return f"{request.method} {request.url.path} {hashlib.sha1(body).hexdigest()[:16]}"
+
+
+class Cassette:
+    """Recorded HTTP interactions in a JSONL file, one per line
+
+    Each interaction keeps the response status, headers and body chunks
+    together with when they arrived relative to the request being sent.
+    Bytes are stored as latin-1 text, which maps every byte to one character,
+    so JSON and SSE bodies stay readable and binary ones survive unchanged.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.interactions = {}
+        self._next = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        interaction = json.loads(line)
+                        self.interactions.setdefault(interaction["key"], []).append(interaction)
+
+    def add(self, interaction):
+        with self._lock:
+            self.interactions.setdefault(interaction["key"], []).append(interaction)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(interaction) + "\n")
+
+    def next(self, key):
+        """Recorded interactions for a key in order, cycling once all have been replayed"""
+        with self._lock:
+            recorded = self.interactions.get(key)
+            if not recorded:
+                return None
+            index = self._next.get(key, 0)
+            self._next[key] = index + 1
+            return recorded[index % len(recorded)]
+
+
+class _RecordingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    # Passes chunks through while noting their timing; saved once fully read
+    def __init__(self, stream, interaction, started, cassette):
+        self.stream = stream
+        self.interaction = interaction
+        self.started = started
+        self.cassette = cassette
+
+    def _note(self, chunk):
+        self.interaction["chunks"].append([round(time.perf_counter() - self.started, 6), chunk.decode("latin-1")])
+
+    def __iter__(self):
+        for chunk in self.stream:
+            self._note(chunk)
+            yield chunk
+        self.cassette.add(self.interaction)
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            self._note(chunk)
+            yield chunk
+        self.cassette.add(self.interaction)
+
+    def close(self):
+        self.stream.close()
+
+    async def aclose(self):
+        await self.stream.aclose()
+
+
+class _ReplayStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    # Yields recorded chunks, waiting until each one's scaled arrival time
+    def __init__(self, chunks, started, speed):
+        self.chunks = chunks
+        self.started = started
+        self.speed = speed
+
+    def _delay(self, at):
+        return at * self.speed - (time.perf_counter() - self.started)
+
+    def __iter__(self):
+        for at, chunk in self.chunks:
+            delay = self._delay(at)
+            if delay > 0:
+                time.sleep(delay)
+            yield chunk.encode("latin-1")
+
+    async def __aiter__(self):
+        for at, chunk in self.chunks:
+            delay = self._delay(at)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield chunk.encode("latin-1")
+
+
+class CassetteTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """httpx transport that records real traffic to a cassette or replays it offline
+
+    In replay mode recorded timings are multiplied by speed: 1.0 reproduces
+    the original latency, 0.5 runs twice as fast and 0 returns at once.
+    Requests without a recording raise httpx.ConnectError, as an unreachable
+    server would.
+    """
+
+    def __init__(self, cassette, mode=REPLAY, speed=1.0):
+        self.cassette = cassette if isinstance(cassette, Cassette) else Cassette(cassette)
+        self.mode = mode
+        self.speed = speed
+        self._inner = None
+        self._async_inner = None
+
+    def _start(self, request):
+        # Uncompressed bodies keep recorded chunks readable and timing honest
+        request.headers["Accept-Encoding"] = "identity"
+        return {
+            "key": request_key(request),
+            "request": {"method": request.method, "url": str(request.url), "body": request.content.decode("latin-1")},
+            "chunks": [],
+        }
+
+    def _recorded(self, response, interaction, started):
+        interaction["status"] = response.status_code
+        interaction["headers"] = [[k, v] for k, v in response.headers.multi_items() if k.lower() != "set-cookie"]
+        interaction["headers_at"] = round(time.perf_counter() - started, 6)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, interaction, started, self.cassette),
+            extensions=response.extensions,
+        )
+
+    def _replay(self, request):
+        started = time.perf_counter()
+        interaction = self.cassette.next(request_key(request))
+        if interaction is None:
+            raise httpx.ConnectError(f"No recorded response for {request.method} {request.url}", request=request)
+        return interaction, started
+
+    def _replayed(self, interaction, started):
+        return httpx.Response(
+            interaction["status"],
+            headers=interaction["headers"],
+            stream=_ReplayStream(interaction["chunks"], started, self.speed),
+        )
+
+    def handle_request(self, request):
+        if self.mode == RECORD:
+            if self._inner is None:
+                self._inner = httpx.HTTPTransport()
+            interaction = self._start(request)
+            started = time.perf_counter()
+            return self._recorded(self._inner.handle_request(request), interaction, started)
+        interaction, started = self._replay(request)
+        delay = interaction["headers_at"] * self.speed
+        if delay > 0:
+            time.sleep(delay)
+        return self._replayed(interaction, started)
+
+    async def handle_async_request(self, request):
+        if self.mode == RECORD:
+            if self._async_inner is None:
+                self._async_inner = httpx.AsyncHTTPTransport()
+            interaction = self._start(request)
+            started = time.perf_counter()
+            return self._recorded(await self._async_inner.handle_async_request(request), interaction, started)
+        interaction, started = self._replay(request)
+        delay = interaction["headers_at"] * self.speed
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._replayed(interaction, started)
+
+    def close(self):
+        if self._inner is not None:
+            self._inner.close()
+
+    async def aclose(self):
+        if self._async_inner is not None:
+            await self._async_inner.aclose()
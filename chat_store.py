@@ -0,0 +1,414 @@
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from event_log import log_event
+from user_store import _fsync_dir, file_lock
+
+# Directory holding one JSONL file per conversation thread
+CHAT_DATA_DIR = "chat_data"
+
+# Most recent turns of a thread kept as plain JSONL
+HOT_TURNS = 100
+
+# Older turns are moved to the cold file in compressed blocks of this many turns
+BLOCK_TURNS = 25
+
+# Decompressed cold blocks kept in memory
+BLOCK_CACHE_SIZE = 16
+
+# Preset dictionary shared by every cold block. Assistant answers repeat the
+# same Markdown scaffolding and GIS vocabulary, which zlib can then reference
+# from the first byte of each block. zlib weights the end of the dictionary
+# most, so the commonest strings come last. Never edit it in place: add a new
+# version so existing blocks stay readable.
+_ZDICTS = {
+    1: (
+        "coordinate reference system projection datum ellipsoid spheroid geoid "
+        "latitude longitude easting northing meters metres kilometers degrees "
+        "WGS 84 EPSG:4326 EPSG:3857 Web Mercator UTM zone NAD83 ETRS89 "
+        "+proj=utm +zone= +datum=WGS84 +units=m +no_defs +proj=longlat "
+        "GeoPandas Shapely GDAL OGR rasterio Fiona pyproj QGIS ArcGIS PostGIS "
+        "GeoJSON Shapefile GeoPackage GeoTIFF raster vector feature layer "
+        "attribute table polygon polyline point geometry buffer intersection "
+        "union overlay clip dissolve spatial join nearest neighbor interpolation "
+        "kriging IDW slope aspect hillshade DEM elevation NDVI satellite imagery "
+        "Landsat Sentinel resolution pixel band reclassify zonal statistics "
+        "import geopandas as gpd\nimport pandas as pd\nimport numpy as np\n"
+        "gdf = gpd.read_file(\"data.shp\")\ngdf = gdf.to_crs(epsg=\n"
+        "ST_Transform(geom, ST_Intersects(ST_Buffer(ST_Distance(ST_Area(SELECT "
+        "```python\n```sql\n```\n\n"
+        "Here's how you can do this:\n\n"
+        "## Step-by-Step\n\n### Example\n\n**Note:** **Tip:** "
+        "\n\n- **\n- \n1. \n2. \n3. "
+        "\", \"timestamp\": \"20"
+        "{\"user\": \"\", \"assistant\": \""
+    ).encode("utf-8"),
+}
+_ZDICT_VERSION = max(_ZDICTS)
+
+# Block header: dictionary version, turn count, raw length, compressed length
+_BLOCK_HEADER = struct.Struct("<BHII")
+
+# Per thread file: (inode, byte offsets of line starts), extended incrementally
+_line_offsets = {}
+# Per cold file: ((size, mtime), array of block byte offsets, array of first
+# turn per block, raw bytes, compressed bytes)
+_cold_indexes = {}
+_block_cache = OrderedDict()
+_cold_stats = {"reads": 0, "cache_hits": 0, "seconds": 0.0, "max_seconds": 0.0}
+# Guards the caches above within a process; the per-user lock file guards
+# the thread files across processes and threads. It is taken first, so a user
+# locked by another process only holds up that user's readers and writers.
+_lock = threading.Lock()
+
+
+def _user_dir(username):
+    # Filesystem-safe, collision-free directory name for a username
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", username)[:40]
+    digest = hashlib.sha1(username.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(CHAT_DATA_DIR, f"{safe}-{digest}")
+
+
+def thread_path(username, thread_id):
+    """Path of the JSONL file holding a thread's turns"""
+    return os.path.join(_user_dir(username), f"{thread_id}.jsonl")
+
+
+def cold_path(username, thread_id):
+    """Path of the file holding a thread's compressed older turns"""
+    return os.path.join(_user_dir(username), f"{thread_id}.cold")
+
+
+@contextmanager
+def _locked(username, exclusive=False):
+    # Shared for reads, exclusive for appends and compaction
+    directory = _user_dir(username)
+    os.makedirs(directory, exist_ok=True)
+    with file_lock(os.path.join(directory, ".lock"), exclusive), _lock:
+        yield
+
+
+def _offsets(path):
+    # Offsets of every complete line plus the end of the last one; only the
+    # unread tail of the file is scanned when it has grown. A file replaced by
+    # compaction (here or in another process) has a new inode and is rescanned.
+    try:
+        stat = os.stat(path)
+    except OSError:
+        _line_offsets.pop(path, None)
+        return array("Q", [0])
+    cached = _line_offsets.get(path)
+    if cached is None or cached[0] != stat.st_ino or stat.st_size < cached[1][-1]:
+        cached = _line_offsets[path] = (stat.st_ino, array("Q", [0]))
+    offsets = cached[1]
+    if stat.st_size > offsets[-1]:
+        with open(path, "rb") as f:
+            f.seek(offsets[-1])
+            pos = offsets[-1]
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                pos += len(line)
+                offsets.append(pos)
+    return offsets
+
+
+def _pending_path(path):
+    # Marker of a compaction in progress on a cold file
+    return path + ".pending"
+
+
+def _valid_cold_size(path, size):
+    # A compaction that stopped after extending the cold file but before
+    # replacing the hot file leaves blocks whose turns are still hot. Its
+    # marker holds the sizes from before; while the hot file is unchanged,
+    # only the cold file up to its old size is valid.
+    try:
+        with open(_pending_path(path), encoding="utf-8") as f:
+            pending = json.load(f)
+        if os.path.getsize(pending["hot"]) == pending["hot_size"]:
+            return min(size, pending["cold_size"])
+    except (OSError, ValueError, KeyError):
+        pass
+    return size
+
+
+def _cold_entry(path):
+    # Walk the block headers once and again only when the file has changed
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    version = (stat.st_size, stat.st_mtime_ns)
+    cached = _cold_indexes.get(path)
+    if cached is not None and cached[0] == version:
+        return cached
+    size = _valid_cold_size(path, stat.st_size)
+    offsets, first_turns = array("Q"), array("Q", [0])
+    raw_bytes = compressed_bytes = 0
+    with open(path, "rb") as f:
+        pos = 0
+        while pos + _BLOCK_HEADER.size <= size:
+            f.seek(pos)
+            _, turns, raw, compressed = _BLOCK_HEADER.unpack(f.read(_BLOCK_HEADER.size))
+            if pos + _BLOCK_HEADER.size + compressed > size:
+                # Block cut short by an interrupted compaction
+                break
+            offsets.append(pos)
+            first_turns.append(first_turns[-1] + turns)
+            raw_bytes += raw
+            compressed_bytes += _BLOCK_HEADER.size + compressed
+            pos += _BLOCK_HEADER.size + compressed
+    cached = _cold_indexes[path] = (version, offsets, first_turns, raw_bytes, compressed_bytes)
+    return cached
+
+
+def _cold_index(path):
+    entry = _cold_entry(path)
+    if entry is None:
+        return array("Q"), array("Q", [0])
+    return entry[1], entry[2]
+
+
+def _cold_count(path):
+    return _cold_index(path)[1][-1]
+
+
+def _read_block(path, block):
+    # Decompress one cold block on first access; later reads hit the cache
+    offsets = _cold_index(path)[0]
+    key = (path, offsets[block])
+    turns = _block_cache.get(key)
+    if turns is not None:
+        _block_cache.move_to_end(key)
+        _cold_stats["cache_hits"] += 1
+        return turns
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        f.seek(offsets[block])
+        version, _, _, compressed = _BLOCK_HEADER.unpack(f.read(_BLOCK_HEADER.size))
+        decompressor = zlib.decompressobj(zdict=_ZDICTS[version])
+        data = decompressor.decompress(f.read(compressed)) + decompressor.flush()
+    turns = [json.loads(line) for line in data.splitlines()]
+    elapsed = time.perf_counter() - started
+    _cold_stats["reads"] += 1
+    _cold_stats["seconds"] += elapsed
+    _cold_stats["max_seconds"] = max(_cold_stats["max_seconds"], elapsed)
+    _block_cache[key] = turns
+    if len(_block_cache) > BLOCK_CACHE_SIZE:
+        _block_cache.popitem(last=False)
+    return turns
+
+
+def _load_cold(path, start, end):
+    offsets, first_turns = _cold_index(path)
+    turns = []
+    block = max(0, bisect_right(first_turns, start) - 1)
+    while block < len(offsets) and first_turns[block] < end:
+        block_turns = _read_block(path, block)
+        lo = max(start - first_turns[block], 0)
+        hi = min(end - first_turns[block], len(block_turns))
+        turns.extend(block_turns[lo:hi])
+        block += 1
+    return turns
+
+
+def _recover(username, thread_id):
+    # Finish off an interrupted compaction; caller holds the exclusive lock
+    cold = cold_path(username, thread_id)
+    try:
+        with open(_pending_path(cold), encoding="utf-8") as f:
+            pending = json.load(f)
+    except FileNotFoundError:
+        return
+    except ValueError:
+        pending = None
+    if pending is not None and os.path.getsize(pending["hot"]) == pending["hot_size"]:
+        # The hot file still holds the moved turns: drop their cold copies
+        with open(cold, "r+b") as f:
+            f.truncate(pending["cold_size"])
+        for key in [key for key in _block_cache if key[0] == cold]:
+            del _block_cache[key]
+    _cold_indexes.pop(cold, None)
+    os.remove(_pending_path(cold))
+
+
+def _compact(username, thread_id):
+    # Move the oldest whole blocks of hot turns into the cold file, keeping at
+    # least HOT_TURNS plain. The cold file is extended before the hot file is
+    # atomically replaced by its remaining tail; a marker written first lets
+    # readers and _recover undo the extension if the replace never happens.
+    # Each step is fsynced before the next, so after a power loss the hot
+    # file can only have been replaced once the cold blocks are on disk.
+    path = thread_path(username, thread_id)
+    offsets = _offsets(path)
+    blocks = (len(offsets) - 1 - HOT_TURNS) // BLOCK_TURNS
+    if blocks <= 0:
+        return
+    with open(path, "rb") as f:
+        data = f.read()
+    packed_blocks = []
+    for block in range(blocks):
+        lo, hi = offsets[block * BLOCK_TURNS], offsets[(block + 1) * BLOCK_TURNS]
+        compressor = zlib.compressobj(9, zdict=_ZDICTS[_ZDICT_VERSION])
+        raw = data[lo:hi]
+        packed = compressor.compress(raw) + compressor.flush()
+        packed_blocks.append(_BLOCK_HEADER.pack(_ZDICT_VERSION, BLOCK_TURNS, len(raw), len(packed)) + packed)
+    cold = cold_path(username, thread_id)
+    pending = {"hot": path, "hot_size": len(data), "cold_size": os.path.getsize(cold) if os.path.exists(cold) else 0}
+    with open(_pending_path(cold) + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(pending, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(_pending_path(cold) + ".tmp", _pending_path(cold))
+    _fsync_dir(cold)
+    with open(cold, "ab") as f:
+        f.write(b"".join(packed_blocks))
+        f.flush()
+        os.fsync(f.fileno())
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data[offsets[blocks * BLOCK_TURNS]:offsets[-1]])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+    os.remove(_pending_path(cold))
+    _line_offsets.pop(path, None)
+
+
+def append_turns(username, thread_id, turns):
+    """Append turns to a thread and return the position of the first one
+
+    The oldest turns are compressed once the hot file is full.
+    """
+    started = time.perf_counter()
+    path = thread_path(username, thread_id)
+    data = "".join(json.dumps(turn, ensure_ascii=False) + "\n" for turn in turns).encode("utf-8")
+    with _locked(username, exclusive=True):
+        _recover(username, thread_id)
+        with open(path, "ab") as f:
+            f.write(data)
+        hot = len(_offsets(path)) - 1
+        total = _cold_count(cold_path(username, thread_id)) + hot
+        compacted = hot >= HOT_TURNS + BLOCK_TURNS
+        if compacted:
+            _compact(username, thread_id)
+    log_event("storage_write", store="turns", username=username, thread_id=thread_id, turns=len(turns),
+              bytes=len(data), compacted=compacted, ms=round((time.perf_counter() - started) * 1000, 3))
+    return total - len(turns)
+
+
+def append_turn(username, thread_id, turn):
+    """Append one turn to a thread file and return its position"""
+    return append_turns(username, thread_id, [turn])
+
+
+def delete_thread(username, thread_id):
+    """Remove a thread's hot and cold files"""
+    with _locked(username, exclusive=True):
+        cold = cold_path(username, thread_id)
+        for path in (thread_path(username, thread_id), cold, _pending_path(cold)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            _line_offsets.pop(path, None)
+            _cold_indexes.pop(path, None)
+        for key in [key for key in _block_cache if key[0] == cold]:
+            del _block_cache[key]
+
+
+def count_turns(username, thread_id):
+    """Number of turns stored in a thread"""
+    with _locked(username):
+        hot = len(_offsets(thread_path(username, thread_id))) - 1
+        return _cold_count(cold_path(username, thread_id)) + hot
+
+
+def load_turns(username, thread_id, start, end):
+    """Load turns [start, end) of a thread, decompressing only the cold blocks they fall in"""
+    path = thread_path(username, thread_id)
+    with _locked(username):
+        cold = cold_path(username, thread_id)
+        cold_total = _cold_count(cold)
+        offsets = _offsets(path)
+        total = cold_total + len(offsets) - 1
+        start, end = max(0, start), min(end, total)
+        if start >= end:
+            return []
+        turns = _load_cold(cold, start, min(end, cold_total)) if start < cold_total else []
+        hot_start, hot_end = max(start - cold_total, 0), end - cold_total
+        if hot_end <= hot_start:
+            return turns
+        with open(path, "rb") as f:
+            f.seek(offsets[hot_start])
+            data = f.read(offsets[hot_end] - offsets[hot_start])
+    return turns + [json.loads(line) for line in data.splitlines()]
+
+
+def load_page(username, thread_id, before=None, limit=20):
+    """Load up to limit turns ending before the cursor, returning (turns, new_cursor)"""
+    end = count_turns(username, thread_id) if before is None else before
+    start = max(0, end - limit)
+    return load_turns(username, thread_id, start, end), start
+
+
+def iter_turns(username, thread_id):
+    """Stream every turn of a thread from disk, one cold block at a time"""
+    # Snapshot the block count and open the hot file together: cold blocks are
+    # append-only and a compacted hot file is replaced, not rewritten, so the
+    # snapshot stays consistent while it is read without the lock
+    cold = cold_path(username, thread_id)
+    with _locked(username):
+        blocks = len(_cold_index(cold)[0])
+        try:
+            hot_file = open(thread_path(username, thread_id), "rb")
+        except FileNotFoundError:
+            hot_file = None
+    for block in range(blocks):
+        with _lock:
+            turns = _read_block(cold, block)
+        yield from turns
+    if hot_file is None:
+        return
+    with hot_file:
+        for line in hot_file:
+            if line.endswith(b"\n"):
+                yield json.loads(line)
+
+
+def storage_stats(username, thread_ids):
+    """Hot/cold sizes, compression ratio and cold read latency for a user's threads"""
+    stats = {"hot_turns": 0, "hot_bytes": 0, "cold_turns": 0, "raw_bytes": 0, "compressed_bytes": 0}
+    with _locked(username):
+        for thread_id in thread_ids:
+            path = thread_path(username, thread_id)
+            offsets = _offsets(path)
+            stats["hot_turns"] += len(offsets) - 1
+            stats["hot_bytes"] += offsets[-1]
+            # Totals come from the cached header walk, redone only when the file changes
+            entry = _cold_entry(cold_path(username, thread_id))
+            if entry is not None:
+                stats["cold_turns"] += entry[2][-1]
+                stats["raw_bytes"] += entry[3]
+                stats["compressed_bytes"] += entry[4]
+        reads = _cold_stats["reads"]
+        stats.update(
+            ratio=stats["raw_bytes"] / stats["compressed_bytes"] if stats["compressed_bytes"] else None,
+            block_reads=reads,
+            block_cache_hits=_cold_stats["cache_hits"],
+            avg_block_ms=1000 * _cold_stats["seconds"] / reads if reads else None,
+            max_block_ms=1000 * _cold_stats["max_seconds"] if reads else None,
+        )
+    return stats
@@ -0,0 +1,245 @@
+import re
+from bisect import bisect_left
+from collections import namedtuple
+
+CRS = namedtuple("CRS", ["code", "name", "units", "area", "proj"])
+
+# Hand-picked EPSG definitions (code, name, units, area of use, proj string)
+_BASE_CATALOG = (
+    (4326, "WGS 84", "degree", "World", "+proj=longlat +datum=WGS84 +no_defs"),
+    (4979, "WGS 84 (3D)", "degree", "World", "+proj=longlat +datum=WGS84 +no_defs"),
+    (4978, "WGS 84 (geocentric)", "metre", "World", "+proj=geocent +datum=WGS84 +units=m +no_defs"),
+    (4269, "NAD83", "degree", "North America", "+proj=longlat +datum=NAD83 +no_defs"),
+    (4267, "NAD27", "degree", "North America", "+proj=longlat +datum=NAD27 +no_defs"),
+    (4258, "ETRS89", "degree", "Europe", "+proj=longlat +ellps=GRS80 +no_defs"),
+    (4230, "ED50", "degree", "Europe", "+proj=longlat +ellps=intl +no_defs"),
+    (4277, "OSGB36", "degree", "United Kingdom", "+proj=longlat +ellps=airy +no_defs"),
+    (4283, "GDA94", "degree", "Australia", "+proj=longlat +ellps=GRS80 +no_defs"),
+    (7844, "GDA2020", "degree", "Australia", "+proj=longlat +ellps=GRS80 +no_defs"),
+    (4674, "SIRGAS 2000", "degree", "Latin America", "+proj=longlat +ellps=GRS80 +no_defs"),
+    (4490, "China Geodetic Coordinate System 2000", "degree", "China", "+proj=longlat +ellps=GRS80 +no_defs"),
+    (4612, "JGD2000", "degree", "Japan", "+proj=longlat +ellps=GRS80 +no_defs"),
+    (6668, "JGD2011", "degree", "Japan", "+proj=longlat +ellps=GRS80 +no_defs"),
+    (4148, "Hartebeesthoek94", "degree", "South Africa", "+proj=longlat +ellps=WGS84 +no_defs"),
+    (3857, "WGS 84 / Pseudo-Mercator", "metre", "World between 85.06°S and 85.06°N",
+     "+proj=merc +a=6378137 +b=6378137 +lat_ts=0 +lon_0=0 +x_0=0 +y_0=0 +k=1 +units=m +nadgrids=@null +wktext +no_defs"),
+    (3395, "WGS 84 / World Mercator", "metre", "World between 80°S and 84°N",
+     "+proj=merc +lon_0=0 +k=1 +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"),
+    (4087, "WGS 84 / World Equidistant Cylindrical", "metre", "World",
+     "+proj=eqc +lat_ts=0 +lat_0=0 +lon_0=0 +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"),
+    (8857, "WGS 84 / Equal Earth Greenwich", "metre", "World",
+     "+proj=eqearth +lon_0=0 +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"),
+    (6933, "WGS 84 / NSIDC EASE-Grid 2.0 Global", "metre", "World between 86°S and 86°N",
+     "+proj=cea +lat_ts=30 +lon_0=0 +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"),
+    (3413, "WGS 84 / NSIDC Sea Ice Polar Stereographic North", "metre", "Northern hemisphere north of 60°N",
+     "+proj=stere +lat_0=90 +lat_ts=70 +lon_0=-45 +k=1 +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"),
+    (3976, "WGS 84 / NSIDC Sea Ice Polar Stereographic South", "metre", "Southern hemisphere south of 60°S",
+     "+proj=stere +lat_0=-90 +lat_ts=-70 +lon_0=0 +k=1 +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"),
+    (3031, "WGS 84 / Antarctic Polar Stereographic", "metre", "Antarctica",
+     "+proj=stere +lat_0=-90 +lat_ts=-71 +lon_0=0 +k=1 +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"),
+    (27700, "OSGB36 / British National Grid", "metre", "United Kingdom",
+     "+proj=tmerc +lat_0=49 +lon_0=-2 +k=0.9996012717 +x_0=400000 +y_0=-100000 +ellps=airy +units=m +no_defs"),
+    (2154, "RGF93 v1 / Lambert-93", "metre", "France",
+     "+proj=lcc +lat_0=46.5 +lon_0=3 +lat_1=49 +lat_2=44 +x_0=700000 +y_0=6600000 +ellps=GRS80 +units=m +no_defs"),
+    (3035, "ETRS89-extended / LAEA Europe", "metre", "Europe",
+     "+proj=laea +lat_0=52 +lon_0=10 +x_0=4321000 +y_0=3210000 +ellps=GRS80 +units=m +no_defs"),
+    (3034, "ETRS89-extended / LCC Europe", "metre", "Europe",
+     "+proj=lcc +lat_0=52 +lon_0=10 +lat_1=35 +lat_2=65 +x_0=4000000 +y_0=2800000 +ellps=GRS80 +units=m +no_defs"),
+    (28992, "Amersfoort / RD New", "metre", "Netherlands",
+     "+proj=sterea +lat_0=52.1561605555556 +lon_0=5.38763888888889 +k=0.9999079 +x_0=155000 +y_0=463000 +ellps=bessel +units=m +no_defs"),
+    (31370, "Belge 1972 / Belgian Lambert 72", "metre", "Belgium",
+     "+proj=lcc +lat_0=90 +lon_0=4.36748666666667 +lat_1=51.1666672333333 +lat_2=49.8333339 +x_0=150000.013 +y_0=5400088.438 +ellps=intl +units=m +no_defs"),
+    (2056, "CH1903+ / LV95", "metre", "Switzerland and Liechtenstein",
+     "+proj=somerc +lat_0=46.9524055555556 +lon_0=7.43958333333333 +k_0=1 +x_0=2600000 +y_0=1200000 +ellps=bessel +units=m +no_defs"),
+    (21781, "CH1903 / LV03", "metre", "Switzerland and Liechtenstein",
+     "+proj=somerc +lat_0=46.9524055555556 +lon_0=7.43958333333333 +k_0=1 +x_0=600000 +y_0=200000 +ellps=bessel +units=m +no_defs"),
+    (3067, "ETRS89 / TM35FIN(E,N)", "metre", "Finland", "+proj=utm +zone=35 +ellps=GRS80 +units=m +no_defs"),
+    (3006, "SWEREF99 TM", "metre", "Sweden", "+proj=utm +zone=33 +ellps=GRS80 +units=m +no_defs"),
+    (2180, "ETRF2000-PL / CS92", "metre", "Poland",
+     "+proj=tmerc +lat_0=0 +lon_0=19 +k=0.9993 +x_0=500000 +y_0=-5300000 +ellps=GRS80 +units=m +no_defs"),
+    (5070, "NAD83 / Conus Albers", "metre", "United States (CONUS)",
+     "+proj=aea +lat_0=23 +lon_0=-96 +lat_1=29.5 +lat_2=45.5 +x_0=0 +y_0=0 +datum=NAD83 +units=m +no_defs"),
+    (3338, "NAD83 / Alaska Albers", "metre", "United States (Alaska)",
+     "+proj=aea +lat_0=50 +lon_0=-154 +lat_1=55 +lat_2=65 +x_0=0 +y_0=0 +datum=NAD83 +units=m +no_defs"),
+    (2263, "NAD83 / New York Long Island (ftUS)", "US survey foot", "United States (New York - Long Island)",
+     "+proj=lcc +lat_0=40.1666666666667 +lon_0=-74 +lat_1=41.0333333333333 +lat_2=40.6666666666667 +x_0=300000 +y_0=0 +datum=NAD83 +units=us-ft +no_defs"),
+    (3978, "NAD83 / Canada Atlas Lambert", "metre", "Canada",
+     "+proj=lcc +lat_0=49 +lon_0=-95 +lat_1=49 +lat_2=77 +x_0=0 +y_0=0 +datum=NAD83 +units=m +no_defs"),
+    (3347, "NAD83 / Statistics Canada Lambert", "metre", "Canada",
+     "+proj=lcc +lat_0=63.390675 +lon_0=-91.8666666666667 +lat_1=49 +lat_2=77 +x_0=6200000 +y_0=3000000 +datum=NAD83 +units=m +no_defs"),
+    (3577, "GDA94 / Australian Albers", "metre", "Australia",
+     "+proj=aea +lat_0=0 +lon_0=132 +lat_1=-18 +lat_2=-36 +x_0=0 +y_0=0 +ellps=GRS80 +units=m +no_defs"),
+    (2193, "NZGD2000 / New Zealand Transverse Mercator 2000", "metre", "New Zealand",
+     "+proj=tmerc +lat_0=0 +lon_0=173 +k=0.9996 +x_0=1600000 +y_0=10000000 +ellps=GRS80 +units=m +no_defs"),
+    (3414, "SVY21 / Singapore TM", "metre", "Singapore",
+     "+proj=tmerc +lat_0=1.36666666666667 +lon_0=103.833333333333 +k=1 +x_0=28001.642 +y_0=38744.572 +ellps=WGS84 +units=m +no_defs"),
+    (2039, "Israel 1993 / Israeli TM Grid", "metre", "Israel",
+     "+proj=tmerc +lat_0=31.7343936111111 +lon_0=35.2045169444444 +k=1.0000067 +x_0=219529.584 +y_0=626907.39 +ellps=GRS80 +units=m +no_defs"),
+    (3826, "TWD97 / TM2 zone 121", "metre", "Taiwan",
+     "+proj=tmerc +lat_0=0 +lon_0=121 +k=0.9999 +x_0=250000 +y_0=0 +ellps=GRS80 +units=m +no_defs"),
+    (5179, "Korea 2000 / Unified CS", "metre", "Republic of Korea (South Korea)",
+     "+proj=tmerc +lat_0=38 +lon_0=127.5 +k=0.9996 +x_0=1000000 +y_0=2000000 +ellps=GRS80 +units=m +no_defs"),
+)
+
+# Zoned UTM families generated from (first code, first zone, last zone, name, area, proj suffix)
+_UTM_FAMILIES = (
+    (32601, 1, 60, "WGS 84 / UTM zone {zone}N", "Northern hemisphere", "+datum=WGS84"),
+    (32701, 1, 60, "WGS 84 / UTM zone {zone}S", "Southern hemisphere", "+south +datum=WGS84"),
+    (25828, 28, 38, "ETRS89 / UTM zone {zone}N", "Europe", "+ellps=GRS80"),
+    (26901, 1, 23, "NAD83 / UTM zone {zone}N", "North America", "+datum=NAD83"),
+    (28348, 48, 58, "GDA94 / MGA zone {zone}", "Australia", "+south +ellps=GRS80"),
+    (7846, 46, 59, "GDA2020 / MGA zone {zone}", "Australia", "+south +ellps=GRS80"),
+)
+
+
+def _utm_rows():
+    for first_code, first_zone, last_zone, name, region, suffix in _UTM_FAMILIES:
+        for zone in range(first_zone, last_zone + 1):
+            west = (zone - 1) * 6 - 180
+            area = f"{region}, {abs(west)}°{'W' if west < 0 else 'E'} to {abs(west + 6)}°{'W' if west + 6 < 0 else 'E'}"
+            yield (
+                first_code + zone - first_zone,
+                name.format(zone=zone),
+                "metre",
+                area,
+                f"+proj=utm +zone={zone} {suffix} +units=m +no_defs",
+            )
+
+
+def _normalize(text):
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+# Catalog rows kept in one tuple, with integer positions used by both indexes
+_ROWS = tuple(CRS(*row) for row in (*_BASE_CATALOG, *_utm_rows()))
+_BY_CODE = {crs.code: i for i, crs in enumerate(_ROWS)}
+
+# Sorted (key, row) pairs for prefix search on the full name and on every word of it
+_NAME_KEYS = sorted(
+    {(key, i) for i, crs in enumerate(_ROWS)
+     for key in (_normalize(crs.name), *_normalize(crs.name).split())}
+)
+_NAME_KEY_STRINGS = [key for key, _ in _NAME_KEYS]
+
+# Sorted (key, row) pairs for spotting CRS named in free text: the full name
+# and, for projected systems, the part after the slash ("British National Grid")
+_MENTION_KEYS = sorted(
+    {(key, i) for i, crs in enumerate(_ROWS)
+     for key in (_normalize(crs.name), _normalize(crs.name.partition(" / ")[2])) if key}
+)
+_MENTION_KEY_STRINGS = [key for key, _ in _MENTION_KEYS]
+
+# Most catalog entries added to the prompt for CRS named without a code
+MAX_NAMED_CRS = 5
+
+_EPSG_RE = re.compile(r"\b(?:epsg|crs)\s*[:#]?\s*(\d{4,5})\b", re.IGNORECASE)
+
+# Words that may surround a code in a plain "what is EPSG:xxxx" lookup
+_LOOKUP_FILLER = {
+    "what", "whats", "which", "is", "are", "the", "a", "an", "of", "for", "about", "tell", "me",
+    "explain", "describe", "show", "give", "info", "information", "details", "definition",
+    "define", "code", "codes", "epsg", "crs", "srid", "and", "please", "proj", "string",
+}
+
+
+def get_crs(code):
+    """Look up a CRS by EPSG code"""
+    i = _BY_CODE.get(int(code))
+    return _ROWS[i] if i is not None else None
+
+
+def _prefixed(keys, key_strings, prefix):
+    # Positions in a sorted key list whose key starts with prefix
+    pos = bisect_left(key_strings, prefix)
+    while pos < len(keys) and key_strings[pos].startswith(prefix):
+        yield pos
+        pos += 1
+
+
+def search_crs(prefix, limit=10):
+    """Find CRS entries whose name, or any word of it, starts with prefix"""
+    prefix = _normalize(prefix)
+    if not prefix:
+        return []
+    rows = {_NAME_KEYS[pos][1] for pos in _prefixed(_NAME_KEYS, _NAME_KEY_STRINGS, prefix)}
+    return sorted((_ROWS[i] for i in rows), key=lambda crs: crs.code)[:limit]
+
+
+def find_crs_names(text, limit=MAX_NAMED_CRS):
+    """Return catalog entries named in text without their code, e.g. 'British National Grid'"""
+    words = _normalize(text).split()
+    found = []
+    start = 0
+    while start < len(words) and len(found) < limit:
+        # Extend the phrase one word at a time while some key still starts with it
+        longest, rows = start, []
+        for end in range(start + 1, len(words) + 1):
+            phrase = " ".join(words[start:end])
+            matches = list(_prefixed(_MENTION_KEYS, _MENTION_KEY_STRINGS, phrase))
+            if not matches:
+                break
+            exact = [_MENTION_KEYS[pos][1] for pos in matches if _MENTION_KEY_STRINGS[pos] == phrase]
+            if exact:
+                longest, rows = end, exact
+        for i in rows:
+            if _ROWS[i] not in found:
+                found.append(_ROWS[i])
+        start = max(longest, start + 1)
+    return found[:limit]
+
+
+def _mentioned_codes(text):
+    # Every EPSG code mentioned in text, catalogued or not, in order of appearance
+    codes = []
+    for match in _EPSG_RE.finditer(text):
+        code = int(match.group(1))
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+def find_crs_codes(text):
+    """Return catalogued EPSG codes mentioned in text, in order of appearance"""
+    return [code for code in _mentioned_codes(text) if code in _BY_CODE]
+
+
+def format_crs(crs):
+    """Format a CRS entry as Markdown"""
+    return (
+        f"**EPSG:{crs.code} — {crs.name}**\n\n"
+        f"- **Units:** {crs.units}\n"
+        f"- **Area of use:** {crs.area}\n"
+        f"- **PROJ string:** `{crs.proj}`"
+    )
+
+
+def answer_crs_question(text):
+    """Answer plain EPSG lookups locally, or return None if the LLM is needed"""
+    mentioned = _mentioned_codes(text)
+    codes = [code for code in mentioned if code in _BY_CODE]
+    if not codes:
+        return None
+    remainder = _EPSG_RE.sub(" ", text)
+    if any(word not in _LOOKUP_FILLER for word in _normalize(remainder).split()):
+        return None
+    parts = [format_crs(get_crs(code)) for code in codes]
+    unknown = [f"EPSG:{code}" for code in mentioned if code not in _BY_CODE]
+    if unknown:
+        parts.append(f"*{', '.join(unknown)} {'is' if len(unknown) == 1 else 'are'} not in the local CRS catalog.*")
+    return "\n\n".join(parts)
+
+
+def crs_context(text):
+    """Reference facts for CRS mentioned in text by code or by name, for grounding the prompt"""
+    mentioned = _mentioned_codes(text)
+    entries = [get_crs(code) for code in mentioned if code in _BY_CODE]
+    entries += [crs for crs in find_crs_names(text) if crs not in entries]
+    unknown = [code for code in mentioned if code not in _BY_CODE]
+    if not entries and not unknown:
+        return ""
+    lines = ["Authoritative reference data for coordinate systems mentioned by the user:"]
+    for crs in entries:
+        lines.append(f"- EPSG:{crs.code} {crs.name}; units: {crs.units}; area of use: {crs.area}; proj: {crs.proj}")
+    for code in unknown:
+        lines.append(f"- EPSG:{code} is not in this reference data")
+    return "\n".join(lines)
@@ -0,0 +1,73 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+EVENT_LOG_FILE = os.environ.get("GEOADVISOR_EVENT_LOG", os.path.join("logs", "events.jsonl"))
+
+# The log rotates at this size, keeping EVENT_LOG_BACKUPS older files
+EVENT_LOG_MAX_BYTES = int(os.environ.get("GEOADVISOR_EVENT_LOG_MAX_BYTES", 10 * 1024 * 1024))
+EVENT_LOG_BACKUPS = 5
+
+logger = logging.getLogger("geoadvisor.events")
+logger.setLevel(logging.INFO)
+# Events are only written once an entry point calls setup_event_logging
+logger.propagate = False
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, event name and the event's fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "event": record.msg,
+            "pid": record.process,
+            **getattr(record, "fields", {}),
+        }
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _EventQueueHandler(logging.handlers.QueueHandler):
+    # The stock prepare() formats the message on the calling thread; events
+    # are formatted by the writer thread instead, keeping the request path short
+    def prepare(self, record):
+        return record
+
+
+def setup_event_logging(path=EVENT_LOG_FILE, max_bytes=EVENT_LOG_MAX_BYTES, backups=EVENT_LOG_BACKUPS,
+                        extra_handlers=()):
+    """Send events through an in-memory queue to a rotating JSONL file; safe to call repeatedly
+
+    extra_handlers also receive every event on the background writer thread.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter())
+        events = queue.SimpleQueue()
+        logger.addHandler(_EventQueueHandler(events))
+        _listener = logging.handlers.QueueListener(events, file_handler, *extra_handlers)
+        _listener.start()
+        # Write out whatever is still queued when the process exits
+        atexit.register(_listener.stop)
+
+
+def log_event(event, level=logging.INFO, **fields):
+    """Record a structured event; a no-op until setup_event_logging has run"""
+    if logger.handlers:
+        logger.log(level, event, extra={"fields": fields})
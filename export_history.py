@@ -0,0 +1,112 @@
+import argparse
+import json
+import io
+import sys
+
+import chat_store
+from json_stream import JsonStream
+
+DEFAULT_USER_DATA_FILE = "user_data.json"
+
+
+def _record(username, thread_id, title, position, turn):
+    return {
+        "username": username,
+        "thread_id": thread_id,
+        "thread_title": title,
+        "position": position,
+        "timestamp": turn.get("timestamp"),
+        "user": turn.get("user", ""),
+        "assistant": turn.get("assistant", ""),
+    }
+
+
+def iter_export_records(user_data_file=DEFAULT_USER_DATA_FILE, usernames=None):
+    """Yield one flat record per stored turn, streaming users and threads from disk"""
+    with open(user_data_file, "rb") as f:
+        reader = JsonStream(f)
+        try:
+            for username in reader.iter_object():
+                wanted = usernames is None or username in usernames
+                threads = {}
+                for key in reader.iter_object():
+                    if key == "chat_history" and reader.peek() == "[":
+                        # Histories not yet migrated to threads are streamed item by item
+                        for position, turn in enumerate(reader.iter_array()):
+                            if wanted:
+                                yield _record(username, "legacy", "Conversation history", position, turn)
+                    elif key == "threads":
+                        threads = reader.decode()
+                    else:
+                        reader.decode()
+                if not wanted:
+                    continue
+                for thread_id, thread in threads.items():
+                    for position, turn in enumerate(chat_store.iter_turns(username, thread_id)):
+                        yield _record(username, thread_id, thread["title"], position, turn)
+        finally:
+            reader.detach()
+
+
+def iter_jsonl(records):
+    """Render records as JSON Lines"""
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def iter_markdown(records):
+    """Render records as a Markdown transcript grouped by user and thread"""
+    current_user = current_thread = None
+    for record in records:
+        if record["username"] != current_user:
+            current_user, current_thread = record["username"], None
+            yield f"# GeoAdvisor transcript: {current_user}\n\n"
+        if record["thread_id"] != current_thread:
+            current_thread = record["thread_id"]
+            yield f"## 💬 {record['thread_title']}\n\n"
+        yield (
+            f"### 👤 You · {record['timestamp']}\n\n{record['user']}\n\n"
+            f"### 🤖 GeoAdvisor\n\n{record['assistant']}\n\n---\n\n"
+        )
+
+
+EXPORT_FORMATS = {
+    "jsonl": (iter_jsonl, "jsonl", "application/jsonl"),
+    "markdown": (iter_markdown, "md", "text/markdown"),
+}
+
+
+def iter_export(fmt, user_data_file=DEFAULT_USER_DATA_FILE, usernames=None):
+    """Stream an export in the given format as text chunks"""
+    render = EXPORT_FORMATS[fmt][0]
+    return render(iter_export_records(user_data_file, usernames))
+
+
+def export_bytes(fmt, user_data_file=DEFAULT_USER_DATA_FILE, usernames=None):
+    """Render a complete export as UTF-8 bytes, encoding chunk by chunk"""
+    out = io.BytesIO()
+    for chunk in iter_export(fmt, user_data_file, usernames):
+        out.write(chunk.encode("utf-8"))
+    return out.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export GeoAdvisor chat history as JSONL or Markdown")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="jsonl")
+    parser.add_argument("--user", action="append", dest="users", help="Export only this user (repeatable)")
+    parser.add_argument("--data", default=DEFAULT_USER_DATA_FILE, help="Path to the user data file")
+    parser.add_argument("--output", "-o", default="-", help="Output file, or - for stdout")
+    args = parser.parse_args(argv)
+
+    usernames = set(args.users) if args.users else None
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for chunk in iter_export(args.format, args.data, usernames):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from json_stream import CHUNK_SIZE, JsonStream
+
+# Features whose coordinates are reduced together
+BATCH_SIZE = 2000
+
+# Cap on distinct attribute names tracked in the schema
+MAX_SCHEMA_FIELDS = 200
+
+
+def iter_features(reader, header=None):
+    """Stream features from a FeatureCollection, Feature, geometry or GeoJSON sequence"""
+    while reader.peek():
+        members = {}
+        for key in reader.iter_object():
+            if key == "features" and reader.peek() == "[":
+                yield from reader.iter_array()
+            else:
+                members[key] = reader.decode()
+        kind = members.get("type")
+        if kind == "Feature":
+            yield members
+        elif kind not in (None, "FeatureCollection"):
+            yield {"type": "Feature", "geometry": members, "properties": {}}
+        elif header is not None:
+            header.update(members)
+
+
+def _collect_rings(coords, out):
+    # Append every innermost list of positions found in a coordinates value
+    if not coords:
+        return
+    if isinstance(coords[0], (int, float)):
+        out.append([coords])
+    elif not coords[0]:
+        # Empty ring or part, e.g. [[]]; its siblings may still hold positions
+        for part in coords[1:]:
+            _collect_rings(part, out)
+    elif isinstance(coords[0][0], (int, float)):
+        out.append(coords)
+    else:
+        for part in coords:
+            _collect_rings(part, out)
+
+
+def _geometry_rings(geometry, out):
+    if geometry.get("type") == "GeometryCollection":
+        for part in geometry.get("geometries") or []:
+            _geometry_rings(part, out)
+    else:
+        _collect_rings(geometry.get("coordinates") or [], out)
+
+
+def _ring_array(ring):
+    # NumPy refuses ragged input, so mixed 2D/3D (or malformed) positions are
+    # trimmed to x, y before the array is built
+    if len({len(p) for p in ring}) != 1:
+        ring = [p[:2] for p in ring if len(p) >= 2]
+    if not ring or len(ring[0]) < 2:
+        return np.empty((0, 2))
+    return np.asarray(ring, dtype=float)[:, :2]
+
+
+def _json_type(value):
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return "array" if isinstance(value, list) else "object"
+
+
+def summarize_geojson(source, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE):
+    """Summarize a GeoJSON file (path or binary/text stream) in a single streaming pass"""
+    if isinstance(source, (str, bytes)) and not hasattr(source, "read"):
+        with open(source, "rb") as f:
+            return summarize_geojson(f, chunk_size, batch_size)
+    reader = JsonStream(source, chunk_size)
+
+    header = {}
+    geometry_types = Counter()
+    schema = {}
+    vertex_counts = array("I")
+    bbox = np.array([np.inf, np.inf, -np.inf, -np.inf])
+    feature_count = 0
+    empty_geometries = 0
+    batch_rings = []
+
+    def flush():
+        if batch_rings:
+            coords = np.concatenate([_ring_array(r) for r in batch_rings])
+            if len(coords):
+                np.minimum(bbox[:2], coords.min(axis=0), out=bbox[:2])
+                np.maximum(bbox[2:], coords.max(axis=0), out=bbox[2:])
+            batch_rings.clear()
+
+    try:
+        for feature in iter_features(reader, header):
+            feature_count += 1
+            geometry = feature.get("geometry")
+            if not geometry:
+                empty_geometries += 1
+                geometry_types["null"] += 1
+                vertex_counts.append(0)
+            else:
+                geometry_types[geometry.get("type", "unknown")] += 1
+                rings = []
+                _geometry_rings(geometry, rings)
+                vertex_counts.append(sum(len(r) for r in rings))
+                batch_rings.extend(rings)
+
+            for key, value in (feature.get("properties") or {}).items():
+                if key not in schema:
+                    if len(schema) >= MAX_SCHEMA_FIELDS:
+                        continue
+                    schema[key] = Counter()
+                schema[key][_json_type(value)] += 1
+
+            if feature_count % batch_size == 0:
+                flush()
+        flush()
+    finally:
+        reader.detach()
+
+    counts = np.frombuffer(vertex_counts, dtype=np.uint32) if vertex_counts else np.zeros(0, dtype=np.uint32)
+    summary = {
+        "feature_count": feature_count,
+        "empty_geometries": empty_geometries,
+        "geometry_types": dict(geometry_types.most_common()),
+        "bbox": [round(float(v), 6) for v in bbox] if np.isfinite(bbox).all() else None,
+        "schema": {key: dict(types.most_common()) for key, types in schema.items()},
+        "vertices": None,
+        "crs": (((header.get("crs") or {}).get("properties") or {}).get("name")),
+        "name": header.get("name"),
+    }
+    if counts.size:
+        p50, p90, p99 = np.percentile(counts, [50, 90, 99])
+        summary["vertices"] = {
+            "total": int(counts.sum(dtype=np.uint64)),
+            "min": int(counts.min()),
+            "mean": round(float(counts.mean()), 1),
+            "p50": float(p50),
+            "p90": float(p90),
+            "p99": float(p99),
+            "max": int(counts.max()),
+        }
+    return summary
+
+
+def format_geojson_summary(filename, summary, max_fields=40):
+    """Render a GeoJSON summary as compact prompt context"""
+    lines = [f"The user attached the GeoJSON file '{filename}'. Summary computed locally:"]
+    if summary["name"]:
+        lines.append(f"- Layer name: {summary['name']}")
+    lines.append(f"- Features: {summary['feature_count']} ({summary['empty_geometries']} without geometry)")
+    types = ", ".join(f"{k}: {v}" for k, v in summary["geometry_types"].items())
+    lines.append(f"- Geometry types: {types or 'none'}")
+    if summary["bbox"]:
+        lines.append(f"- Bounding box [minx, miny, maxx, maxy]: {summary['bbox']}")
+    lines.append(f"- CRS: {summary['crs'] or 'not declared (GeoJSON default is WGS 84 / EPSG:4326)'}")
+    if summary["vertices"]:
+        v = summary["vertices"]
+        lines.append(
+            f"- Vertices per feature: total {v['total']}, min {v['min']}, median {v['p50']:g}, "
+            f"mean {v['mean']}, p90 {v['p90']:g}, p99 {v['p99']:g}, max {v['max']}"
+        )
+    fields = list(summary["schema"].items())
+    if fields:
+        shown = "; ".join(f"{k} ({'/'.join(types)})" for k, types in fields[:max_fields])
+        more = f" and {len(fields) - max_fields} more" if len(fields) > max_fields else ""
+        lines.append(f"- Attributes ({len(fields)}): {shown}{more}")
+    return "\n".join(lines)
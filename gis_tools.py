@@ -0,0 +1,436 @@
+import json
+
+import numpy as np
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# Mean and authalic (equal-area) sphere radii in meters
+EARTH_MEAN_RADIUS = 6371008.8
+EARTH_AUTHALIC_RADIUS = 6371007.181
+
+# Web Mercator (EPSG:3857) latitude limit
+WEB_MERCATOR_MAX_LAT = 85.05112878
+
+UTM_K0 = 0.9996
+UTM_FALSE_EASTING = 500000.0
+UTM_FALSE_NORTHING_SOUTH = 10000000.0
+
+# Latitudes covered by the UTM grid; the polar caps use UPS instead
+UTM_MIN_LAT = -80.0
+UTM_MAX_LAT = 84.0
+
+# Krüger series coefficients for the transverse Mercator projection
+_N = WGS84_F / (2 - WGS84_F)
+_TM_A = WGS84_A / (1 + _N) * (1 + _N ** 2 / 4 + _N ** 4 / 64)
+_TM_ALPHA = (
+    _N / 2 - 2 / 3 * _N ** 2 + 5 / 16 * _N ** 3,
+    13 / 48 * _N ** 2 - 3 / 5 * _N ** 3,
+    61 / 240 * _N ** 3,
+)
+_TM_BETA = (
+    _N / 2 - 2 / 3 * _N ** 2 + 37 / 96 * _N ** 3,
+    1 / 48 * _N ** 2 + 1 / 15 * _N ** 3,
+    17 / 480 * _N ** 3,
+)
+_TM_DELTA = (
+    2 * _N - 2 / 3 * _N ** 2 - 2 * _N ** 3,
+    7 / 3 * _N ** 2 - 8 / 5 * _N ** 3,
+    56 / 15 * _N ** 3,
+)
+
+
+def haversine_distance(lat1, lon1, lat2, lon2, radius=EARTH_MEAN_RADIUS):
+    """Great-circle distance in meters on a sphere (vectorized)"""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlam = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    h = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+    return 2 * radius * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def vincenty_distance(lat1, lon1, lat2, lon2, max_iter=200, tol=1e-12):
+    """Ellipsoidal (WGS84) distance in meters, NaN where Vincenty does not converge"""
+    f, a, b = WGS84_F, WGS84_A, WGS84_B
+    L = np.radians(np.asarray(lon2, dtype=float) - np.asarray(lon1, dtype=float))
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L
+    converged = np.zeros(np.broadcast(L, U1, U2).shape, dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            converged = np.abs(lam - lam_prev) < tol
+            if np.all(converged):
+                break
+
+        u2 = cos2_alpha * (a ** 2 - b ** 2) / b ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (
+            cos_2sigma_m + B / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+            )
+        )
+        distance = b * A * (sigma - delta_sigma)
+    return np.where(converged, distance, np.nan)
+
+
+def initial_bearing(lat1, lon1, lat2, lon2):
+    """Initial great-circle bearing in degrees clockwise from north (vectorized)"""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dlam = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    x = np.sin(dlam) * np.cos(phi2)
+    y = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlam)
+    return (np.degrees(np.arctan2(x, y)) + 360.0) % 360.0
+
+
+def planar_polygon_area(x, y):
+    """Shoelace area of a ring given in projected units (result in units squared)"""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    return 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+def geodesic_polygon_area(lat, lon, radius=EARTH_AUTHALIC_RADIUS):
+    """Area in square meters of a lat/lon ring on the authalic sphere"""
+    phi = np.radians(np.asarray(lat, dtype=float))
+    lam = np.radians(np.asarray(lon, dtype=float))
+    dlam = np.roll(lam, -1) - lam
+    # Wrap edges crossing the antimeridian
+    dlam = (dlam + np.pi) % (2 * np.pi) - np.pi
+    total = np.sum(dlam * (2 + np.sin(phi) + np.sin(np.roll(phi, -1))))
+    return abs(total) * radius ** 2 / 2
+
+
+def utm_zone(lat, lon):
+    """UTM zone number, including the Norway and Svalbard exceptions"""
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    zone = (np.floor((lon + 180.0) / 6.0).astype(int) % 60) + 1
+    zone = np.where((lat >= 56) & (lat < 64) & (lon >= 3) & (lon < 12), 32, zone)
+    svalbard = (lat >= 72) & (lat < 84)
+    zone = np.where(svalbard & (lon >= 0) & (lon < 9), 31, zone)
+    zone = np.where(svalbard & (lon >= 9) & (lon < 21), 33, zone)
+    zone = np.where(svalbard & (lon >= 21) & (lon < 33), 35, zone)
+    zone = np.where(svalbard & (lon >= 33) & (lon < 42), 37, zone)
+    return zone
+
+
+def latlon_to_utm(lat, lon, zone=None):
+    """Project WGS84 lat/lon to UTM, returning (easting, northing, zone, is_northern)"""
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    if zone is None:
+        zone = utm_zone(lat, lon)
+    zone = np.asarray(zone)
+    lon0 = np.radians((zone - 1) * 6 - 180 + 3)
+    phi = np.radians(lat)
+    dlam = np.radians(lon) - lon0
+
+    c = 2 * np.sqrt(_N) / (1 + _N)
+    t = np.sinh(np.arctanh(np.sin(phi)) - c * np.arctanh(c * np.sin(phi)))
+    xi = np.arctan2(t, np.cos(dlam))
+    eta = np.arctanh(np.sin(dlam) / np.sqrt(1 + t ** 2))
+
+    easting = eta.copy()
+    northing = xi.copy()
+    for j, alpha in enumerate(_TM_ALPHA, start=1):
+        easting += alpha * np.cos(2 * j * xi) * np.sinh(2 * j * eta)
+        northing += alpha * np.sin(2 * j * xi) * np.cosh(2 * j * eta)
+
+    northern = lat >= 0
+    easting = UTM_FALSE_EASTING + UTM_K0 * _TM_A * easting
+    northing = np.where(northern, 0.0, UTM_FALSE_NORTHING_SOUTH) + UTM_K0 * _TM_A * northing
+    return easting, northing, zone, northern
+
+
+def utm_to_latlon(easting, northing, zone, northern=True):
+    """Inverse UTM projection back to WGS84 (lat, lon) in degrees"""
+    easting = np.asarray(easting, dtype=float)
+    northing = np.asarray(northing, dtype=float)
+    n0 = np.where(np.asarray(northern), 0.0, UTM_FALSE_NORTHING_SOUTH)
+    xi = (northing - n0) / (UTM_K0 * _TM_A)
+    eta = (easting - UTM_FALSE_EASTING) / (UTM_K0 * _TM_A)
+
+    xi_p, eta_p = xi.copy(), eta.copy()
+    for j, beta in enumerate(_TM_BETA, start=1):
+        xi_p -= beta * np.sin(2 * j * xi) * np.cosh(2 * j * eta)
+        eta_p -= beta * np.cos(2 * j * xi) * np.sinh(2 * j * eta)
+
+    chi = np.arcsin(np.sin(xi_p) / np.cosh(eta_p))
+    phi = chi.copy()
+    for j, delta in enumerate(_TM_DELTA, start=1):
+        phi += delta * np.sin(2 * j * chi)
+
+    lon0 = np.radians((np.asarray(zone) - 1) * 6 - 180 + 3)
+    lam = lon0 + np.arctan2(np.sinh(eta_p), np.cos(xi_p))
+    return np.degrees(phi), np.degrees(lam)
+
+
+def latlon_to_web_mercator(lat, lon):
+    """Project WGS84 lat/lon to Web Mercator (EPSG:3857) meters"""
+    lat = np.clip(np.asarray(lat, dtype=float), -WEB_MERCATOR_MAX_LAT, WEB_MERCATOR_MAX_LAT)
+    x = WGS84_A * np.radians(lon)
+    y = WGS84_A * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    return x, y
+
+
+def web_mercator_to_latlon(x, y):
+    """Inverse Web Mercator back to WGS84 (lat, lon) in degrees"""
+    lon = np.degrees(np.asarray(x, dtype=float) / WGS84_A)
+    lat = np.degrees(2 * np.arctan(np.exp(np.asarray(y, dtype=float) / WGS84_A)) - np.pi / 2)
+    return lat, lon
+
+
+# Tool definitions exposed to the LLM through function calling
+_POINTS_SCHEMA = {
+    "type": "array",
+    "description": "Ordered list of [latitude, longitude] pairs in decimal degrees (WGS84)",
+    "items": {"type": "array", "items": {"type": "number"}, "minItems": 2, "maxItems": 2},
+    "minItems": 2,
+}
+
+GIS_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "distance",
+            "description": "Exact distance between consecutive points of a path. Use for any 'how far' question with coordinates.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "points": _POINTS_SCHEMA,
+                    "method": {
+                        "type": "string",
+                        "enum": ["vincenty", "haversine"],
+                        "description": "vincenty (WGS84 ellipsoid, default) or haversine (sphere)",
+                    },
+                },
+                "required": ["points"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "bearing",
+            "description": "Initial great-circle bearing (degrees from north) between consecutive points.",
+            "parameters": {
+                "type": "object",
+                "properties": {"points": _POINTS_SCHEMA},
+                "required": ["points"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "polygon_area",
+            "description": "Area and perimeter of a polygon ring. Coordinates use GeoJSON order.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "coordinates": {
+                        "type": "array",
+                        "description": "Ring vertices as [longitude, latitude] (geodesic) or [x, y] in projected units (planar)",
+                        "items": {"type": "array", "items": {"type": "number"}, "minItems": 2, "maxItems": 2},
+                        "minItems": 3,
+                    },
+                    "method": {
+                        "type": "string",
+                        "enum": ["geodesic", "planar"],
+                        "description": "geodesic for lon/lat input (default), planar for projected coordinates",
+                    },
+                },
+                "required": ["coordinates"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "to_projected",
+            "description": "Convert WGS84 latitude/longitude to UTM (80°S to 84°N) or Web Mercator (EPSG:3857).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "lat": {"type": "number"},
+                    "lon": {"type": "number"},
+                    "target": {"type": "string", "enum": ["utm", "web_mercator"]},
+                    "zone": {
+                        "type": "integer", "minimum": 1, "maximum": 60,
+                        "description": "Force a UTM zone instead of the natural one",
+                    },
+                },
+                "required": ["lat", "lon", "target"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "from_projected",
+            "description": "Convert UTM or Web Mercator coordinates back to WGS84 latitude/longitude.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "x": {"type": "number", "description": "Easting / x in meters"},
+                    "y": {"type": "number", "description": "Northing / y in meters"},
+                    "source": {"type": "string", "enum": ["utm", "web_mercator"]},
+                    "zone": {
+                        "type": "integer", "minimum": 1, "maximum": 60,
+                        "description": "UTM zone number (required for utm)",
+                    },
+                    "hemisphere": {"type": "string", "enum": ["N", "S"], "description": "UTM hemisphere (default N)"},
+                },
+                "required": ["x", "y", "source"],
+            },
+        },
+    },
+]
+
+TOOL_PROMPT = """You have exact local tools for distances, bearings, polygon areas and UTM/Web Mercator conversions. Whenever a question contains concrete coordinates for one of these, call the tool instead of calculating by hand, then state the result briefly with its units."""
+
+
+def _check_latlon(lat, lon):
+    # Out-of-range input would still produce a number, just a meaningless one
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    if not (np.isfinite(lat).all() and np.isfinite(lon).all()):
+        raise ValueError("coordinates must be finite numbers")
+    if (np.abs(lat) > 90).any():
+        raise ValueError("latitude must be between -90 and 90 degrees")
+    if (np.abs(lon) > 180).any():
+        raise ValueError("longitude must be between -180 and 180 degrees")
+
+
+def _check_utm(lat=None, zone=None):
+    # Outside the grid the projection yields NaN, which is not valid JSON in a tool result
+    if lat is not None and not UTM_MIN_LAT <= lat <= UTM_MAX_LAT:
+        raise ValueError(f"latitude must be between {UTM_MIN_LAT:g} and {UTM_MAX_LAT:g} degrees for UTM")
+    if zone is not None and not (float(zone).is_integer() and 1 <= float(zone) <= 60):
+        raise ValueError("zone must be an integer between 1 and 60")
+
+
+def _points(args):
+    pts = np.asarray(args["points"], dtype=float)
+    if pts.ndim != 2 or pts.shape[0] < 2 or pts.shape[1] != 2:
+        raise ValueError("points must be a list of at least two [lat, lon] pairs")
+    _check_latlon(pts[:, 0], pts[:, 1])
+    return pts[:-1, 0], pts[:-1, 1], pts[1:, 0], pts[1:, 1]
+
+
+def _tool_distance(args):
+    lat1, lon1, lat2, lon2 = _points(args)
+    method = args.get("method", "vincenty")
+    if method == "haversine":
+        legs = haversine_distance(lat1, lon1, lat2, lon2)
+    else:
+        legs = vincenty_distance(lat1, lon1, lat2, lon2)
+        # Fall back to haversine for near-antipodal legs
+        legs = np.where(np.isnan(legs), haversine_distance(lat1, lon1, lat2, lon2), legs)
+    return {
+        "method": method,
+        "legs_m": np.round(legs, 3).tolist(),
+        "total_m": round(float(legs.sum()), 3),
+        "total_km": round(float(legs.sum()) / 1000, 6),
+    }
+
+
+def _tool_bearing(args):
+    lat1, lon1, lat2, lon2 = _points(args)
+    return {"bearings_deg": np.round(initial_bearing(lat1, lon1, lat2, lon2), 4).tolist()}
+
+
+def _tool_polygon_area(args):
+    ring = np.asarray(args["coordinates"], dtype=float)
+    if ring.ndim != 2 or ring.shape[1] != 2 or ring.shape[0] < 3:
+        raise ValueError("coordinates must be at least three [x, y] pairs")
+    if np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    method = args.get("method", "geodesic")
+    if method == "planar":
+        closed = np.vstack([ring, ring[:1]])
+        perimeter = float(np.hypot(*np.diff(closed, axis=0).T).sum())
+        return {
+            "method": method,
+            "area_units2": round(float(planar_polygon_area(ring[:, 0], ring[:, 1])), 6),
+            "perimeter_units": round(perimeter, 6),
+        }
+    lon, lat = ring[:, 0], ring[:, 1]
+    _check_latlon(lat, lon)
+    area = geodesic_polygon_area(lat, lon)
+    perimeter = float(vincenty_distance(lat, lon, np.roll(lat, -1), np.roll(lon, -1)).sum())
+    return {
+        "method": method,
+        "area_m2": round(float(area), 3),
+        "area_km2": round(float(area) / 1e6, 6),
+        "area_ha": round(float(area) / 1e4, 4),
+        "perimeter_m": round(perimeter, 3),
+    }
+
+
+def _tool_to_projected(args):
+    lat, lon = float(args["lat"]), float(args["lon"])
+    _check_latlon(lat, lon)
+    if args["target"] == "web_mercator":
+        x, y = latlon_to_web_mercator(lat, lon)
+        return {"crs": "EPSG:3857", "x": round(float(x), 3), "y": round(float(y), 3)}
+    _check_utm(lat, args.get("zone"))
+    easting, northing, zone, northern = latlon_to_utm(lat, lon, args.get("zone"))
+    zone = int(zone)
+    return {
+        "crs": f"EPSG:{(32600 if northern else 32700) + zone}",
+        "zone": f"{zone}{'N' if northern else 'S'}",
+        "easting": round(float(easting), 3),
+        "northing": round(float(northing), 3),
+    }
+
+
+def _tool_from_projected(args):
+    x, y = float(args["x"]), float(args["y"])
+    if args["source"] == "web_mercator":
+        lat, lon = web_mercator_to_latlon(x, y)
+    else:
+        if "zone" not in args:
+            raise ValueError("zone is required for UTM coordinates")
+        _check_utm(zone=args["zone"])
+        northern = args.get("hemisphere", "N").upper() != "S"
+        lat, lon = utm_to_latlon(x, y, int(args["zone"]), northern)
+    return {"lat": round(float(lat), 8), "lon": round(float(lon), 8)}
+
+
+TOOL_HANDLERS = {
+    "distance": _tool_distance,
+    "bearing": _tool_bearing,
+    "polygon_area": _tool_polygon_area,
+    "to_projected": _tool_to_projected,
+    "from_projected": _tool_from_projected,
+}
+
+
+def run_tool(name, arguments):
+    """Execute a tool call locally and return its JSON-encoded result"""
+    handler = TOOL_HANDLERS.get(name)
+    if handler is None:
+        return json.dumps({"error": f"Unknown tool: {name}"})
+    try:
+        args = json.loads(arguments) if isinstance(arguments, str) else dict(arguments or {})
+        return json.dumps(handler(args))
+    except Exception as e:
+        return json.dumps({"error": str(e)})
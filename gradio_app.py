@@ -0,0 +1,152 @@
+import logging
+import os
+import time
+from functools import lru_cache
+
+import gradio as gr
+import groq
+
+import chat_store
+from advisor import (
+    AVAILABLE_MODELS, DEFAULT_MODEL, PROMPT_HISTORY_TURNS, build_context, build_messages, make_client,
+    new_thread_id, persist_turn, stream_completion
+)
+from crs_catalog import answer_crs_question
+from event_log import log_event, setup_event_logging
+from passwords import check_login
+from usage_rollups import RollupHandler, UsageRollups
+from user_store import DEFAULT_USER_DATA_FILE, UserStore
+from warmup import Warmup
+
+USER_DATA_FILE = os.environ.get("GEOADVISOR_USER_DATA", DEFAULT_USER_DATA_FILE)
+
+# Answers generated at once across all users; further requests wait in Gradio's queue
+GRADIO_CONCURRENCY = int(os.environ.get("GEOADVISOR_GRADIO_CONCURRENCY", 16))
+
+# Requests allowed to wait in the queue before new ones are turned away
+QUEUE_MAX_SIZE = int(os.environ.get("GEOADVISOR_GRADIO_QUEUE", 256))
+
+store = UserStore(USER_DATA_FILE)
+
+
+@lru_cache(maxsize=None)
+def client():
+    # Reads GROQ_API_KEY from the environment
+    return make_client()
+
+
+def check_credentials(username, password):
+    """Gradio login check against the shared user store"""
+    ok = check_login(store, username, password)
+    log_event("login", level=logging.INFO if ok else logging.WARNING, username=username,
+              outcome="ok" if ok else "rejected", frontend="gradio")
+    return ok
+
+
+def _user_threads(username):
+    record = store.snapshot().get(username)
+    if record is None:
+        # Deleted while signed in
+        raise gr.Error("Account not found. Please sign in again.")
+    return record.get("threads", {})
+
+
+def _to_chat(turns):
+    chat = []
+    for turn in turns:
+        chat.append({"role": "user", "content": turn["user"]})
+        chat.append({"role": "assistant", "content": turn["assistant"]})
+    return chat
+
+
+def load_latest(request: gr.Request):
+    """Open the user's most recently updated conversation"""
+    threads = _user_threads(request.username)
+    thread_id = max(threads, key=lambda tid: threads[tid]["updated_at"], default=None)
+    if thread_id is None:
+        return [], None
+    return _to_chat(chat_store.load_page(request.username, thread_id, limit=PROMPT_HISTORY_TURNS)[0]), thread_id
+
+
+def respond(message, chat, thread_id, model_name, temperature, max_tokens, request: gr.Request):
+    """Stream an answer into the chat, then store the finished turn"""
+    if not message.strip():
+        yield chat, thread_id, message
+        return
+    username = request.username
+    if thread_id in _user_threads(username):
+        history = chat_store.load_page(username, thread_id, limit=PROMPT_HISTORY_TURNS)[0]
+    else:
+        thread_id, history = new_thread_id(), []
+
+    started = time.perf_counter()
+    log_event("chat_request", username=username, thread_id=thread_id, model=model_name, chars=len(message),
+              max_tokens=max_tokens, frontend="gradio")
+    chat = chat + [{"role": "user", "content": message}, {"role": "assistant", "content": ""}]
+    # Plain EPSG lookups are answered locally, as in the chat
+    answer = answer_crs_question(message)
+    tokens_used = 0
+    source = "crs_catalog" if answer is not None else "model"
+    if answer is None:
+        answer = ""
+        messages = build_messages(message, history, build_context(message))
+        try:
+            for delta, total_tokens in stream_completion(client(), model_name, messages, temperature, max_tokens):
+                if total_tokens is not None:
+                    tokens_used = total_tokens
+                if delta:
+                    answer += delta
+                    chat[-1]["content"] = answer
+                    yield chat, thread_id, ""
+        except groq.GroqError as e:
+            log_event("chat_error", level=logging.ERROR, username=username, model=model_name,
+                      error_type=type(e).__name__, error=str(e), frontend="gradio")
+            raise gr.Error(f"Model request failed: {e}")
+    chat[-1]["content"] = answer
+    persist_turn(store, username, thread_id, message, answer, tokens_used)
+    log_event("chat_response", username=username, thread_id=thread_id, model=model_name, source=source,
+              tokens=tokens_used, chars=len(answer), ms=round((time.perf_counter() - started) * 1000, 1),
+              frontend="gradio")
+    yield chat, thread_id, ""
+
+
+def build_demo():
+    """The Gradio Blocks UI"""
+    with gr.Blocks(title="GeoAdvisor") as demo:
+        gr.Markdown("# 🌍 GeoAdvisor\nYour AI assistant for GIS, spatial analysis and geospatial programming")
+        thread_id = gr.State(None)
+        chatbot = gr.Chatbot(height=520, label="GeoAdvisor")
+        with gr.Row():
+            question = gr.Textbox(
+                placeholder="Example: How do I perform a buffer analysis in QGIS?",
+                show_label=False,
+                scale=5,
+            )
+            send = gr.Button("🚀 Send", variant="primary", scale=1)
+        with gr.Row():
+            new_conversation = gr.Button("➕ New Conversation")
+        with gr.Accordion("⚙️ Model Settings", open=False):
+            model_name = gr.Dropdown(AVAILABLE_MODELS, value=DEFAULT_MODEL, label="🤖 Model")
+            temperature = gr.Slider(0.0, 2.0, value=0.7, step=0.1, label="🌡️ Temperature")
+            max_tokens = gr.Slider(256, 8192, value=2048, step=256, label="📏 Max Tokens")
+
+        inputs = [question, chatbot, thread_id, model_name, temperature, max_tokens]
+        outputs = [chatbot, thread_id, question]
+        send.click(respond, inputs, outputs, api_name="chat")
+        question.submit(respond, inputs, outputs, api_name=False)
+        new_conversation.click(lambda: ([], None), None, [chatbot, thread_id], api_name=False)
+        demo.load(load_latest, None, [chatbot, thread_id], api_name=False)
+    return demo
+
+
+demo = build_demo()
+
+if __name__ == "__main__":
+    setup_event_logging(extra_handlers=[RollupHandler(UsageRollups())])
+    # Warm up before the port opens, so no request reaches a cold process
+    Warmup(store, client_factory=client).run()
+    demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY, max_size=QUEUE_MAX_SIZE).launch(
+        auth=check_credentials,
+        server_name=os.environ.get("HOST", "127.0.0.1"),
+        server_port=int(os.environ.get("PORT", 7860)),
+    )
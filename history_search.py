@@ -0,0 +1,145 @@
+import heapq
+import math
+import re
+import threading
+from array import array
+from collections import OrderedDict
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._:-][a-z0-9]+)*")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how", "i", "in",
+    "is", "it", "of", "on", "or", "that", "the", "this", "to", "what", "when", "which", "with", "you",
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed"""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class InvertedIndex:
+    """Append-only inverted index over chat turns with BM25 ranking"""
+
+    def __init__(self):
+        # term -> (doc ids, term frequencies), both kept as compact arrays
+        self.postings = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, text):
+        """Index one document; re-adding an existing id is ignored"""
+        tokens = tokenize(text)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        with self.lock:
+            if doc_id in self.doc_lengths:
+                return
+            self.doc_lengths[doc_id] = len(tokens)
+            self.total_length += len(tokens)
+            for term, tf in counts.items():
+                entry = self.postings.get(term)
+                if entry is None:
+                    entry = self.postings[term] = (array("I"), array("I"))
+                entry[0].append(doc_id)
+                entry[1].append(tf)
+
+    def search(self, query, limit=10):
+        """Return (doc_id, score) pairs for the best BM25 matches"""
+        terms = set(tokenize(query))
+        with self.lock:
+            n = len(self.doc_lengths)
+            if not terms or n == 0:
+                return []
+            avg_length = self.total_length / n
+            scores = {}
+            for term in terms:
+                if term not in self.postings:
+                    continue
+                docs, freqs = self.postings[term]
+                idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in zip(docs, freqs):
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+# Users whose indexes are kept in memory; the least recently searched is dropped
+MAX_INDEXED_USERS = 64
+
+# Per user: the index, the (thread_id, position) reference of every indexed
+# turn and the number of turns indexed per thread
+_user_indexes = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def turn_text(turn):
+    """Searchable text of a stored chat turn"""
+    return f"{turn.get('user', '')}\n{turn.get('assistant', '')}"
+
+
+def _fresh(entry, thread_turns):
+    return entry is not None and (thread_turns is None or entry[2] == thread_turns)
+
+
+def _user_index(username, turns, thread_turns):
+    # Build the user's index from (ref, turn) pairs on first use, and again
+    # when the stored turn counts show turns this process did not index
+    # (written by another replica or frontend) or threads that are gone
+    with _registry_lock:
+        entry = _user_indexes.get(username)
+        if _fresh(entry, thread_turns):
+            _user_indexes.move_to_end(username)
+            return entry
+    # Built without the lock: reading a user's threads from disk must not hold
+    # up searches and new turns of every other user
+    index, refs, counts = InvertedIndex(), [], {}
+    for ref, turn in turns:
+        index.add(len(refs), turn_text(turn))
+        refs.append(ref)
+        counts[ref[0]] = counts.get(ref[0], 0) + 1
+    built = (index, refs, counts)
+    with _registry_lock:
+        current = _user_indexes.get(username)
+        if current is not entry and _fresh(current, thread_turns):
+            # A concurrent search installed an up-to-date index first
+            built = current
+        else:
+            _user_indexes[username] = built
+        _user_indexes.move_to_end(username)
+        while len(_user_indexes) > MAX_INDEXED_USERS:
+            _user_indexes.popitem(last=False)
+    return built
+
+
+def search_history(username, query, turns, limit=10, thread_turns=None):
+    """Rank a user's stored turns for query, returning (ref, score) pairs
+
+    thread_turns maps each of the user's threads to its stored turn count
+    (threads[*].turns of the user record); the index is rebuilt from turns
+    when it does not match.
+    """
+    if thread_turns is not None:
+        thread_turns = {thread_id: count for thread_id, count in thread_turns.items() if count}
+    index, refs, _ = _user_index(username, turns, thread_turns)
+    return [(refs[doc_id], score) for doc_id, score in index.search(query, limit)]
+
+
+def index_turn(username, ref, turn):
+    """Add a new turn to the user's index if it has been built"""
+    with _registry_lock:
+        entry = _user_indexes.get(username)
+        if entry is not None:
+            index, refs, counts = entry
+            index.add(len(refs), turn_text(turn))
+            refs.append(ref)
+            counts[ref[0]] = counts.get(ref[0], 0) + 1
@@ -0,0 +1,112 @@
+import io
+import json
+
+# Characters read from the stream per refill
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = " \t\r\n\x1e"
+
+
+class JsonStream:
+    """Pull parser that decodes one JSON value at a time from a text stream
+
+    iter_object() yields member keys and iter_array() yields decoded items; after
+    each key the caller must consume the value with decode(), iter_object() or
+    iter_array() before advancing. Memory is bounded by the largest value decoded
+    at once, not by the size of the document.
+    """
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.wrapped = not isinstance(stream, io.TextIOBase)
+        if self.wrapped:
+            stream = io.TextIOWrapper(stream, encoding="utf-8-sig")
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size):
+        # Drop the consumed prefix so the window only holds unread text
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        data = self.stream.read(size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at end of stream)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def expect(self, char):
+        """Consume the next non-whitespace character, which must be char"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Invalid JSON: expected '{char}' but found '{found or 'end of file'}'")
+        self.pos += 1
+
+    def decode(self):
+        """Decode and return the next complete JSON value"""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number at the end of the window may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow reads geometrically so very large values are not re-parsed too often
+            self._fill(size)
+            size *= 2
+
+    def _separator(self, close):
+        sep = self.peek()
+        self.pos += 1
+        if sep == close:
+            return False
+        if sep != ",":
+            raise ValueError(f"Invalid JSON: expected ',' or '{close}' but found '{sep or 'end of file'}'")
+        return True
+
+    def iter_object(self):
+        """Yield the keys of the next object; the caller reads each value"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.decode()
+            self.expect(":")
+            yield key
+            if not self._separator("}"):
+                return
+
+    def iter_array(self):
+        """Yield the decoded items of the next array"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            if not self._separator("]"):
+                return
+
+    def detach(self):
+        """Release a wrapped binary stream without closing it"""
+        if self.wrapped:
+            self.stream.detach()
@@ -0,0 +1,233 @@
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from user_store import file_lock
+
+# Buckets per power of two; 32 keeps every bucket within about 3% of its values
+SUB_BUCKETS = 32
+
+# Days of samples, today included, merged into reports and kept on disk
+STATS_WINDOW_DAYS = 3
+
+# Seconds between merges of this process's new samples into the stats file
+FLUSH_INTERVAL = 30
+
+# A model needs this many requests in the window, and an error rate at most
+# MAX_ERROR_RATE, before it can be picked as the fastest
+MIN_SAMPLES = 5
+MAX_ERROR_RATE = 0.2
+
+# Histogrammed metrics: time to first token, total time and generation speed
+METRICS = ("first_token_ms", "total_ms", "tokens_per_sec")
+
+
+def _bucket(value):
+    # value = mantissa * 2 ** exponent with 0.5 <= mantissa < 1; values below 1 share bucket 0
+    mantissa, exponent = math.frexp(max(value, 1.0))
+    return (exponent - 1) * SUB_BUCKETS + int((mantissa * 2 - 1) * SUB_BUCKETS)
+
+
+def _bucket_value(index):
+    exponent, sub = divmod(index, SUB_BUCKETS)
+    return 2.0 ** exponent * (1 + (sub + 0.5) / SUB_BUCKETS)
+
+
+class Histogram:
+    """Log-linear histogram of positive values in the style of HdrHistogram
+
+    Each power of two is split into SUB_BUCKETS equal-width buckets, so the
+    relative error stays bounded from milliseconds to minutes. Buckets are
+    plain counts keyed by index: histograms from other days or processes
+    merge by adding counts, which is how the stats file is kept.
+    """
+
+    def __init__(self, counts=None):
+        self.counts = {}
+        self.total = 0
+        if counts:
+            self.merge(counts)
+
+    def record(self, value, count=1):
+        index = _bucket(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+
+    def merge(self, counts):
+        """Add the counts of another histogram or of its saved form"""
+        for index, count in (counts.counts if isinstance(counts, Histogram) else counts).items():
+            self.counts[int(index)] = self.counts.get(int(index), 0) + count
+            self.total += count
+        return self
+
+    def percentile(self, pct):
+        """Value at a percentile (0-100), or None if nothing was recorded"""
+        if not self.total:
+            return None
+        rank = max(1, math.ceil(pct / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return _bucket_value(index)
+
+    def to_dict(self):
+        return {str(index): count for index, count in self.counts.items()}
+
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+def _merge_days(target, source):
+    # Both map day -> model -> {"requests", "errors", metric: bucket counts}
+    for day, models in source.items():
+        for model, entry in models.items():
+            merged = target.setdefault(day, {}).setdefault(model, {"requests": 0, "errors": 0})
+            merged["requests"] += entry["requests"]
+            merged["errors"] += entry["errors"]
+            for metric in METRICS:
+                if metric in entry:
+                    counts = merged.setdefault(metric, {})
+                    for index, count in entry[metric].items():
+                        counts[index] = counts.get(index, 0) + count
+
+
+class SharedStatsFile:
+    """Samples collected in memory and merged into a JSON file shared by processes
+
+    Every FLUSH_INTERVAL seconds, and at exit, new samples are added to the
+    file's contents under a lock and written back atomically, so processes
+    sharing the file add to each other's figures rather than overwriting
+    them. Subclasses define _merge, which adds one set of samples to another
+    in place, and may drop stale entries in _prune.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self._saved = self._read()
+        self._pending = {}
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+        atexit.register(self._flush_at_exit)
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _merge(self, target, source):
+        raise NotImplementedError
+
+    def _prune(self, saved):
+        return saved
+
+    def _flush_due(self):
+        # Called with the lock held, after recording a sample
+        return time.time() - self._last_flush >= FLUSH_INTERVAL
+
+    def _flush_at_exit(self):
+        # Samples recorded since the last flush would otherwise be lost
+        if self._pending:
+            self.flush()
+
+    def flush(self):
+        """Merge this process's new samples into the stats file and reload it"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.time()
+        try:
+            with file_lock(self.lock_path):
+                saved = self._read()
+                self._merge(saved, pending)
+                saved = self._prune(saved)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(saved, f)
+                os.replace(tmp_path, self.path)
+        except OSError:
+            # Keep the samples for the next attempt rather than losing them
+            with self._lock:
+                self._merge(self._pending, pending)
+            return
+        with self._lock:
+            self._saved = saved
+
+
+class ModelStats(SharedStatsFile):
+    """Per-model latency and throughput histograms, kept per UTC day in a JSON file
+
+    Samples are merged into the shared file as described in SharedStatsFile.
+    Days older than STATS_WINDOW_DAYS are dropped, so the figures follow how
+    each model is performing lately.
+    """
+
+    def _merge(self, target, source):
+        _merge_days(target, source)
+
+    def _prune(self, saved):
+        cutoff = (_today() - timedelta(days=STATS_WINDOW_DAYS)).isoformat()
+        return {day: models for day, models in saved.items() if day > cutoff}
+
+    def record(self, model, seconds=None, first_token=None, tokens=None, error=False):
+        """Add one request: total and first-token times in seconds, tokens generated if known"""
+        samples = {}
+        if not error:
+            if seconds is not None:
+                samples["total_ms"] = seconds * 1000
+            if first_token is not None:
+                samples["first_token_ms"] = first_token * 1000
+            if tokens and seconds:
+                samples["tokens_per_sec"] = tokens / seconds
+        with self._lock:
+            entry = self._pending.setdefault(_today().isoformat(), {}).setdefault(
+                model, {"requests": 0, "errors": 0}
+            )
+            entry["requests"] += 1
+            entry["errors"] += bool(error)
+            for metric, value in samples.items():
+                counts = entry.setdefault(metric, {})
+                index = str(_bucket(value))
+                counts[index] = counts.get(index, 0) + 1
+            due = self._flush_due()
+        if due:
+            self.flush()
+
+    def summary(self):
+        """Figures per model over the window: requests, errors, error_rate and a Histogram per metric"""
+        cutoff = (_today() - timedelta(days=STATS_WINDOW_DAYS)).isoformat()
+        merged = {}
+        with self._lock:
+            for source in (self._saved, self._pending):
+                _merge_days(merged, {day: models for day, models in source.items() if day > cutoff})
+        summary = {}
+        for models in merged.values():
+            for model, entry in models.items():
+                figures = summary.setdefault(
+                    model, {"requests": 0, "errors": 0, **{metric: Histogram() for metric in METRICS}}
+                )
+                figures["requests"] += entry["requests"]
+                figures["errors"] += entry["errors"]
+                for metric in METRICS:
+                    figures[metric].merge(entry.get(metric, {}))
+        for figures in summary.values():
+            figures["error_rate"] = figures["errors"] / figures["requests"] if figures["requests"] else 0.0
+        return summary
+
+    def fastest(self, models, summary=None):
+        """The healthy model among models with the lowest median total time, or None if none qualifies"""
+        summary = self.summary() if summary is None else summary
+        candidates = []
+        for model in models:
+            figures = summary.get(model)
+            if (figures and figures["requests"] >= MIN_SAMPLES and figures["error_rate"] <= MAX_ERROR_RATE
+                    and figures["total_ms"].total):
+                candidates.append((figures["total_ms"].percentile(50), model))
+        return min(candidates)[1] if candidates else None
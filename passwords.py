@@ -0,0 +1,103 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# scrypt work factor: each doubling of N doubles the time and memory of a
+# hash. Pick it with benchmarks/login_throughput.py; stored hashes with a
+# different N are upgraded on their next successful login.
+SCRYPT_N = int(os.environ.get("GEOADVISOR_SCRYPT_N", 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Hashes computed at once; further logins queue instead of competing for CPU
+# and memory (each hash needs 128 * N * r bytes)
+HASH_WORKERS = int(os.environ.get("GEOADVISOR_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Recently verified credentials, so per-request HTTP Basic auth does not pay
+# a full hash every time
+VERIFIED_CACHE_SIZE = 1024
+
+_PREFIX = "scrypt"
+
+# hashlib releases the GIL while hashing, so the pool does not stall other threads
+_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password")
+
+_verified = OrderedDict()
+_verified_lock = threading.Lock()
+# Cache keys are keyed digests, so the cache never holds anything usable as a password
+_cache_secret = os.urandom(32)
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p, dklen=KEY_BYTES)
+
+
+def is_hashed(stored):
+    return stored.startswith(_PREFIX + "$")
+
+
+def hash_password(password, n=SCRYPT_N):
+    """Salted scrypt hash as 'scrypt$N$r$p$salt$key'"""
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, n, SCRYPT_R, SCRYPT_P)
+    return f"{_PREFIX}${n}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+
+
+def verify_password(stored, password):
+    """Check a password against a stored hash or legacy plaintext; returns (ok, needs_rehash)"""
+    if not is_hashed(stored):
+        return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8")), True
+    _, n, r, p, salt, key = stored.split("$")
+    n, r, p = int(n), int(r), int(p)
+    ok = hmac.compare_digest(_scrypt(password, base64.b64decode(salt), n, r, p), base64.b64decode(key))
+    return ok, (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def hash_password_pooled(password):
+    """hash_password on the bounded hashing pool; blocks until done"""
+    return _pool.submit(hash_password, password).result()
+
+
+def verify_password_pooled(stored, password):
+    """verify_password on the bounded hashing pool, skipping the hash for recently verified credentials"""
+    cache_key = (stored, hmac.new(_cache_secret, password.encode("utf-8"), hashlib.sha256).digest())
+    with _verified_lock:
+        if cache_key in _verified:
+            _verified.move_to_end(cache_key)
+            return _verified[cache_key]
+    result = _pool.submit(verify_password, stored, password).result()
+    if result[0]:
+        with _verified_lock:
+            _verified[cache_key] = result
+            if len(_verified) > VERIFIED_CACHE_SIZE:
+                _verified.popitem(last=False)
+    return result
+
+
+def check_login(store, username, password):
+    """Verify a user's password, upgrading plaintext or outdated hashes in place; returns True if valid"""
+    record = store.snapshot().get(username)
+    if record is None:
+        return False
+    stored = record["password"]
+    ok, needs_rehash = verify_password_pooled(stored, password)
+    if ok and needs_rehash:
+        new_hash = hash_password_pooled(password)
+
+        def upgrade(data):
+            # Leave the record alone if the password changed in the meantime
+            if username in data and data[username]["password"] == stored:
+                data[username]["password"] = new_hash
+        store.update(upgrade)
+    return ok
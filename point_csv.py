@@ -0,0 +1,381 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from gis_tools import EARTH_MEAN_RADIUS, haversine_distance
+
+# Rows read per chunk
+CHUNK_ROWS = 200000
+
+# Uniform sample kept in memory for the outlier threshold and density grid
+SAMPLE_SIZE = 50000
+
+# Files with up to this many points get exact nearest-neighbor statistics over
+# every point; larger ones are estimated from the sample (see summarize_points)
+NN_MAX_POINTS = 1000000
+
+# Density grid resolution (rows, columns) and the sample percentiles bounding it
+DENSITY_BINS = (32, 32)
+DENSITY_PERCENTILES = (0.5, 99.5)
+
+# Robust z-score above which a point counts as a distance outlier
+OUTLIER_Z = 3.5
+
+# Number of farthest outliers reported
+TOP_OUTLIERS = 10
+
+# Grid index: neighbor rings searched per level, target points per cell,
+# and candidate pairs evaluated per vectorized block
+MAX_RING = 3
+CELL_OCCUPANCY = 8
+PAIR_BLOCK = 1 << 21
+
+LAT_COLUMNS = ("lat", "latitude", "lat_dd", "gps_lat", "y")
+LON_COLUMNS = ("lon", "lng", "long", "longitude", "lon_dd", "gps_lon", "x")
+
+
+def detect_columns(columns):
+    """Pick the latitude and longitude columns from a CSV header"""
+    lowered = {c.strip().lower(): c for c in columns}
+    lat = next((lowered[name] for name in LAT_COLUMNS if name in lowered), None)
+    lon = next((lowered[name] for name in LON_COLUMNS if name in lowered), None)
+    if lat is None or lon is None:
+        raise ValueError("Could not find latitude/longitude columns (expected names like 'lat' and 'lon')")
+    return lat, lon
+
+
+def _read_chunks(source, lat_col, lon_col, chunk_rows):
+    if hasattr(source, "seek"):
+        source.seek(0)
+    reader = pd.read_csv(source, usecols=[lat_col, lon_col], chunksize=chunk_rows)
+    for chunk in reader:
+        lat = pd.to_numeric(chunk[lat_col], errors="coerce").to_numpy(dtype=float)
+        lon = pd.to_numeric(chunk[lon_col], errors="coerce").to_numpy(dtype=float)
+        valid = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+        yield lat[valid], lon[valid], len(chunk)
+
+
+def _to_local_xy(lat, lon, lat0, lon0):
+    # Equirectangular projection around the centroid, in meters
+    dlon = (lon - lon0 + 180.0) % 360.0 - 180.0
+    x = EARTH_MEAN_RADIUS * np.radians(dlon) * np.cos(np.radians(lat0))
+    y = EARTH_MEAN_RADIUS * np.radians(lat - lat0)
+    return x, y
+
+
+def _cell_keys(x, y, cell_size):
+    cx = np.floor((x - x.min()) / cell_size).astype(np.int64)
+    cy = np.floor((y - y.min()) / cell_size).astype(np.int64)
+    width = int(cx.max()) + 2 * MAX_RING + 3
+    return (cy + MAX_RING + 1) * width + (cx + MAX_RING + 1), width
+
+
+def _scan_cells(x, y, owners, starts, counts, order, best, best_idx):
+    # Expand (point, candidate) pairs for one block and keep the closest candidate per point
+    total = int(counts.sum())
+    if total == 0:
+        return
+    owner = np.repeat(owners, counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    cand = order[np.repeat(starts, counts) + offsets]
+    d = np.hypot(x[cand] - x[owner], y[cand] - y[owner])
+    d[cand == owner] = np.inf
+    nonempty = counts > 0
+    group_starts = (np.cumsum(counts) - counts)[nonempty]
+    mins = np.minimum.reduceat(d, group_starts)
+    is_min = np.flatnonzero(d == np.repeat(mins, counts[nonempty]))
+    first = is_min[np.unique(owner[is_min], return_index=True)[1]]
+    closer = d[first] < best[owner[first]]
+    best[owner[first][closer]] = d[first][closer]
+    best_idx[owner[first][closer]] = cand[first][closer]
+
+
+def _grid_pass(x, y, cell_size, pending, best, best_idx):
+    # Search rings of grid cells around each pending point, returning those still unresolved
+    keys, width = _cell_keys(x, y, cell_size)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    # Visiting points in cell order keeps the searchsorted lookups below cache friendly
+    pending = order if len(pending) == len(keys) else pending[np.argsort(keys[pending], kind="stable")]
+
+    for ring in range(MAX_RING + 1):
+        # Only the shell at Chebyshev distance `ring` is new in this round
+        shell = [(dx, dy) for dx in range(-ring, ring + 1) for dy in range(-ring, ring + 1)
+                 if max(abs(dx), abs(dy)) == ring]
+        for dx, dy in shell:
+            target = keys[pending] + dy * width + dx
+            starts = np.searchsorted(sorted_keys, target, side="left")
+            counts = np.searchsorted(sorted_keys, target, side="right") - starts
+            # Split into blocks of roughly PAIR_BLOCK candidate pairs to bound memory
+            cuts = np.searchsorted(np.cumsum(counts), np.arange(PAIR_BLOCK, counts.sum() + PAIR_BLOCK, PAIR_BLOCK))
+            lo = 0
+            for hi in np.unique(np.minimum(cuts + 1, len(pending))):
+                _scan_cells(x, y, pending[lo:hi], starts[lo:hi], counts[lo:hi], order, best, best_idx)
+                lo = hi
+        # A neighbor within ring * cell_size is guaranteed to be the true nearest one
+        pending = pending[best[pending] > ring * cell_size]
+        if pending.size == 0:
+            break
+    return pending
+
+
+def grid_nearest_neighbors(x, y, cell_size=None):
+    """Exact nearest-neighbor index and planar distance for each point using uniform grids"""
+    n = len(x)
+    best = np.full(n, np.inf)
+    best_idx = np.full(n, -1)
+    if n < 2:
+        return best_idx, best
+
+    # Coincident points are each other's nearest neighbors at distance zero
+    _, first, inverse, multiplicity = np.unique(
+        np.column_stack([x, y]), axis=0, return_index=True, return_inverse=True, return_counts=True
+    )
+    inverse = inverse.ravel()
+    dup = multiplicity[inverse] > 1
+    if dup.any():
+        groups = np.argsort(inverse, kind="stable")
+        sorted_inv = inverse[groups]
+        # Pair each duplicate with the next member of its group (cyclically)
+        group_start = np.searchsorted(sorted_inv, sorted_inv, side="left")
+        pos_in_group = np.arange(n) - group_start
+        partner = groups[group_start + (pos_in_group + 1) % multiplicity[sorted_inv]]
+        best[groups] = np.where(multiplicity[sorted_inv] > 1, 0.0, np.inf)
+        best_idx[groups] = np.where(multiplicity[sorted_inv] > 1, partner, -1)
+    ux, uy = x[first], y[first]
+    m = len(first)
+    if m < 2:
+        return best_idx, best
+
+    if cell_size is None:
+        # Size cells from the dense core so a few far outliers do not inflate them,
+        # then shrink them until clusters no longer pack too many points per cell
+        qx = np.percentile(ux, [10, 90])
+        qy = np.percentile(uy, [10, 90])
+        core_area = max((qx[1] - qx[0]) * (qy[1] - qy[0]), 1e-12)
+        cell_size = max(2 * np.sqrt(core_area / (0.64 * m)), 1e-9)
+        for _ in range(16):
+            keys, _ = _cell_keys(ux, uy, cell_size)
+            _, inv, occ = np.unique(keys, return_inverse=True, return_counts=True)
+            if np.percentile(occ[inv], 99) <= CELL_OCCUPANCY:
+                break
+            cell_size /= 2
+
+    # Points left unresolved by a fine grid are retried on progressively coarser ones
+    ubest = np.full(m, np.inf)
+    ubest_idx = np.full(m, -1)
+    pending = np.arange(m)
+    while pending.size:
+        pending = _grid_pass(ux, uy, cell_size, pending, ubest, ubest_idx)
+        cell_size *= 4
+
+    single = ~dup
+    best[single] = ubest[inverse[single]]
+    best_idx[single] = first[ubest_idx[inverse[single]]]
+    return best_idx, best
+
+
+def _keep_smallest(keys, values, k):
+    if len(keys) <= k:
+        return keys, values
+    keep = np.argpartition(keys, k)[:k]
+    return keys[keep], values[keep]
+
+
+def summarize_points(source, lat_col=None, lon_col=None, chunk_rows=CHUNK_ROWS, sample_size=SAMPLE_SIZE, seed=0,
+                     nn_max_points=NN_MAX_POINTS):
+    """Summarize a lat/lon CSV (path or seekable file) in two chunked passes"""
+    started = time.perf_counter()
+    if lat_col is None or lon_col is None:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        lat_col, lon_col = detect_columns(pd.read_csv(source, nrows=0).columns)
+
+    rng = np.random.default_rng(seed)
+    total_rows = valid_rows = 0
+    lat_min = lon_min = np.inf
+    lat_max = lon_max = -np.inf
+    unit_sum = np.zeros(3)
+    sample_keys = np.empty(0)
+    sample = np.empty((0, 2))
+    points = []
+
+    # Pass 1: extent, spherical centroid, a uniform sample (smallest random keys)
+    # and every point while there are at most nn_max_points
+    for lat, lon, rows in _read_chunks(source, lat_col, lon_col, chunk_rows):
+        total_rows += rows
+        valid_rows += len(lat)
+        if not len(lat):
+            continue
+        lat_min, lat_max = min(lat_min, lat.min()), max(lat_max, lat.max())
+        lon_min, lon_max = min(lon_min, lon.min()), max(lon_max, lon.max())
+        phi, lam = np.radians(lat), np.radians(lon)
+        unit_sum += [np.sum(np.cos(phi) * np.cos(lam)), np.sum(np.cos(phi) * np.sin(lam)), np.sum(np.sin(phi))]
+        sample_keys, sample = _keep_smallest(
+            np.concatenate([sample_keys, rng.random(len(lat))]),
+            np.concatenate([sample, np.column_stack([lat, lon])]),
+            sample_size,
+        )
+        if points is not None and valid_rows > nn_max_points:
+            points = None
+        elif points is not None:
+            points.append(np.column_stack([lat, lon]))
+
+    summary = {
+        "lat_column": lat_col,
+        "lon_column": lon_col,
+        "rows": total_rows,
+        "valid_points": valid_rows,
+        "extent": None,
+        "centroid": None,
+        "nearest_neighbor_m": None,
+        "density": None,
+        "outliers": None,
+    }
+    if not valid_rows:
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        return summary
+
+    x, y, z = unit_sum / valid_rows
+    lat0 = float(np.degrees(np.arctan2(z, np.hypot(x, y))))
+    lon0 = float(np.degrees(np.arctan2(y, x)))
+    summary["extent"] = {"min_lat": float(lat_min), "min_lon": float(lon_min),
+                         "max_lat": float(lat_max), "max_lon": float(lon_max)}
+    summary["centroid"] = {"lat": round(lat0, 6), "lon": round(lon0, 6)}
+
+    # Nearest-neighbor statistics through the grid index, over every point if
+    # they were kept. A sample thins the points, which stretches neighbor
+    # distances by about sqrt(valid_rows / sample size) for evenly spread
+    # points; sample distances are scaled back by that factor, and duplicates
+    # are undercounted, so those figures are reported as estimates.
+    nn_points = np.concatenate(points) if points else sample
+    exact = points is not None
+    sx, sy = _to_local_xy(nn_points[:, 0], nn_points[:, 1], lat0, lon0)
+    nn_idx, _ = grid_nearest_neighbors(sx, sy)
+    found = nn_idx >= 0
+    if found.any():
+        nn = haversine_distance(nn_points[found, 0], nn_points[found, 1],
+                                nn_points[nn_idx[found], 0], nn_points[nn_idx[found], 1])
+        area = max(np.ptp(sx) * np.ptp(sy), 1.0)
+        # The Clark-Evans ratio compares like with like, so it needs no scaling
+        expected = 0.5 / np.sqrt(len(nn_points) / area)
+        clark_evans = nn.mean() / expected
+        if not exact:
+            nn = nn * np.sqrt(len(nn_points) / valid_rows)
+        summary["nearest_neighbor_m"] = {
+            "points": int(len(nn_points)),
+            "estimated": not exact,
+            "mean": round(float(nn.mean()), 3),
+            "median": round(float(np.median(nn)), 3),
+            "p90": round(float(np.percentile(nn, 90)), 3),
+            "min": round(float(nn.min()), 3),
+            "max": round(float(nn.max()), 3),
+            "duplicates_pct": round(float(np.mean(nn == 0) * 100), 2),
+            # Clark-Evans ratio: < 1 clustered, ~1 random, > 1 dispersed
+            "clark_evans_ratio": round(float(clark_evans), 3),
+        }
+
+    # Robust outlier threshold on distance from the centroid, estimated on the sample
+    sample_dist = haversine_distance(sample[:, 0], sample[:, 1], lat0, lon0)
+    median = np.median(sample_dist)
+    mad = np.median(np.abs(sample_dist - median)) * 1.4826
+    threshold = median + OUTLIER_Z * mad if mad > 0 else np.inf
+
+    # Pass 2: density grid over the extent and outlier detection
+    # The grid covers the core of the sample so stray points do not flatten it
+    if len(sample) >= 1000:
+        lat_lo, lat_hi = np.percentile(sample[:, 0], DENSITY_PERCENTILES)
+        lon_lo, lon_hi = np.percentile(sample[:, 1], DENSITY_PERCENTILES)
+    else:
+        lat_lo, lat_hi, lon_lo, lon_hi = lat_min, lat_max, lon_min, lon_max
+    lat_edges = np.linspace(lat_lo, max(lat_hi, lat_lo + 1e-9), DENSITY_BINS[0] + 1)
+    lon_edges = np.linspace(lon_lo, max(lon_hi, lon_lo + 1e-9), DENSITY_BINS[1] + 1)
+    density = np.zeros(DENSITY_BINS, dtype=np.int64)
+    outlier_count = 0
+    far_keys = np.empty(0)
+    far_points = np.empty((0, 2))
+    for lat, lon, _ in _read_chunks(source, lat_col, lon_col, chunk_rows):
+        if not len(lat):
+            continue
+        density += np.histogram2d(lat, lon, bins=(lat_edges, lon_edges))[0].astype(np.int64)
+        dist = haversine_distance(lat, lon, lat0, lon0)
+        is_outlier = dist > threshold
+        outlier_count += int(is_outlier.sum())
+        if is_outlier.any():
+            far_keys, far_points = _keep_smallest(
+                np.concatenate([far_keys, -dist[is_outlier]]),
+                np.concatenate([far_points, np.column_stack([lat[is_outlier], lon[is_outlier]])]),
+                TOP_OUTLIERS,
+            )
+
+    cell_area_km2 = (
+        np.radians(lon_edges[1] - lon_edges[0]) * np.abs(np.diff(np.sin(np.radians(lat_edges))))
+        * (EARTH_MEAN_RADIUS / 1000) ** 2
+    )
+    flat = density.ravel()
+    top = np.argsort(flat)[::-1][:5]
+    summary["density"] = {
+        "bins": list(DENSITY_BINS),
+        "grid_extent": [round(float(v), 6) for v in (lat_lo, lon_lo, lat_hi, lon_hi)],
+        "outside_grid": int(valid_rows - flat.sum()),
+        "empty_cells_pct": round(float(np.mean(flat == 0) * 100), 1),
+        "max_per_cell": int(flat.max()),
+        "hotspots": [
+            {
+                "lat": round(float((lat_edges[r] + lat_edges[r + 1]) / 2), 5),
+                "lon": round(float((lon_edges[c] + lon_edges[c + 1]) / 2), 5),
+                "points": int(density[r, c]),
+                "per_km2": round(float(density[r, c] / cell_area_km2[r]), 3) if cell_area_km2[r] > 0 else None,
+            }
+            for r, c in (divmod(int(i), DENSITY_BINS[1]) for i in top) if density[r, c] > 0
+        ],
+    }
+    order = np.argsort(far_keys)
+    summary["outliers"] = {
+        "threshold_m": round(float(threshold), 1) if np.isfinite(threshold) else None,
+        "count": outlier_count,
+        "farthest": [
+            {"lat": round(float(lat), 6), "lon": round(float(lon), 6), "distance_km": round(float(-key) / 1000, 3)}
+            for (lat, lon), key in zip(far_points[order], far_keys[order])
+        ],
+    }
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def format_point_summary(filename, summary):
+    """Render a point CSV summary as compact prompt context"""
+    lines = [
+        f"The user attached the point CSV '{filename}' (columns {summary['lat_column']}/{summary['lon_column']}). Summary computed locally:",
+        f"- Rows: {summary['rows']}, valid points: {summary['valid_points']}",
+    ]
+    if summary["extent"]:
+        e = summary["extent"]
+        lines.append(f"- Extent: lat {e['min_lat']:.6f} to {e['max_lat']:.6f}, lon {e['min_lon']:.6f} to {e['max_lon']:.6f}")
+        lines.append(f"- Centroid: {summary['centroid']['lat']}, {summary['centroid']['lon']}")
+    nn = summary["nearest_neighbor_m"]
+    if nn:
+        basis = (f"estimated from {nn['points']} sampled points, scaled to the full density" if nn["estimated"]
+                 else f"all {nn['points']} points")
+        lines.append(
+            f"- Nearest-neighbor distance (m, {basis}): mean {nn['mean']}, "
+            f"median {nn['median']}, p90 {nn['p90']}, min {nn['min']}, max {nn['max']}; "
+            f"duplicates {nn['duplicates_pct']}%; Clark-Evans R {nn['clark_evans_ratio']}"
+        )
+    if summary["density"]:
+        d = summary["density"]
+        hotspots = "; ".join(f"({h['lat']}, {h['lon']}) {h['points']} pts" for h in d["hotspots"])
+        lines.append(
+            f"- Density grid {d['bins'][0]}x{d['bins'][1]} over [min_lat, min_lon, max_lat, max_lon] {d['grid_extent']} "
+            f"({d['outside_grid']} points outside): {d['empty_cells_pct']}% empty cells, "
+            f"max {d['max_per_cell']} per cell; hotspots: {hotspots}"
+        )
+    if summary["outliers"]:
+        o = summary["outliers"]
+        farthest = "; ".join(f"({p['lat']}, {p['lon']}) {p['distance_km']} km" for p in o["farthest"][:5])
+        lines.append(
+            f"- Distance outliers (> {o['threshold_m']} m from centroid): {o['count']}"
+            + (f"; farthest: {farthest}" if farthest else "")
+        )
+    return "\n".join(lines)
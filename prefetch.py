@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from advisor import RateLimiter
+from event_log import log_event
+
+# Prefetched answers started per minute across all sessions of the process,
+# with bursts of up to one full set of suggestions
+PREFETCH_PER_MINUTE = 20
+PREFETCH_BURST = 3
+
+# Unused prefetched answers are dropped after this many seconds
+PREFETCH_TTL = 15 * 60
+
+# Longest wait for a prefetch already in progress when its suggestion is clicked
+PREFETCH_WAIT = 60
+
+QUEUED, RUNNING, READY, FAILED, CANCELLED = "queued", "running", "ready", "failed", "cancelled"
+
+
+class Prefetcher:
+    """Answers suggested follow-up questions in the background before they are asked
+
+    One low-priority worker takes jobs in order, but only starts one while
+    no foreground request is in flight and the prefetch rate budget has
+    room, so prefetching never competes with questions users are waiting
+    for. Jobs are grouped by an owner (a chat session): scheduling new
+    suggestions for an owner discards its old ones, and prefetched answers
+    that are never used count as wasted tokens.
+    """
+
+    def __init__(self, rate_per_minute=PREFETCH_PER_MINUTE, ttl=PREFETCH_TTL):
+        self.limiter = RateLimiter(rate_per_minute, burst=PREFETCH_BURST)
+        self.ttl = ttl
+        self.stats = {
+            "scheduled": 0, "prefetched": 0, "failed": 0, "dropped": 0,
+            "hits": 0, "misses": 0, "used_tokens": 0, "wasted_tokens": 0,
+        }
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        threading.Thread(target=self._work, name="prefetch", daemon=True).start()
+
+    @contextmanager
+    def foreground(self):
+        """Mark a user-facing request in flight; prefetches wait until none are"""
+        with self._lock:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def _drop(self, job):
+        # Caller holds the lock
+        if job["state"] == READY:
+            self.stats["wasted_tokens"] += job["result"][1]
+        elif job["state"] == QUEUED:
+            self.stats["dropped"] += 1
+        job["state"] = CANCELLED
+        job["done"].set()
+
+    def schedule(self, owner, questions, answer_fn):
+        """Replace an owner's pending prefetches with answer_fn(question) for each question
+
+        answer_fn runs on the worker thread and returns (answer, tokens_used).
+        """
+        now = time.time()
+        with self._lock:
+            for key in [key for key in self._jobs if key[0] == owner]:
+                self._drop(self._jobs.pop(key))
+            for question in questions:
+                job = {"state": QUEUED, "created": now, "fn": answer_fn, "question": question,
+                       "done": threading.Event()}
+                self._jobs[(owner, question)] = job
+                self._queue.put(job)
+                self.stats["scheduled"] += 1
+
+    def take(self, owner, question):
+        """The prefetched (answer, tokens_used) for a question, or None on a miss"""
+        with self._lock:
+            # The worker only expires jobs when it dequeues one, which a quiet process may never do
+            self._expire(time.time())
+            job = self._jobs.pop((owner, question), None)
+            if job is not None and job["state"] == QUEUED:
+                # Not started yet: answering in the foreground is just as fast
+                self._drop(job)
+                job = None
+        if job is not None:
+            job["done"].wait(PREFETCH_WAIT)
+        with self._lock:
+            hit = job is not None and job["state"] == READY
+            if hit:
+                self.stats["hits"] += 1
+                self.stats["used_tokens"] += job["result"][1]
+            else:
+                self.stats["misses"] += 1
+        log_event("cache", cache="prefetch", hit=hit)
+        return job["result"] if hit else None
+
+    def discard(self, owner):
+        """Drop all of an owner's prefetches, e.g. when the conversation changes"""
+        with self._lock:
+            for key in [key for key in self._jobs if key[0] == owner]:
+                self._drop(self._jobs.pop(key))
+
+    def _expire(self, now):
+        # Caller holds the lock
+        for key, job in list(self._jobs.items()):
+            if job["state"] in (QUEUED, READY) and now - job["created"] > self.ttl:
+                self._drop(self._jobs.pop(key))
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                # Foreground requests and the rate budget come first
+                while job["state"] == QUEUED and (self._active or self.limiter.try_acquire()):
+                    self._idle.wait(1.0)
+                self._expire(time.time())
+                if job["state"] != QUEUED:
+                    continue
+                job["state"] = RUNNING
+            try:
+                result = job["fn"](job["question"])
+            except Exception:
+                with self._lock:
+                    self.stats["failed"] += 1
+                    job["state"] = FAILED
+                    job["done"].set()
+                continue
+            with self._lock:
+                self.stats["prefetched"] += 1
+                if job["state"] == CANCELLED:
+                    # Discarded while running: its tokens are spent regardless
+                    self.stats["wasted_tokens"] += result[1]
+                else:
+                    job["result"] = result
+                    job["state"] = READY
+                job["done"].set()
+
+    def metrics(self):
+        """Counters plus the hit rate of clicked suggestions"""
+        with self._lock:
+            figures = dict(self.stats)
+        taken = figures["hits"] + figures["misses"]
+        figures["hit_rate"] = figures["hits"] / taken if taken else None
+        return figures
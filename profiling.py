@@ -0,0 +1,279 @@
+import cProfile
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import wraps
+
+# Set GEOADVISOR_PROFILE=sample or cprofile to profile every rerun of the app
+PROFILE_MODE = os.environ.get("GEOADVISOR_PROFILE", "")
+
+# With GEOADVISOR_PROFILE_TOKEN set, opening the app with ?profile=<token>
+# profiles that session's reruns only; add &profiler=cprofile for call counts
+PROFILE_TOKEN = os.environ.get("GEOADVISOR_PROFILE_TOKEN", "")
+
+PROFILE_DIR = os.environ.get("GEOADVISOR_PROFILE_DIR", "profiles")
+
+# Profiles of the most recent reruns kept on disk
+PROFILE_KEEP = 200
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+SAMPLE, CPROFILE = "sample", "cprofile"
+PROFILERS = (SAMPLE, CPROFILE)
+
+# The profile of the run on this thread, for profiled() spans
+_active = threading.local()
+# Running profiles by session. Reruns of a session are usually served by a
+# new thread, so this is where the next run finds one its predecessor left.
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def profile_mode(token=None, profiler=None):
+    """Profiler for this rerun: the environment setting, or the one asked for with a valid token"""
+    if PROFILE_MODE in PROFILERS:
+        return PROFILE_MODE
+    if PROFILE_TOKEN and token and hmac.compare_digest(token.encode("utf-8"), PROFILE_TOKEN.encode("utf-8")):
+        return profiler if profiler in PROFILERS else SAMPLE
+    return None
+
+
+def _frame_label(code):
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Counts one thread's call stacks, sampled at a fixed interval, as collapsed stacks
+
+    Samples are taken by wall clock, so time spent waiting on the model
+    provider or on file locks shows up as well as time spent computing.
+    Frames above the first one from root_file (the web framework's own
+    machinery) are left out, as are samples taken while no root_file code
+    runs. Sampling ends at stop() or when the sampled thread exits,
+    whichever comes first.
+    """
+
+    def __init__(self, thread_id, root_file=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.root_file = os.path.abspath(root_file) if root_file else None
+        self.interval = interval
+        self.counts = Counter()
+        self.last_sample = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id not in frames:
+                return
+            frame = frames[self.thread_id]
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            if self.root_file is not None:
+                starts = [index for index, code in enumerate(stack) if code.co_filename == self.root_file]
+                # Outside the script, e.g. after a run that raised: nothing to record
+                stack = stack[starts[0]:] if starts else []
+            if stack:
+                self.counts[";".join(_frame_label(code) for code in stack)] += 1
+                self.last_sample = time.perf_counter()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        """'frame;frame;frame count' lines, as read by flamegraph.pl and speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+
+class RerunProfile:
+    """Profile of one script run, saved as collapsed stacks and optionally a cProfile dump
+
+    Every profile samples stacks for a flamegraph; the cprofile mode also
+    records exact call counts, at the cost of slowing the run down.
+    Functions decorated with profiled() add their time to the profile's
+    named spans.
+    """
+
+    def __init__(self, mode, root_file=None, directory=PROFILE_DIR, session_id=None):
+        self.mode = mode
+        self.directory = directory
+        self.session_id = session_id
+        self.spans = {}
+        self.sampler = StackSampler(threading.get_ident(), root_file)
+        self.profiler = None
+        self.stopped = False
+        self._stop_lock = threading.Lock()
+
+    def start(self):
+        if self.mode == CPROFILE:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self.profiler = profiler
+            except ValueError:
+                # Newer Pythons allow one cProfile per process; this run is only sampled
+                pass
+        self.sampler.start()
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        _active.profile = self
+        if self.session_id is not None:
+            with _sessions_lock:
+                _sessions[self.session_id] = self
+        return self
+
+    def stop(self, ended_by=None, **info):
+        """Stop profiling and save the profile; info (user, page, ...) is kept with it
+
+        Returns the saved summary, or None if the profile was already stopped.
+        """
+        seconds = time.perf_counter() - self.started
+        with self._stop_lock:
+            # The run's own end and the next run's cleanup can race
+            if self.stopped:
+                return None
+            self.stopped = True
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.sampler.stop()
+        if getattr(_active, "profile", None) is self:
+            _active.profile = None
+        if self.session_id is not None:
+            with _sessions_lock:
+                if _sessions.get(self.session_id) is self:
+                    del _sessions[self.session_id]
+        if ended_by == "abandoned" and self.sampler.last_sample is not None:
+            # Closed out later; the last sample is the closest known end of the run
+            seconds = self.sampler.last_sample - self.started
+        if ended_by is None:
+            # Reruns end with an exception when the script asks for a rerun or stops early
+            error = sys.exc_info()[1]
+            ended_by = type(error).__name__ if error is not None else None
+
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(self.started_at))}-{uuid.uuid4().hex[:6]}"
+        base = os.path.join(self.directory, profile_id)
+        files = {"folded": profile_id + ".folded"}
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            f.write(self.sampler.collapsed())
+        if self.profiler is not None:
+            self.profiler.dump_stats(base + ".prof")
+            files["prof"] = profile_id + ".prof"
+        summary = {
+            "id": profile_id,
+            "started_at": self.started_at,
+            "seconds": round(seconds, 4),
+            "mode": CPROFILE if self.profiler is not None else SAMPLE,
+            "ended_by": ended_by,
+            "samples": sum(self.sampler.counts.values()),
+            "spans": {name: round(value, 4) for name, value in self.spans.items()},
+            "files": files,
+            **info,
+        }
+        # Written last and replaced atomically, so the viewer never sees a partial profile
+        with open(base + ".json.tmp", "w", encoding="utf-8") as f:
+            json.dump(summary, f)
+        os.replace(base + ".json.tmp", base + ".json")
+        _prune(self.directory)
+        return summary
+
+
+def _prune(directory, keep=PROFILE_KEEP):
+    # Profile ids start with their UTC start time, so names sort oldest first
+    summaries = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    for name in summaries[:-keep]:
+        profile_id = name[:-len(".json")]
+        for suffix in (".json", ".folded", ".prof"):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def start_rerun_profile(token=None, profiler=None, root_file=None, session_id=None):
+    """Start profiling this script run if profiling is enabled for it; returns the profile or None"""
+    # A run that failed or was torn down before reaching the code that stops
+    # its profile leaves it running; close it out before starting another
+    if session_id is not None:
+        with _sessions_lock:
+            abandoned = _sessions.pop(session_id, None)
+    else:
+        abandoned = getattr(_active, "profile", None)
+    if abandoned is not None:
+        abandoned.stop(ended_by="abandoned")
+    mode = profile_mode(token, profiler)
+    return RerunProfile(mode, root_file, session_id=session_id).start() if mode else None
+
+
+def profiled(name):
+    """Decorator adding the time of each call during a profiled run to the span name"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = getattr(_active, "profile", None)
+            if profile is None:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.spans[name] = profile.spans.get(name, 0.0) + time.perf_counter() - started
+        return wrapper
+    return decorate
+
+
+def slowest_reruns(limit=20, directory=PROFILE_DIR):
+    """Summaries of the saved reruns, slowest first"""
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                # Pruned by another process meanwhile
+                continue
+    return sorted(summaries, key=lambda summary: summary["seconds"], reverse=True)[:limit]
+
+
+def hot_frames(profile_id, limit=15, directory=PROFILE_DIR):
+    """Functions of a saved rerun with the largest share of samples, by own and inclusive time"""
+    own, inclusive = Counter(), Counter()
+    with open(os.path.join(directory, profile_id + ".folded"), encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            frames = stack.split(";")
+            own[frames[-1]] += int(count)
+            # Recursive functions count once per sample
+            for frame in set(frames):
+                inclusive[frame] += int(count)
+    total = sum(own.values())
+    if not total:
+        return []
+    return [
+        {"function": frame, "total_pct": round(100 * count / total, 1), "self_pct": round(100 * own[frame] / total, 1)}
+        for frame, count in inclusive.most_common(limit)
+    ]
+
+
+def profile_file(profile_id, kind, directory=PROFILE_DIR):
+    """Contents of a saved rerun's 'folded' or 'prof' file"""
+    with open(os.path.join(directory, f"{profile_id}.{kind}"), "rb") as f:
+        return f.read()
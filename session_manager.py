@@ -0,0 +1,206 @@
+import atexit
+import os
+import pickle
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+# Seconds without a script run before a session's state is offloaded to disk
+SESSION_TTL = float(os.environ.get("GEOADVISOR_SESSION_TTL", 15 * 60))
+
+# Minimum seconds between sweeps for idle sessions
+SWEEP_INTERVAL = 60
+
+# Offloaded sessions not seen again within this many seconds are forgotten
+SPOOL_MAX_AGE = 24 * 60 * 60
+
+# Minimum seconds between memory measurements of one session
+MEASURE_INTERVAL = 30
+
+# Spool files are unpickled, so the directory must be private to this user.
+# Unset, each process spools to its own mkdtemp() directory, removed at exit.
+SESSION_SPOOL_DIR = os.environ.get("GEOADVISOR_SESSION_SPOOL_DIR")
+
+
+def private_dir(path=None):
+    """Create or check a directory only this user can access; a fresh temporary one without path"""
+    if path is None:
+        path = tempfile.mkdtemp(prefix="geoadvisor_sessions_")
+        atexit.register(shutil.rmtree, path, ignore_errors=True)
+        return path
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"Session spool directory {path} must be a directory private to this user")
+    return path
+
+
+def deep_sizeof(obj):
+    """Approximate bytes held by an object and everything it references"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__") and not isinstance(item, type):
+            stack.append(vars(item))
+    return total
+
+
+class SessionManager:
+    """Tracks per-session memory and moves idle sessions' state to disk
+
+    Each script run calls touch() with its session id and state before any
+    state is read, and finish_run() once it is done. A session's state is
+    only ever changed from its own script runs: sweep() just marks idle
+    sessions for eviction and asks wake(session_id) to rerun them. At the
+    end of that run the session pickles its spooled keys to disk and
+    deletes its dropped keys (the app rebuilds those from its own files);
+    its next touch() puts the spooled keys back. Sessions marked for
+    eviction or offloaded are not referenced until they run again.
+
+    Memory figures cover the spooled keys, which hold each session's own
+    data, and are refreshed at most every MEASURE_INTERVAL seconds so a
+    rerun does not pay for walking the session state.
+    """
+
+    def __init__(self, spooled_keys, dropped_keys=(), ttl=SESSION_TTL, spool_dir=SESSION_SPOOL_DIR, wake=None):
+        self.spooled_keys = tuple(spooled_keys)
+        self.dropped_keys = tuple(dropped_keys)
+        self.ttl = ttl
+        self.spool_dir = private_dir(spool_dir)
+        self.wake = wake
+        self.sessions = {}
+        self.last_sweep = 0.0
+        self.stats = {"offloaded": 0, "restored": 0, "bytes_offloaded": 0}
+        self._lock = threading.Lock()
+
+    def _spool_path(self, session_id):
+        return os.path.join(self.spool_dir, f"{session_id}.pickle")
+
+    def touch(self, session_id, state):
+        """Mark a session active, restoring its state if it was offloaded; returns True on restore"""
+        now = time.time()
+        with self._lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                entry = self.sessions[session_id] = {"bytes": 0, "offloaded": False, "evict": False, "measured": 0.0}
+            entry["state"] = state
+            # The rerun asked for by sweep() does not count as activity
+            entry["evicting"] = entry["evict"]
+            entry["evict"] = False
+            if not entry["evicting"]:
+                entry["last_seen"] = now
+            restored = entry["offloaded"] and self._restore(session_id, entry)
+            if restored or now - entry["measured"] >= MEASURE_INTERVAL:
+                entry["bytes"] = self._measure(state)
+                entry["measured"] = now
+        if now - self.last_sweep >= SWEEP_INTERVAL:
+            self.sweep(now)
+        return restored
+
+    def _measure(self, state):
+        # Dropped keys are copies of shared files and would make every
+        # measurement as slow as the whole database is large
+        return sum(deep_sizeof(state[key]) for key in self.spooled_keys if key in state)
+
+    def finish_run(self, session_id):
+        """End of a script run: offload the session's state if the run was its eviction; returns True if so"""
+        with self._lock:
+            entry = self.sessions.get(session_id)
+            if entry is None or not entry.get("evicting"):
+                return False
+            entry["evicting"] = False
+            self._offload(session_id, entry)
+        return True
+
+    def _offload(self, session_id, entry):
+        state = entry["state"]
+        snapshot = {key: state[key] for key in self.spooled_keys if key in state}
+        path = self._spool_path(session_id)
+        tmp_path = path + ".tmp"
+        # Readable by this user only, like the directory
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        for key in self.spooled_keys + self.dropped_keys:
+            if key in state:
+                del state[key]
+        self.stats["offloaded"] += 1
+        self.stats["bytes_offloaded"] += entry["bytes"]
+        entry["offloaded"] = True
+        entry["bytes"] = 0
+        # The session's next touch() hands its state back
+        entry["state"] = None
+
+    def _restore(self, session_id, entry):
+        path = self._spool_path(session_id)
+        entry["offloaded"] = False
+        try:
+            with open(path, "rb") as f:
+                snapshot = pickle.load(f)
+        except OSError:
+            # Spool file removed: the app's defaults take over
+            return False
+        os.remove(path)
+        state = entry["state"]
+        for key, value in snapshot.items():
+            state[key] = value
+        self.stats["restored"] += 1
+        return True
+
+    def sweep(self, now=None):
+        """Mark sessions idle longer than the TTL for eviction and forget long-abandoned ones"""
+        now = time.time() if now is None else now
+        to_wake = []
+        with self._lock:
+            self.last_sweep = now
+            for session_id, entry in list(self.sessions.items()):
+                idle = now - entry["last_seen"]
+                if idle > SPOOL_MAX_AGE:
+                    # Offloaded, or marked but never rerun (the session is gone)
+                    del self.sessions[session_id]
+                    try:
+                        os.remove(self._spool_path(session_id))
+                    except OSError:
+                        pass
+                elif idle > self.ttl and not entry["offloaded"] and not entry["evict"]:
+                    entry["evict"] = True
+                    # Until its eviction run the state belongs to the session alone
+                    entry["state"] = None
+                    to_wake.append(session_id)
+        if self.wake is not None:
+            for session_id in to_wake:
+                self.wake(session_id)
+
+    def metrics(self, session_id=None):
+        """Memory and offload figures for all sessions, plus one session if given"""
+        now = time.time()
+        with self._lock:
+            sessions = list(self.sessions.items())
+            figures = {
+                "sessions": len(sessions),
+                "offloaded_sessions": sum(entry["offloaded"] for _, entry in sessions),
+                "evicting_sessions": sum(entry["evict"] for _, entry in sessions),
+                "resident_bytes": sum(entry["bytes"] for _, entry in sessions),
+                "ttl": self.ttl,
+                **self.stats,
+            }
+            if session_id in self.sessions:
+                entry = self.sessions[session_id]
+                figures["session_bytes"] = entry["bytes"]
+                figures["session_idle"] = now - entry["last_seen"]
+        return figures
@@ -0,0 +1,25 @@
+from advisor import build_messages, prompt_history
+
+
+def turns(count, size=10):
+    return [{"user": f"q{i}", "assistant": "a" * size} for i in range(count)]
+
+
+def test_prompt_history_keeps_the_most_recent_turns_in_order():
+    kept = prompt_history(turns(50), max_turns=5, max_tokens=10000)
+    assert [turn["user"] for turn in kept] == ["q45", "q46", "q47", "q48", "q49"]
+
+
+def test_prompt_history_stops_at_the_token_budget():
+    # Each turn is estimated at 2 + 101 tokens
+    kept = prompt_history(turns(10, size=400), max_turns=10, max_tokens=310)
+    assert [turn["user"] for turn in kept] == ["q7", "q8", "q9"]
+    assert prompt_history(turns(1, size=4000), max_turns=10, max_tokens=100) == []
+
+
+def test_build_messages_sends_capped_history():
+    messages = build_messages("next", turns(100))
+    assert messages[0]["role"] == "system"
+    assert messages[-1] == {"role": "user", "content": "next"}
+    assert len(messages) < 2 + 2 * 100
+    assert messages[-2]["content"] == "a" * 10
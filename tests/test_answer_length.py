@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from answer_length import (
+    BUDGET_STEP, DEFAULT_BUDGETS, MIN_BUDGET, MIN_SAMPLES, LengthPredictor, classify_question, estimate_tokens
+)
+from latency_stats import FLUSH_INTERVAL
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "answer_lengths.json")
+
+
+@pytest.mark.parametrize("message, category", [
+    ("Write a Python script to buffer points", "code"),
+    ("How do I reproject a shapefile?", "howto"),
+    ("What is the difference between WGS84 and NAD83?", "compare"),
+    ("What is a DEM?", "definition"),
+    ("Tell me about remote sensing", "general"),
+    # Earlier categories win
+    ("How to write a geopandas function", "code"),
+])
+def test_classify_question(message, category):
+    assert classify_question(message) == category
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens(None) == 1
+    assert estimate_tokens("x" * 400) == 101
+
+
+def test_defaults_until_enough_samples(path):
+    predictor = LengthPredictor(path)
+    assert predictor.predict("What is a DEM?", 4096) == DEFAULT_BUDGETS["definition"]
+    for _ in range(MIN_SAMPLES - 1):
+        predictor.record("What is a DEM?", "x" * 4000)
+    assert predictor.predict("What is a DEM?", 4096) == DEFAULT_BUDGETS["definition"]
+
+
+def test_learned_budget_is_rounded_and_clamped(path):
+    predictor = LengthPredictor(path)
+    for _ in range(MIN_SAMPLES):
+        predictor.record("What is a DEM?", "x" * 2000)  # about 500 tokens
+    budget = predictor.predict("What is a DEM?", 4096)
+    assert budget % BUDGET_STEP == 0
+    assert 500 * 1.25 <= budget <= 500 * 1.25 * 1.05 + BUDGET_STEP
+    # Never above the caller's ceiling
+    assert predictor.predict("What is a DEM?", 300) == 300
+    for _ in range(10 * MIN_SAMPLES):
+        predictor.record("Tell me about GIS", "ok")
+    # Short answers still get MIN_BUDGET
+    assert predictor.predict("Tell me about GIS", 4096) == MIN_BUDGET
+    assert predictor.stats["requests"] == 3
+    assert predictor.stats["ceiling"] == 4096 + 300 + 4096
+
+
+def test_flush_merges_with_other_processes(path):
+    first, second = LengthPredictor(path), LengthPredictor(path)
+    first.record("What is a DEM?", "x" * 400)
+    second.record("What is a DEM?", "x" * 400)
+    second.record("Write code", "x" * 4000)
+    first.flush()
+    second.flush()
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    assert sum(saved["definition"].values()) == 2
+    assert sum(saved["code"].values()) == 1
+    # Each process now predicts from the pooled samples
+    assert second._saved == saved
+
+
+def test_failed_flush_keeps_samples(path, monkeypatch):
+    predictor = LengthPredictor(path)
+    predictor.record("What is a DEM?", "x" * 400)
+
+    def locked_out(*args, **kwargs):
+        raise OSError("read-only file system")
+
+    monkeypatch.setattr("latency_stats.file_lock", locked_out)
+    predictor.record("What is a DEM?", "x" * 400)
+    predictor.flush()
+    assert sum(predictor._pending["definition"].values()) == 2
+    monkeypatch.undo()
+    predictor._flush_at_exit()
+    assert predictor._pending == {}
+    assert sum(LengthPredictor(path)._saved["definition"].values()) == 2
+
+
+def test_record_flushes_after_the_interval(path):
+    predictor = LengthPredictor(path)
+    predictor.record("What is a DEM?", "x")
+    assert predictor._pending
+    predictor._last_flush -= FLUSH_INTERVAL
+    predictor.record("What is a DEM?", "x")
+    assert predictor._pending == {}
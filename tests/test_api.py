@@ -0,0 +1,114 @@
+import json
+
+import groq
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import chat_store
+from answer_length import LengthPredictor
+from passwords import hash_password
+from user_store import UserStore
+
+USAGE = {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8}
+
+
+def completion_handler(request):
+    body = json.loads(request.content)
+    question = body["messages"][-1]["content"]
+    if body.get("stream"):
+        chunks = [{"id": "c", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                   "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}]}
+                  for part in ("Answer ", "to ", question)]
+        chunks.append({"id": "c", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                       "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                       "x_groq": {"id": "c", "usage": USAGE}})
+        sse = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n"
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=sse.encode())
+    return httpx.Response(200, json={
+        "id": "c", "object": "chat.completion", "created": 0, "model": body["model"],
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": f"Answer to {question}"},
+                     "finish_reason": "stop"}],
+        "usage": USAGE,
+    })
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = UserStore(str(tmp_path / "user_data.json"))
+    store.update(lambda data: data.update(ann={"password": hash_password("secret"), "threads": {}}))
+    monkeypatch.setattr(api, "store", store)
+    monkeypatch.setattr(api, "predictor", LengthPredictor(str(tmp_path / "answer_lengths.json")))
+    monkeypatch.setattr(api, "_limiters", {})
+    monkeypatch.setattr(chat_store, "CHAT_DATA_DIR", str(tmp_path / "chat_data"))
+    transport = httpx.MockTransport(completion_handler)
+    monkeypatch.setattr(api, "sync_client", lambda: groq.Groq(
+        api_key="test", http_client=httpx.Client(transport=transport), max_retries=0))
+    monkeypatch.setattr(api, "async_client", lambda: groq.AsyncGroq(
+        api_key="test", http_client=httpx.AsyncClient(transport=transport), max_retries=0))
+    # Without the context manager the lifespan, and with it the warm-up, does not run
+    return TestClient(api.app)
+
+
+AUTH = ("ann", "secret")
+
+
+def test_wrong_credentials_are_rejected(client):
+    response = client.get("/threads", auth=("ann", "guess"))
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Basic"
+    assert client.get("/threads").status_code == 401
+
+
+def test_deleted_user_is_rejected(client):
+    client.get("/threads", auth=AUTH)
+    api.store.update(lambda data: data.pop("ann"))
+    assert client.post("/chat", json={"message": "hi"}, auth=AUTH).status_code == 401
+
+
+def test_unknown_model_is_a_validation_error(client):
+    assert client.post("/chat", json={"message": "hi", "model": "gpt-x"}, auth=AUTH).status_code == 422
+
+
+def test_unknown_thread_is_404(client):
+    assert client.post("/chat", json={"message": "hi", "thread_id": "nope"}, auth=AUTH).status_code == 404
+    assert client.get("/threads/nope/turns", auth=AUTH).status_code == 404
+
+
+def test_rate_limit_returns_429_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(api, "API_RATE_PER_MINUTE", 6.0)
+    monkeypatch.setattr(api, "API_BURST", 2)
+    statuses = [client.post("/chat", json={"message": "what is EPSG:4326"}, auth=AUTH) for _ in range(3)]
+    assert [response.status_code for response in statuses] == [200, 200, 429]
+    assert 1 <= int(statuses[2].headers["retry-after"]) <= 10
+
+
+def test_chat_answers_stores_and_continues_a_thread(client):
+    first = client.post("/chat", json={"message": "what is a raster"}, auth=AUTH).json()
+    assert first["answer"] == "Answer to what is a raster"
+    assert first["position"] == 0 and first["tokens"] == 8
+    second = client.post("/chat", json={"message": "and a vector", "thread_id": first["thread_id"]}, auth=AUTH)
+    assert second.json()["position"] == 1
+    threads = client.get("/threads", auth=AUTH).json()
+    assert [(thread["thread_id"], thread["turns"]) for thread in threads] == [(first["thread_id"], 2)]
+    page = client.get(f"/threads/{first['thread_id']}/turns", auth=AUTH).json()
+    assert [turn["user"] for turn in page["turns"]] == ["what is a raster", "and a vector"]
+    hits = client.get("/search", params={"q": "vector"}, auth=AUTH).json()
+    assert hits[0]["position"] == 1
+
+
+def test_streamed_chat_sends_deltas_then_done(client):
+    with client.stream("POST", "/chat", json={"message": "hello", "stream": True}, auth=AUTH) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    assert [event for event, _ in events] == ["delta", "delta", "delta", "done"]
+    assert "".join(data["content"] for event, data in events[:-1]) == "Answer to hello"
+    done = events[-1][1]
+    assert done["position"] == 0 and done["tokens"] == 8
+    assert chat_store.load_turns("ann", done["thread_id"], 0, 1)[0]["assistant"] == "Answer to hello"
+
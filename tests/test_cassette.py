@@ -0,0 +1,103 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from cassette import RECORD, REPLAY, Cassette, CassetteTransport, request_key
+
+URL = "https://api.example/openai/v1/chat/completions"
+
+
+def sse_handler(request):
+    body = json.loads(request.content)
+    chunks = [f"data: {json.dumps({'echo': body['q'], 'part': i})}\n\n".encode() for i in range(3)]
+    return httpx.Response(200, headers={"content-type": "text/event-stream", "set-cookie": "s=1"},
+                          content=iter(chunks + [b"data: [DONE]\n\n"]))
+
+
+def recorder(path):
+    transport = CassetteTransport(str(path), mode=RECORD)
+    # Stand in for the real API
+    transport._inner = httpx.MockTransport(sse_handler)
+    return transport
+
+
+def test_request_key_ignores_json_key_order():
+    a = httpx.Request("POST", URL, content=b'{"model": "m", "q": "hi"}')
+    b = httpx.Request("POST", URL, content=b'{"q":"hi","model":"m"}')
+    c = httpx.Request("POST", URL, content=b'{"q":"bye","model":"m"}')
+    assert request_key(a) == request_key(b) != request_key(c)
+
+
+def test_record_then_replay(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    with httpx.Client(transport=recorder(path)) as client:
+        recorded = client.post(URL, json={"q": "hi"})
+        client.post(URL, json={"q": "bye"})
+    interactions = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(interactions) == 2
+    assert all(k.lower() != "set-cookie" for k, _ in interactions[0]["headers"])
+    assert len(interactions[0]["chunks"]) == 4
+
+    with httpx.Client(transport=CassetteTransport(str(path), mode=REPLAY, speed=0)) as client:
+        with client.stream("POST", URL, json={"q": "hi"}) as replayed:
+            chunks = list(replayed.iter_bytes())
+        assert replayed.status_code == 200
+        assert replayed.headers["content-type"] == "text/event-stream"
+        assert b"".join(chunks) == recorded.content
+        assert '"echo": "bye"' in client.post(URL, json={"q": "bye"}).text
+
+
+def test_replay_without_recording_raises_connect_error(tmp_path):
+    with httpx.Client(transport=CassetteTransport(str(tmp_path / "empty.jsonl"), speed=0)) as client:
+        with pytest.raises(httpx.ConnectError):
+            client.post(URL, json={"q": "hi"})
+
+
+def test_repeated_requests_replay_in_order_and_cycle(tmp_path):
+    request = httpx.Request("POST", URL, content=b"{}")
+    cassette = Cassette(str(tmp_path / "c.jsonl"))
+    for n in range(2):
+        cassette.add({"key": request_key(request), "status": 200, "headers": [], "headers_at": 0,
+                      "chunks": [[0, f"reply {n}"]]})
+    with httpx.Client(transport=CassetteTransport(Cassette(cassette.path), speed=0)) as client:
+        assert [client.post(URL, content=b"{}").text for _ in range(3)] == ["reply 0", "reply 1", "reply 0"]
+
+
+def test_replay_reproduces_scaled_timing(tmp_path):
+    request = httpx.Request("POST", URL, content=b"{}")
+    cassette = Cassette(str(tmp_path / "c.jsonl"))
+    cassette.add({"key": request_key(request), "status": 200, "headers": [], "headers_at": 0.05,
+                  "chunks": [[0.1, "a"], [0.2, "b"]]})
+    for speed, low, high in [(1.0, 0.2, 0.5), (0.25, 0.05, 0.15), (0, 0, 0.05)]:
+        with httpx.Client(transport=CassetteTransport(Cassette(cassette.path), speed=speed)) as client:
+            started = time.perf_counter()
+            assert client.post(URL, content=b"{}").text == "ab"
+            assert low <= time.perf_counter() - started < high
+
+
+def test_async_record_and_replay(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+
+    async def run():
+        transport = CassetteTransport(str(path), mode=RECORD)
+        transport._async_inner = httpx.MockTransport(
+            lambda request: httpx.Response(200, json={"answer": json.loads(request.content)["q"]})
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            recorded = await client.post(URL, json={"q": "async"})
+        async with httpx.AsyncClient(transport=CassetteTransport(str(path), speed=0)) as client:
+            replayed = await client.post(URL, json={"q": "async"})
+        return recorded, replayed
+
+    recorded, replayed = asyncio.run(run())
+    assert replayed.json() == recorded.json() == {"answer": "async"}
+
+
+def test_request_key_ignores_max_tokens():
+    # Set per request by the answer length predictor, which changes as it learns
+    a = httpx.Request("POST", URL, content=b'{"q": "hi", "max_tokens": 512}')
+    b = httpx.Request("POST", URL, content=b'{"q": "hi", "max_tokens": 768}')
+    assert request_key(a) == request_key(b)
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+
+import pytest
+
+import chat_store
+from user_store import file_lock
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat_store, "CHAT_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(chat_store, "HOT_TURNS", 10)
+    monkeypatch.setattr(chat_store, "BLOCK_TURNS", 5)
+    chat_store._block_cache.clear()
+    return tmp_path
+
+
+def make_turns(start, count):
+    return [{"user": f"question {i} über", "assistant": f"answer {i}", "timestamp": str(i)} for i in range(start, start + count)]
+
+
+def test_round_trip_of_hot_turns():
+    turns = make_turns(0, 3)
+    assert chat_store.append_turns("ann", "t1", turns[:2]) == 0
+    assert chat_store.append_turn("ann", "t1", turns[2]) == 2
+    assert chat_store.count_turns("ann", "t1") == 3
+    assert chat_store.load_turns("ann", "t1", 0, 10) == turns
+    assert list(chat_store.iter_turns("ann", "t1")) == turns
+    assert chat_store.load_page("ann", "t1", limit=2) == (turns[1:], 1)
+
+
+def test_compaction_moves_whole_blocks_and_keeps_order():
+    turns = make_turns(0, 27)
+    for turn in turns:
+        chat_store.append_turn("ann", "t1", turn)
+    assert os.path.exists(chat_store.cold_path("ann", "t1"))
+    stats = chat_store.storage_stats("ann", ["t1"])
+    assert stats["cold_turns"] % 5 == 0 and stats["cold_turns"] > 0
+    assert stats["hot_turns"] >= 10
+    assert stats["cold_turns"] + stats["hot_turns"] == 27
+    assert stats["ratio"] > 0
+    assert chat_store.count_turns("ann", "t1") == 27
+    assert chat_store.load_turns("ann", "t1", 0, 27) == turns
+    # Ranges spanning cold blocks and the hot file
+    assert chat_store.load_turns("ann", "t1", 3, 19) == turns[3:19]
+    assert list(chat_store.iter_turns("ann", "t1")) == turns
+
+
+def test_threads_and_users_are_separate():
+    chat_store.append_turns("ann", "t1", make_turns(0, 2))
+    chat_store.append_turns("ann", "t2", make_turns(5, 1))
+    chat_store.append_turns("a/n n", "t1", make_turns(9, 1))
+    assert chat_store.load_turns("ann", "t2", 0, 5) == make_turns(5, 1)
+    assert chat_store.load_turns("a/n n", "t1", 0, 5) == make_turns(9, 1)
+    assert chat_store.count_turns("bob", "t1") == 0
+
+
+def test_interrupted_compaction_does_not_duplicate_turns(monkeypatch):
+    turns = make_turns(0, 14)
+    chat_store.append_turns("ann", "t1", turns)
+    hot = chat_store.thread_path("ann", "t1")
+    real_replace = os.replace
+
+    def crash_on_hot_replace(src, dst):
+        if dst == hot:
+            raise OSError("killed")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", crash_on_hot_replace)
+    with pytest.raises(OSError):
+        chat_store.append_turn("ann", "t1", turns[0] | {"user": "question 14"})
+    monkeypatch.setattr(os, "replace", real_replace)
+    assert os.path.getsize(chat_store.cold_path("ann", "t1")) > 0
+
+    # Readers ignore the blocks the compaction appended before it stopped
+    expected = turns + [turns[0] | {"user": "question 14"}]
+    assert chat_store.load_turns("ann", "t1", 0, 100) == expected
+    assert list(chat_store.iter_turns("ann", "t1")) == expected
+    # The next append discards them and compacts again
+    extra = make_turns(15, 1)
+    assert chat_store.append_turns("ann", "t1", extra) == 15
+    assert chat_store.load_turns("ann", "t1", 0, 100) == expected + extra
+    assert not os.path.exists(chat_store.cold_path("ann", "t1") + ".pending")
+
+
+def test_delete_thread_removes_its_files():
+    chat_store.append_turns("ann", "t1", make_turns(0, 20))
+    chat_store.delete_thread("ann", "t1")
+    assert chat_store.count_turns("ann", "t1") == 0
+    assert not os.path.exists(chat_store.thread_path("ann", "t1"))
+    assert not os.path.exists(chat_store.cold_path("ann", "t1"))
+
+
+def test_delete_thread_purges_cached_blocks():
+    chat_store.append_turns("ann", "t1", make_turns(0, 20))
+    assert chat_store.load_turns("ann", "t1", 0, 5) == make_turns(0, 5)
+    chat_store.delete_thread("ann", "t1")
+    # A new thread reusing the id must not be served the old blocks
+    chat_store.append_turns("ann", "t1", make_turns(100, 20))
+    assert chat_store.load_turns("ann", "t1", 0, 5) == make_turns(100, 5)
+
+
+def test_user_locked_elsewhere_does_not_block_other_users():
+    chat_store.append_turns("bob", "t1", make_turns(0, 1))
+    done = threading.Event()
+
+    def other_user():
+        chat_store.append_turns("ann", "t1", make_turns(0, 1))
+        chat_store.load_turns("ann", "t1", 0, 1)
+        done.set()
+
+    # As another replica would: bob's lock file held through a separate descriptor
+    with file_lock(os.path.join(chat_store._user_dir("bob"), ".lock")):
+        waiting = threading.Thread(target=chat_store.append_turns, args=("bob", "t1", make_turns(1, 1)))
+        waiting.start()
+        time.sleep(0.05)
+        thread = threading.Thread(target=other_user)
+        thread.start()
+        assert done.wait(5)
+    for t in (waiting, thread):
+        t.join()
+    assert chat_store.count_turns("bob", "t1") == 2
+
+
+def test_compaction_syncs_cold_blocks_before_replacing_hot_file(monkeypatch):
+    chat_store.append_turns("ann", "t1", make_turns(0, 14))
+    hot, cold = chat_store.thread_path("ann", "t1"), chat_store.cold_path("ann", "t1")
+    events = []
+    real_fsync, real_replace = os.fsync, os.replace
+
+    def fsync(fd):
+        events.append(("fsync", os.readlink(f"/proc/self/fd/{fd}")))
+        real_fsync(fd)
+
+    def replace(src, dst):
+        events.append(("replace", dst))
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    monkeypatch.setattr(os, "replace", replace)
+    chat_store.append_turns("ann", "t1", make_turns(14, 1))
+    hot_replace = events.index(("replace", hot))
+    synced = {path for kind, path in events[:hot_replace] if kind == "fsync"}
+    assert {cold, hot + ".tmp", cold + ".pending.tmp", os.path.dirname(cold)} <= synced
+    assert ("fsync", os.path.dirname(hot)) in events[hot_replace:]
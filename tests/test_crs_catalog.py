@@ -0,0 +1,70 @@
+from crs_catalog import (
+    answer_crs_question,
+    crs_context,
+    find_crs_codes,
+    find_crs_names,
+    get_crs,
+    search_crs,
+)
+
+
+def test_get_crs_by_code():
+    crs = get_crs(27700)
+    assert crs.name == "OSGB36 / British National Grid"
+    assert crs.units == "metre"
+    assert get_crs("4326").name == "WGS 84"
+    assert get_crs(9999) is None
+
+
+def test_utm_families_are_generated():
+    assert get_crs(32633).name == "WGS 84 / UTM zone 33N"
+    assert "+zone=33" in get_crs(32633).proj
+    assert get_crs(32760).name == "WGS 84 / UTM zone 60S"
+    assert "+south" in get_crs(32760).proj
+    assert get_crs(28356).name == "GDA94 / MGA zone 56"
+
+
+def test_search_crs_matches_name_and_word_prefixes():
+    assert [crs.code for crs in search_crs("mercator")] == [2193, 3395, 3857]
+    assert [crs.code for crs in search_crs("OSGB")] == [4277, 27700]
+    assert [crs.code for crs in search_crs("british")] == [27700]
+    assert search_crs("wgs 84 / utm zone 3", limit=3) == [get_crs(32603), get_crs(32630), get_crs(32631)]
+    assert search_crs("") == []
+    assert search_crs("nonexistent") == []
+
+
+def test_find_crs_codes_keeps_order_and_drops_unknown():
+    assert find_crs_codes("Reproject EPSG:3857 to epsg 4326, not EPSG:9999") == [3857, 4326]
+
+
+def test_find_crs_names_in_free_text():
+    names = find_crs_names("Should I store this in british national grid or WGS 84 / Pseudo-Mercator?")
+    assert [crs.code for crs in names] == [27700, 3857]
+    assert find_crs_names("how do I buffer a polygon") == []
+
+
+def test_answer_crs_question_plain_lookup():
+    answer = answer_crs_question("What is EPSG:27700?")
+    assert "British National Grid" in answer
+    assert "+proj=tmerc" in answer
+
+
+def test_answer_crs_question_reports_unknown_codes():
+    answer = answer_crs_question("EPSG:4326 and EPSG:9999")
+    assert "WGS 84" in answer
+    assert "EPSG:9999 is not in the local CRS catalog" in answer
+
+
+def test_answer_crs_question_falls_through_to_the_model():
+    assert answer_crs_question("How do I reproject a shapefile to EPSG:3857 in QGIS?") is None
+    assert answer_crs_question("What is EPSG:9999?") is None
+    assert answer_crs_question("What is a projection?") is None
+
+
+def test_crs_context_lists_codes_names_and_unknowns():
+    context = crs_context("Convert EPSG:9999 data from British National Grid to EPSG:4326")
+    lines = context.splitlines()
+    assert lines[1].startswith("- EPSG:4326 WGS 84;")
+    assert lines[2].startswith("- EPSG:27700 OSGB36 / British National Grid;")
+    assert lines[3] == "- EPSG:9999 is not in this reference data"
+    assert crs_context("buffer a polygon") == ""
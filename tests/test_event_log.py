@@ -0,0 +1,68 @@
+import json
+import logging
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import event_log
+from event_log import log_event, setup_event_logging
+
+
+@pytest.fixture
+def stop_logging(monkeypatch):
+    """Isolate the module's listener and handlers; yields a function that drains and stops the listener"""
+    registered = []
+    monkeypatch.setattr(event_log, "atexit", SimpleNamespace(register=registered.append))
+    monkeypatch.setattr(event_log, "_listener", None)
+    monkeypatch.setattr(event_log.logger, "handlers", [])
+
+    def stop():
+        while registered:
+            registered.pop()()
+
+    yield stop
+    stop()
+
+
+def read_events(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_events_reach_the_rotating_file_through_the_listener(stop_logging, tmp_path):
+    path = tmp_path / "logs" / "events.jsonl"
+    setup_event_logging(str(path), max_bytes=400, backups=2)
+    for i in range(12):
+        log_event("chat_response", username="ann", tokens=i, ms=1.5)
+    log_event("chat_error", level=logging.ERROR, username="ann", error="boom")
+    stop_logging()
+
+    files = sorted(p.name for p in path.parent.iterdir())
+    assert files == ["events.jsonl", "events.jsonl.1", "events.jsonl.2"]
+    newest = read_events(path)
+    assert newest[-1]["event"] == "chat_error"
+    assert newest[-1]["level"] == "error"
+    assert newest[-1]["error"] == "boom"
+    kept = read_events(str(path) + ".2") + read_events(str(path) + ".1") + newest
+    tokens = [entry["tokens"] for entry in kept if entry["event"] == "chat_response"]
+    # Older files beyond the backup count are gone, the rest stay in order
+    assert tokens == list(range(12 - len(tokens), 12))
+    assert all(entry["ts"].endswith("+00:00") and entry["username"] == "ann" for entry in kept)
+
+
+def test_extra_handlers_run_on_the_writer_thread(stop_logging, tmp_path):
+    seen = []
+
+    class Recorder(logging.Handler):
+        def emit(self, record):
+            seen.append((record.msg, record.fields, threading.current_thread() is threading.main_thread()))
+
+    setup_event_logging(str(tmp_path / "events.jsonl"), extra_handlers=[Recorder()])
+    # Repeated setup keeps the first listener
+    setup_event_logging(str(tmp_path / "other.jsonl"))
+    log_event("warmup", status="ready")
+    stop_logging()
+    assert seen == [("warmup", {"status": "ready"}, False)]
+    assert not (tmp_path / "other.jsonl").exists()
+    assert read_events(tmp_path / "events.jsonl")[0]["status"] == "ready"
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import chat_store
+from export_history import export_bytes, iter_export_records, main
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat_store, "CHAT_DATA_DIR", str(tmp_path / "chat_data"))
+    monkeypatch.setattr(chat_store, "HOT_TURNS", 10)
+    monkeypatch.setattr(chat_store, "BLOCK_TURNS", 5)
+    chat_store._block_cache.clear()
+    return tmp_path
+
+
+def make_turns(start, count):
+    return [{"user": f"question {i} über", "assistant": f"answer {i}", "timestamp": str(i)}
+            for i in range(start, start + count)]
+
+
+@pytest.fixture
+def user_data(data_dir):
+    turns = make_turns(0, 27)
+    for turn in turns:
+        chat_store.append_turn("ann", "t1", turn)
+    chat_store.append_turns("ann", "t2", make_turns(100, 2))
+    users = {
+        "ann": {
+            "password": "x",
+            "threads": {
+                "t1": {"title": "Long thread", "updated_at": "26", "turns": 27, "tokens": 0},
+                "t2": {"title": "Short", "updated_at": "101", "turns": 2, "tokens": 0},
+            },
+            "chat_count": 29,
+        },
+        "bob": {"password": "y", "chat_history": make_turns(200, 2)},
+    }
+    path = data_dir / "user_data.json"
+    path.write_text(json.dumps(users, ensure_ascii=False), encoding="utf-8")
+    return str(path), turns
+
+
+def test_compacted_thread_round_trips_through_export(user_data):
+    path, turns = user_data
+    # The thread really is split between cold blocks and the hot file
+    stats = chat_store.storage_stats("ann", ["t1"])
+    assert stats["cold_turns"] > 0 and stats["hot_turns"] > 0
+
+    lines = export_bytes("jsonl", path, {"ann"}).decode("utf-8").splitlines()
+    records = [json.loads(line) for line in lines if json.loads(line)["thread_id"] == "t1"]
+    assert [record["position"] for record in records] == list(range(27))
+    assert [{key: record[key] for key in ("user", "assistant", "timestamp")} for record in records] == turns
+    assert {record["thread_title"] for record in records} == {"Long thread"}
+
+
+def test_all_users_and_legacy_histories(user_data):
+    path, _ = user_data
+    records = list(iter_export_records(path))
+    assert [(r["username"], r["thread_id"]) for r in records].count(("ann", "t2")) == 2
+    assert [r["user"] for r in records if r["username"] == "bob"] == ["question 200 über", "question 201 über"]
+    assert {r["thread_id"] for r in records if r["username"] == "bob"} == {"legacy"}
+    assert len(records) == 31
+    assert [r["username"] for r in iter_export_records(path, {"bob"})] == ["bob", "bob"]
+
+
+def test_markdown_export_to_file(user_data, tmp_path):
+    path, _ = user_data
+    out = tmp_path / "ann.md"
+    main(["--format", "markdown", "--user", "ann", "--data", path, "--output", str(out)])
+    text = out.read_text(encoding="utf-8")
+    assert text.startswith("# GeoAdvisor transcript: ann\n")
+    assert text.count("## 💬 ") == 2
+    assert text.count("### 👤 You") == 29
+    assert text.index("question 9 über") < text.index("question 26 über")
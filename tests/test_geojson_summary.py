@@ -0,0 +1,108 @@
+import io
+import json
+
+import pytest
+
+from geojson_summary import format_geojson_summary, summarize_geojson
+
+
+def feature(geometry, **properties):
+    return {"type": "Feature", "geometry": geometry, "properties": properties}
+
+
+COLLECTION = {
+    "type": "FeatureCollection",
+    "name": "sites",
+    "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:EPSG::4326"}},
+    "features": [
+        feature({"type": "Point", "coordinates": [10.5, 50.25]}, id=1, label="a"),
+        feature({"type": "LineString", "coordinates": [[-3, 40, 120.0], [4, -41]]}, id=2, label=None),
+        feature({"type": "Polygon", "coordinates": [[[0, 0], [2, 0], [2, 2], [0, 0]], []]}, id="3"),
+        feature(None, flag=True),
+        feature({"type": "GeometryCollection", "geometries": [
+            {"type": "MultiPoint", "coordinates": [[170, -60], [171, -61]]},
+            {"type": "Point", "coordinates": []},
+        ]}),
+    ],
+}
+
+
+def summarize(doc, prefix=b"", chunk_size=7, **kwargs):
+    data = prefix + json.dumps(doc, indent=2).encode("utf-8")
+    return summarize_geojson(io.BytesIO(data), chunk_size=chunk_size, **kwargs)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_summary_is_independent_of_chunk_boundaries(chunk_size):
+    summary = summarize(COLLECTION, chunk_size=chunk_size, batch_size=2)
+    assert summary["feature_count"] == 5
+    assert summary["empty_geometries"] == 1
+    assert summary["geometry_types"] == {
+        "Point": 1, "LineString": 1, "Polygon": 1, "null": 1, "GeometryCollection": 1,
+    }
+    assert summary["bbox"] == [-3.0, -61.0, 171.0, 50.25]
+    assert summary["name"] == "sites"
+    assert summary["crs"] == "urn:ogc:def:crs:EPSG::4326"
+    assert summary["schema"] == {
+        "id": {"number": 2, "string": 1},
+        "label": {"string": 1, "null": 1},
+        "flag": {"boolean": 1},
+    }
+    assert summary["vertices"]["total"] == 9
+    assert summary["vertices"]["max"] == 4
+
+
+def test_bom_prefixed_file(tmp_path):
+    path = tmp_path / "sites.geojson"
+    path.write_bytes(b"\xef\xbb\xbf" + json.dumps(COLLECTION).encode("utf-8"))
+    assert summarize_geojson(str(path))["feature_count"] == 5
+
+
+def test_empty_feature_collection():
+    summary = summarize({"type": "FeatureCollection", "features": []})
+    assert summary["feature_count"] == 0
+    assert summary["bbox"] is None
+    assert summary["vertices"] is None
+    assert "Geometry types: none" in format_geojson_summary("empty.geojson", summary)
+
+
+def test_features_before_header_members():
+    doc = {"features": COLLECTION["features"][:1], "type": "FeatureCollection", "name": "late"}
+    summary = summarize(doc)
+    assert summary["feature_count"] == 1
+    assert summary["name"] == "late"
+
+
+def test_ragged_and_malformed_positions():
+    doc = {"type": "FeatureCollection", "features": [
+        feature({"type": "LineString", "coordinates": [[1, 2], [3, 4, 5], [6], [7, 8, 9, 10]]}),
+        feature({"type": "MultiPolygon", "coordinates": [[[]], [[[-1, -2], [0, 0], [-1, -2]]]]}),
+        feature({"type": "Point"}),
+    ]}
+    summary = summarize(doc)
+    assert summary["feature_count"] == 3
+    assert summary["bbox"] == [-1.0, -2.0, 7.0, 8.0]
+    assert summary["vertices"]["total"] == 7
+
+
+def test_bare_geometry_and_geojson_sequence():
+    assert summarize({"type": "Point", "coordinates": [1, 2]})["geometry_types"] == {"Point": 1}
+    seq = b"".join(b"\x1e" + json.dumps(feature({"type": "Point", "coordinates": [i, i]})).encode() + b"\n"
+                   for i in range(3))
+    summary = summarize_geojson(io.BytesIO(seq), chunk_size=5)
+    assert summary["feature_count"] == 3
+    assert summary["bbox"] == [0.0, 0.0, 2.0, 2.0]
+
+
+@pytest.mark.parametrize("cut", [40, 200, -3])
+def test_truncated_file_raises(cut):
+    data = json.dumps(COLLECTION).encode("utf-8")[:cut]
+    with pytest.raises(ValueError):
+        summarize_geojson(io.BytesIO(data), chunk_size=16)
+
+
+def test_format_lists_layer_details():
+    text = format_geojson_summary("sites.geojson", summarize(COLLECTION))
+    assert "- Layer name: sites" in text
+    assert "- Features: 5 (1 without geometry)" in text
+    assert "- Attributes (3): id (number/string); label (string/null); flag (boolean)" in text
@@ -0,0 +1,119 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from gis_tools import (
+    haversine_distance,
+    latlon_to_utm,
+    run_tool,
+    utm_to_latlon,
+    utm_zone,
+    vincenty_distance,
+)
+
+
+def dms(degrees, minutes, seconds):
+    sign = -1 if degrees < 0 else 1
+    return sign * (abs(degrees) + minutes / 60 + seconds / 3600)
+
+
+def test_vincenty_flinders_peak_to_buninyong():
+    # Vincenty's own test line (Survey Review, 1975)
+    distance = vincenty_distance(dms(-37, 57, 3.72030), dms(144, 25, 29.52440),
+                                 dms(-37, 39, 10.15610), dms(143, 55, 35.38390))
+    assert float(distance) == pytest.approx(54972.271, abs=1e-3)
+
+
+def test_vincenty_one_degree_along_equator():
+    assert float(vincenty_distance(0, 0, 0, 1)) == pytest.approx(111319.491, abs=1e-3)
+
+
+def test_vincenty_is_vectorized_and_zero_for_same_point():
+    distances = vincenty_distance(np.array([0.0, 51.5]), np.array([0.0, -0.1]),
+                                  np.array([0.0, 51.5]), np.array([1.0, -0.1]))
+    assert distances.shape == (2,)
+    assert distances[1] == 0
+
+
+def test_vincenty_near_antipodal_returns_nan_and_tool_falls_back():
+    assert math.isnan(float(vincenty_distance(0, 0, 0.5, 179.7)))
+    result = json.loads(run_tool("distance", {"points": [[0, 0], [0.5, 179.7]]}))
+    expected = float(haversine_distance(0, 0, 0.5, 179.7))
+    assert result["total_m"] == pytest.approx(expected, abs=1e-3)
+
+
+@pytest.mark.parametrize("lat, lon, zone", [
+    (48.8584, 2.2945, 31),
+    (-33.8568, 151.2153, 56),
+    (60.0, 5.0, 32),  # Norway exception
+    (78.0, 15.0, 33),  # Svalbard exception
+    (0.0, 179.999, 60),
+])
+def test_utm_zone(lat, lon, zone):
+    assert int(utm_zone(lat, lon)) == zone
+
+
+def test_utm_central_meridian_on_equator():
+    easting, northing, zone, northern = latlon_to_utm(0.0, 3.0)
+    assert int(zone) == 31 and bool(northern)
+    assert float(easting) == pytest.approx(500000.0, abs=1e-6)
+    assert float(northing) == pytest.approx(0.0, abs=1e-6)
+
+
+def test_utm_zone_edge_on_equator():
+    # Widely published value for 0N 0E, on the western edge of zone 31
+    easting, northing, zone, _ = latlon_to_utm(0.0, 0.0)
+    assert int(zone) == 31
+    assert float(easting) == pytest.approx(166021.443, abs=1e-3)
+    assert float(northing) == pytest.approx(0.0, abs=1e-6)
+
+
+def test_utm_southern_hemisphere_false_northing():
+    _, northing, _, northern = latlon_to_utm(-0.000001, 3.0)
+    assert not bool(northern)
+    assert float(northing) == pytest.approx(10000000.0, abs=1)
+
+
+@pytest.mark.parametrize("lat, lon", [(48.8584, 2.2945), (-33.8568, 151.2153), (64.1466, -21.9426), (-54.8, -68.3)])
+def test_utm_round_trip(lat, lon):
+    easting, northing, zone, northern = latlon_to_utm(lat, lon)
+    back_lat, back_lon = utm_to_latlon(easting, northing, zone, northern)
+    # 1e-7 degrees is about a centimetre
+    assert float(back_lat) == pytest.approx(lat, abs=1e-7)
+    assert float(back_lon) == pytest.approx(lon, abs=1e-7)
+
+
+def test_tools_reject_out_of_range_coordinates():
+    assert "latitude" in json.loads(run_tool("distance", {"points": [[91, 0], [0, 0]]}))["error"]
+    assert "longitude" in json.loads(run_tool("to_projected", {"lat": 0, "lon": 200, "target": "utm"}))["error"]
+
+
+@pytest.mark.parametrize("lat", [-80.5, 84.5, 90, -90])
+def test_to_utm_rejects_polar_latitudes(lat):
+    result = run_tool("to_projected", {"lat": lat, "lon": 10, "target": "utm"})
+    assert json.loads(result) == {"error": "latitude must be between -80 and 84 degrees for UTM"}
+    assert "NaN" not in result
+
+
+def test_polar_latitudes_still_project_to_web_mercator():
+    result = json.loads(run_tool("to_projected", {"lat": 89, "lon": 10, "target": "web_mercator"}))
+    assert result["crs"] == "EPSG:3857"
+
+
+def test_utm_accepts_grid_limits():
+    for lat in (-80, 84):
+        assert "error" not in json.loads(run_tool("to_projected", {"lat": lat, "lon": 10, "target": "utm"}))
+
+
+@pytest.mark.parametrize("zone", [0, 61, -3, 31.5])
+def test_utm_tools_reject_invalid_zones(zone):
+    error = {"error": "zone must be an integer between 1 and 60"}
+    assert json.loads(run_tool("to_projected", {"lat": 10, "lon": 10, "target": "utm", "zone": zone})) == error
+    assert json.loads(run_tool("from_projected", {"x": 500000, "y": 0, "source": "utm", "zone": zone})) == error
+
+
+def test_to_utm_accepts_forced_neighbouring_zone():
+    result = json.loads(run_tool("to_projected", {"lat": 51.5, "lon": 0.1, "target": "utm", "zone": 30}))
+    assert result["zone"] == "30N"
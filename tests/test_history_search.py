@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+import history_search
+from history_search import InvertedIndex, index_turn, search_history, tokenize
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    history_search._user_indexes.clear()
+    yield
+    history_search._user_indexes.clear()
+
+
+def turn(user, assistant=""):
+    return {"user": user, "assistant": assistant}
+
+
+def test_tokenize_keeps_codes_and_drops_stopwords():
+    assert tokenize("What is EPSG:4326 in the UTM zone?") == ["epsg:4326", "utm", "zone"]
+
+
+def test_bm25_ranks_rarer_and_more_frequent_terms_higher():
+    index = InvertedIndex()
+    index.add(0, "raster data and vector data")
+    index.add(1, "reproject a raster to utm, raster resampling")
+    index.add(2, "vector tiles")
+    ranked = [doc_id for doc_id, _ in index.search("raster")]
+    assert ranked == [1, 0]
+    assert index.search("utm")[0][0] == 1
+    assert index.search("nothing here") == []
+
+
+def test_bm25_prefers_shorter_documents_for_equal_frequency():
+    index = InvertedIndex()
+    index.add(0, "buffer")
+    index.add(1, "buffer " + " ".join(f"filler{i}" for i in range(30)))
+    assert [doc_id for doc_id, _ in index.search("buffer")] == [0, 1]
+
+
+def test_readding_a_document_is_ignored():
+    index = InvertedIndex()
+    index.add(0, "geocoding")
+    index.add(0, "geocoding geocoding")
+    assert len(index) == 1
+    assert index.total_length == 1
+
+
+def test_search_history_returns_refs_and_indexes_new_turns():
+    turns = [(("t1", 0), turn("how to clip a raster")), (("t1", 1), turn("what is a shapefile"))]
+    assert search_history("ann", "shapefile", turns, thread_turns={"t1": 2})[0][0] == ("t1", 1)
+    index_turn("ann", ("t2", 0), turn("shapefile to geopackage"))
+    refs = [ref for ref, _ in search_history("ann", "geopackage", turns, thread_turns={"t1": 2, "t2": 1})]
+    assert refs == [("t2", 0)]
+
+
+def test_search_history_rebuilds_when_stored_counts_differ():
+    turns = [(("t1", 0), turn("kriging interpolation"))]
+    search_history("ann", "kriging", turns, thread_turns={"t1": 1})
+    # A turn written by another process, never passed to index_turn
+    turns.append((("t1", 1), turn("inverse distance weighting")))
+    refs = [ref for ref, _ in search_history("ann", "weighting", turns, thread_turns={"t1": 2})]
+    assert refs == [("t1", 1)]
+    # Threads without turns do not force a rebuild on every search
+    entry = history_search._user_indexes["ann"]
+    search_history("ann", "kriging", turns, thread_turns={"t1": 2, "empty": 0})
+    assert history_search._user_indexes["ann"] is entry
+
+
+def test_least_recently_searched_user_is_evicted(monkeypatch):
+    monkeypatch.setattr(history_search, "MAX_INDEXED_USERS", 2)
+    for name in ("a", "b", "c"):
+        search_history(name, "gis", [((name, 0), turn("gis"))])
+    assert list(history_search._user_indexes) == ["b", "c"]
+    # A turn for an evicted user is picked up when its index is rebuilt
+    index_turn("a", ("a", 1), turn("gis"))
+    assert "a" not in history_search._user_indexes
+
+
+def test_rebuild_does_not_block_other_users():
+    reading, release = threading.Event(), threading.Event()
+
+    def slow_turns():
+        # Stands in for reading every thread file of a large history
+        reading.set()
+        release.wait(5)
+        yield ("t1", 0), turn("slow")
+
+    slow = threading.Thread(target=search_history, args=("ann", "slow", slow_turns()))
+    slow.start()
+    reading.wait()
+    search_history("bob", "fast", [(("t1", 0), turn("fast"))])
+    index_turn("bob", ("t1", 1), turn("faster"))
+    assert "ann" not in history_search._user_indexes
+    release.set()
+    slow.join()
+    assert search_history("ann", "slow", [])[0][0] == ("t1", 0)
+
+
+def test_concurrent_rebuilds_keep_one_index():
+    turns = [(("t1", 0), turn("contour lines"))]
+    results = []
+
+    def rebuild():
+        results.append(history_search._user_index("ann", iter(turns), {"t1": 1}))
+
+    threads = [threading.Thread(target=rebuild) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert any(result is history_search._user_indexes["ann"] for result in results)
+    assert search_history("ann", "contour", turns, thread_turns={"t1": 1})[0][0] == ("t1", 0)
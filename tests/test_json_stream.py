@@ -0,0 +1,72 @@
+import io
+import json
+
+import pytest
+
+from json_stream import JsonStream
+
+DOC = {
+    "name": "café ☃",
+    "values": [0, -12.5e3, 123456789, True, None, "a,b]}", {"nested": [[1, 2], []]}],
+    "empty": {},
+}
+
+
+def read_all(reader):
+    # Rebuild the document through the pull API, recursing into objects and arrays
+    if reader.peek() == "{":
+        return {key: read_all(reader) for key in reader.iter_object()}
+    return reader.decode()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_values_split_across_chunk_boundaries(chunk_size):
+    text = json.dumps(DOC, indent=1, ensure_ascii=False)
+    reader = JsonStream(io.BytesIO(text.encode("utf-8")), chunk_size=chunk_size)
+    assert read_all(reader) == DOC
+    assert reader.peek() == ""
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 5])
+def test_number_at_window_end_is_not_cut_short(chunk_size):
+    reader = JsonStream(io.StringIO("[1234, 56789]"), chunk_size=chunk_size)
+    assert list(reader.iter_array()) == [1234, 56789]
+
+
+def test_utf8_bom_is_skipped():
+    reader = JsonStream(io.BytesIO(b'\xef\xbb\xbf{"a": 1}'), chunk_size=2)
+    assert read_all(reader) == {"a": 1}
+
+
+def test_empty_containers():
+    reader = JsonStream(io.StringIO(" { } [ ] "))
+    assert list(reader.iter_object()) == []
+    assert list(reader.iter_array()) == []
+    assert reader.peek() == ""
+
+
+def test_record_separators_between_values():
+    reader = JsonStream(io.StringIO('\x1e{"a": 1}\n\x1e{"a": 2}\n'), chunk_size=3)
+    assert [read_all(reader), read_all(reader)] == [{"a": 1}, {"a": 2}]
+    assert reader.peek() == ""
+
+
+@pytest.mark.parametrize("text", ['{"a": [1, 2', '{"a": 1', '[1, 2', '{"a": "unterminated', '{"a"'])
+def test_truncated_input_raises(text):
+    reader = JsonStream(io.StringIO(text), chunk_size=2)
+    with pytest.raises(ValueError):
+        read_all(reader) if text.startswith("{") else list(reader.iter_array())
+
+
+def test_missing_separator_raises():
+    reader = JsonStream(io.StringIO("[1 2]"))
+    with pytest.raises(ValueError, match="expected ',' or ']'"):
+        list(reader.iter_array())
+
+
+def test_detach_leaves_binary_stream_open():
+    raw = io.BytesIO(b"[1]")
+    reader = JsonStream(raw)
+    assert list(reader.iter_array()) == [1]
+    reader.detach()
+    assert not raw.closed
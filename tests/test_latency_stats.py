@@ -0,0 +1,96 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+import latency_stats
+from latency_stats import STATS_WINDOW_DAYS, SUB_BUCKETS, Histogram, ModelStats, _bucket, _bucket_value
+
+
+@pytest.mark.parametrize("value", [1.0, 1.5, 7.0, 123.4, 999.0, 65536.0, 3.6e6])
+def test_bucket_error_is_bounded(value):
+    assert abs(_bucket_value(_bucket(value)) - value) / value <= 1 / SUB_BUCKETS
+
+
+def test_buckets_are_monotonic_and_small_values_share_bucket_zero():
+    assert _bucket(0.0) == _bucket(0.3) == _bucket(1.0) == 0
+    values = [1 + i * 0.37 for i in range(5000)]
+    buckets = [_bucket(v) for v in values]
+    assert buckets == sorted(buckets)
+
+
+def test_percentiles():
+    histogram = Histogram()
+    assert histogram.percentile(50) is None
+    for value in range(1, 1001):
+        histogram.record(value)
+    assert histogram.total == 1000
+    for pct, expected in [(50, 500), (90, 900), (99, 990), (100, 1000)]:
+        assert histogram.percentile(pct) == pytest.approx(expected, rel=1 / SUB_BUCKETS)
+    assert histogram.percentile(0) == pytest.approx(1, rel=1 / SUB_BUCKETS)
+
+
+def test_merge_adds_counts_from_histograms_and_saved_form():
+    a, b = Histogram(), Histogram()
+    for value in (10, 20, 30):
+        a.record(value)
+    b.record(20, count=5)
+    merged = Histogram(a.to_dict()).merge(b)
+    assert merged.total == 8
+    assert merged.counts[_bucket(20)] == 6
+    # The saved form survives a JSON round trip with string keys
+    assert Histogram(json.loads(json.dumps(merged.to_dict()))).counts == merged.counts
+
+
+@pytest.fixture
+def today(monkeypatch):
+    day = date(2026, 10, 18)
+    monkeypatch.setattr(latency_stats, "_today", lambda: day)
+    return day
+
+
+def test_flush_merges_per_day_and_drops_old_days(tmp_path, today):
+    path = str(tmp_path / "model_stats.json")
+    old_day = (today - timedelta(days=STATS_WINDOW_DAYS)).isoformat()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({old_day: {"m": {"requests": 9, "errors": 0}},
+                   today.isoformat(): {"m": {"requests": 1, "errors": 1}}}, f)
+    first, second = ModelStats(path), ModelStats(path)
+    first.record("m", seconds=2.0, first_token=0.5, tokens=100)
+    second.record("m", seconds=4.0, first_token=1.0, tokens=100)
+    second.record("other", error=True)
+    first.flush()
+    second.flush()
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    assert list(saved) == [today.isoformat()]
+    entry = saved[today.isoformat()]["m"]
+    assert (entry["requests"], entry["errors"]) == (3, 1)
+    assert sum(entry["total_ms"].values()) == 2
+    assert saved[today.isoformat()]["other"] == {"requests": 1, "errors": 1}
+
+
+def test_summary_combines_saved_and_pending_days(tmp_path, today):
+    stats = ModelStats(str(tmp_path / "model_stats.json"))
+    for seconds in (1.0, 2.0, 3.0):
+        stats.record("m", seconds=seconds, first_token=0.2, tokens=50)
+    stats.flush()
+    stats.record("m", seconds=10.0)
+    stats.record("m", error=True)
+    figures = stats.summary()["m"]
+    assert figures["requests"] == 5 and figures["errors"] == 1
+    assert figures["error_rate"] == pytest.approx(0.2)
+    assert figures["total_ms"].total == 4
+    assert figures["total_ms"].percentile(50) == pytest.approx(2000, rel=1 / SUB_BUCKETS)
+    assert figures["tokens_per_sec"].percentile(100) == pytest.approx(50, rel=1 / SUB_BUCKETS)
+
+
+def test_fastest_needs_samples_and_health(tmp_path, today):
+    stats = ModelStats(str(tmp_path / "model_stats.json"))
+    for i in range(5):
+        stats.record("slow", seconds=3.0)
+        stats.record("fast", seconds=1.0)
+        stats.record("flaky", seconds=0.5, error=i % 2 == 0)
+    stats.record("new", seconds=0.1)
+    assert stats.fastest(["slow", "fast", "flaky", "new"]) == "fast"
+    assert stats.fastest(["new"]) is None
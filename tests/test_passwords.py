@@ -0,0 +1,80 @@
+import pytest
+
+import passwords
+from passwords import SCRYPT_N, check_login, hash_password, is_hashed, verify_password
+from user_store import UserStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    passwords._verified.clear()
+    return UserStore(str(tmp_path / "user_data.json"))
+
+
+def add_user(store, username, stored):
+    def mutate(data):
+        data[username] = {"password": stored}
+    store.update(mutate)
+
+
+def test_hash_and_verify():
+    stored = hash_password("correct horse")
+    assert is_hashed(stored)
+    assert stored.split("$")[1] == str(SCRYPT_N)
+    assert verify_password(stored, "correct horse") == (True, False)
+    assert verify_password(stored, "wrong horse")[0] is False
+
+
+def test_hashes_are_salted():
+    assert hash_password("same") != hash_password("same")
+
+
+def test_outdated_cost_needs_rehash():
+    stored = hash_password("pw", n=2 ** 10)
+    assert verify_password(stored, "pw") == (True, True)
+
+
+def test_plaintext_record_is_checked_and_flagged():
+    assert verify_password("secret", "secret") == (True, True)
+    assert verify_password("secret", "Secret")[0] is False
+
+
+def test_login_migrates_plaintext_password(store):
+    add_user(store, "ann", "secret")
+    assert check_login(store, "ann", "secret")
+    stored = store.load()["ann"]["password"]
+    assert is_hashed(stored)
+    assert verify_password(stored, "secret") == (True, False)
+    # Logging in again works against the hash and leaves it alone
+    assert check_login(store, "ann", "secret")
+    assert store.load()["ann"]["password"] == stored
+
+
+def test_login_rehashes_outdated_cost(store):
+    add_user(store, "ann", hash_password("pw", n=2 ** 10))
+    assert check_login(store, "ann", "pw")
+    assert store.load()["ann"]["password"].split("$")[1] == str(SCRYPT_N)
+
+
+def test_wrong_password_leaves_plaintext_record_unmigrated(store):
+    add_user(store, "ann", "secret")
+    assert not check_login(store, "ann", "guess")
+    assert store.load()["ann"]["password"] == "secret"
+
+
+def test_unknown_user_is_rejected(store):
+    assert not check_login(store, "nobody", "secret")
+
+
+def test_migration_skips_a_password_changed_meanwhile(store, monkeypatch):
+    add_user(store, "ann", "secret")
+    real_hash = passwords.hash_password_pooled
+
+    def change_during_hash(password):
+        # Another replica sets a new password while this login is hashing
+        add_user(store, "ann", "changed")
+        return real_hash(password)
+
+    monkeypatch.setattr(passwords, "hash_password_pooled", change_during_hash)
+    assert check_login(store, "ann", "secret")
+    assert store.load()["ann"]["password"] == "changed"
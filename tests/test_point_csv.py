@@ -0,0 +1,84 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from point_csv import detect_columns, format_point_summary, grid_nearest_neighbors, summarize_points
+
+
+def brute_force(x, y):
+    d = np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+    np.fill_diagonal(d, np.inf)
+    return d.min(axis=1)
+
+
+@pytest.mark.parametrize("layout", ["uniform", "clustered", "duplicates", "outliers"])
+def test_grid_search_matches_brute_force(layout):
+    rng = np.random.default_rng(7)
+    n = 2000
+    x, y = rng.random(n) * 1000, rng.random(n) * 1000
+    if layout == "clustered":
+        centers = rng.random((5, 2)) * 1000
+        pick = rng.integers(0, 5, n)
+        x, y = centers[pick, 0] + rng.normal(0, 2, n), centers[pick, 1] + rng.normal(0, 2, n)
+    elif layout == "duplicates":
+        x[:300], y[:300] = x[300:600], y[300:600]
+    elif layout == "outliers":
+        x[:10], y[:10] = rng.random(10) * 1e7, rng.random(10) * 1e7
+    idx, dist = grid_nearest_neighbors(x, y)
+    np.testing.assert_allclose(dist, brute_force(x, y))
+    assert (idx != np.arange(n)).all()
+    np.testing.assert_allclose(np.hypot(x[idx] - x, y[idx] - y), dist)
+
+
+def test_grid_search_handles_tiny_inputs():
+    assert grid_nearest_neighbors(np.array([1.0]), np.array([2.0]))[0].tolist() == [-1]
+    idx, dist = grid_nearest_neighbors(np.array([0.0, 3.0]), np.array([0.0, 4.0]))
+    assert idx.tolist() == [1, 0] and dist.tolist() == [5.0, 5.0]
+
+
+def test_detect_columns():
+    assert detect_columns(["id", " Latitude", "LNG"]) == (" Latitude", "LNG")
+    with pytest.raises(ValueError):
+        detect_columns(["a", "b"])
+
+
+def csv_file(lat, lon, extra_rows=""):
+    text = pd.DataFrame({"name": range(len(lat)), "lat": lat, "lon": lon}).to_csv(index=False)
+    return io.StringIO(text + extra_rows)
+
+
+def test_extent_centroid_and_invalid_rows():
+    source = csv_file([10.0, 20.0, 10.0, 20.0], [-5.0, -5.0, 5.0, 5.0], "9,abc,1\n10,95,1\n11,,\n")
+    summary = summarize_points(source, chunk_rows=2)
+    assert summary["rows"] == 7 and summary["valid_points"] == 4
+    assert summary["extent"] == {"min_lat": 10.0, "min_lon": -5.0, "max_lat": 20.0, "max_lon": 5.0}
+    # Spherical mean: symmetric in longitude, slightly poleward of the plain mean latitude
+    assert summary["centroid"]["lon"] == pytest.approx(0.0, abs=1e-9)
+    assert 15.0 < summary["centroid"]["lat"] < 15.2
+
+
+def test_centroid_across_the_antimeridian():
+    summary = summarize_points(csv_file([0.0, 0.0], [179.0, -179.0]))
+    assert abs(summary["centroid"]["lon"]) == pytest.approx(180.0)
+
+
+def test_file_without_valid_points():
+    summary = summarize_points(io.StringIO("lat,lon\nx,y\n"))
+    assert summary["valid_points"] == 0 and summary["nearest_neighbor_m"] is None
+
+
+def test_nearest_neighbors_cover_every_point_and_estimates_are_scaled():
+    rng = np.random.default_rng(3)
+    n = 20000
+    source = csv_file(48 + rng.random(n) * 0.2, 2 + rng.random(n) * 0.2)
+    exact = summarize_points(source)["nearest_neighbor_m"]
+    assert exact["points"] == n and not exact["estimated"]
+    sampled = summarize_points(source, sample_size=2000, nn_max_points=5000)
+    estimated = sampled["nearest_neighbor_m"]
+    assert estimated["points"] == 2000 and estimated["estimated"]
+    # Unscaled, sample distances would be about sqrt(10) times too long
+    assert estimated["mean"] == pytest.approx(exact["mean"], rel=0.1)
+    assert estimated["clark_evans_ratio"] == pytest.approx(exact["clark_evans_ratio"], rel=0.1)
+    assert "estimated from 2000 sampled points" in format_point_summary("p.csv", sampled)
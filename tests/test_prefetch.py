@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+import prefetch
+from prefetch import Prefetcher
+
+
+@pytest.fixture(autouse=True)
+def no_event_log(monkeypatch):
+    monkeypatch.setattr(prefetch, "log_event", lambda *args, **kwargs: None)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+def answer(question):
+    return f"answer to {question}", 10
+
+
+def test_prefetched_answer_is_a_hit():
+    prefetcher = Prefetcher()
+    prefetcher.schedule("s1", ["q1"], answer)
+    wait_for(lambda: prefetcher.metrics()["prefetched"] == 1)
+    assert prefetcher.take("s1", "q1") == ("answer to q1", 10)
+    assert prefetcher.take("s1", "q1") is None
+    metrics = prefetcher.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["used_tokens"]) == (1, 1, 10)
+    assert metrics["hit_rate"] == 0.5
+
+
+def test_worker_yields_to_foreground_requests():
+    prefetcher = Prefetcher()
+    started = threading.Event()
+
+    def tracked(question):
+        started.set()
+        return answer(question)
+
+    with prefetcher.foreground():
+        prefetcher.schedule("s1", ["q1"], tracked)
+        assert not started.wait(0.3)
+    assert started.wait(5.0)
+    assert prefetcher.take("s1", "q1") == ("answer to q1", 10)
+
+
+def test_questions_asked_while_still_queued_are_misses():
+    prefetcher = Prefetcher()
+    with prefetcher.foreground():
+        prefetcher.schedule("s1", ["q1"], answer)
+        assert prefetcher.take("s1", "q1") is None
+    metrics = prefetcher.metrics()
+    assert (metrics["misses"], metrics["dropped"], metrics["prefetched"]) == (1, 1, 0)
+
+
+def test_rate_limit_holds_back_jobs_beyond_the_burst():
+    prefetcher = Prefetcher(rate_per_minute=1)
+    questions = [f"q{i}" for i in range(prefetch.PREFETCH_BURST + 2)]
+    prefetcher.schedule("s1", questions, answer)
+    wait_for(lambda: prefetcher.metrics()["prefetched"] == prefetch.PREFETCH_BURST)
+    time.sleep(0.3)
+    assert prefetcher.metrics()["prefetched"] == prefetch.PREFETCH_BURST
+    assert prefetcher.take("s1", questions[0]) is not None
+    assert prefetcher.take("s1", questions[-1]) is None
+
+
+def test_rescheduling_discards_unused_answers_as_waste():
+    prefetcher = Prefetcher()
+    prefetcher.schedule("s1", ["q1"], answer)
+    wait_for(lambda: prefetcher.metrics()["prefetched"] == 1)
+    prefetcher.schedule("s1", [], answer)
+    assert prefetcher.take("s1", "q1") is None
+    assert prefetcher.metrics()["wasted_tokens"] == 10
+
+
+def test_ready_answers_expire_on_lookup_without_new_jobs():
+    prefetcher = Prefetcher(ttl=0.2)
+    prefetcher.schedule("s1", ["q1"], answer)
+    prefetcher.schedule("s2", ["q2"], answer)
+    wait_for(lambda: prefetcher.metrics()["prefetched"] == 2)
+    time.sleep(0.3)
+    # Nothing new is queued, so only the lookup itself can notice the age
+    assert prefetcher.take("s1", "q1") is None
+    metrics = prefetcher.metrics()
+    assert metrics["wasted_tokens"] == 20
+    assert metrics["hits"] == 0
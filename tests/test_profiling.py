@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+
+import pytest
+
+import profiling
+from profiling import RerunProfile, hot_frames, profile_mode, profiled, slowest_reruns, start_rerun_profile
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch):
+    # PROFILE_DIR is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(profiling, "PROFILE_MODE", "sample")
+    monkeypatch.setattr(profiling, "SAMPLE_INTERVAL", 0.001)
+    yield tmp_path / profiling.PROFILE_DIR
+    profiling._sessions.clear()
+    profiling._active.profile = None
+
+
+@profiled("work")
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_profile_mode_needs_a_valid_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_MODE", "")
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    assert profile_mode() is None
+    assert profile_mode("wrong") is None
+    assert profile_mode("s3cret") == "sample"
+    assert profile_mode("s3cret", "cprofile") == "cprofile"
+
+
+def test_start_and_stop_save_a_profile(profile_dir):
+    profile = start_rerun_profile(root_file=__file__, session_id="s1")
+    busy(0.05)
+    summary = profile.stop(user="ann")
+    assert summary["ended_by"] is None and summary["user"] == "ann"
+    assert summary["spans"]["work"] >= 0.05
+    assert summary["samples"] > 0
+    assert os.path.exists(profile_dir / f"{summary['id']}.folded")
+    assert slowest_reruns(directory=str(profile_dir))[0]["id"] == summary["id"]
+    frames = [frame["function"] for frame in hot_frames(summary["id"], directory=str(profile_dir))]
+    assert any(frame.startswith("busy ") for frame in frames)
+    # Stopping twice saves nothing more
+    assert profile.stop() is None
+    assert profiling._sessions == {}
+
+
+def test_disabled_profiling_starts_nothing(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_MODE", "")
+    assert start_rerun_profile(session_id="s1") is None
+
+
+def test_run_left_on_another_thread_is_closed_out_by_the_next_run(profile_dir):
+    # A rerun torn down before its profile was stopped, as Streamlit serves
+    # the next rerun from a new thread
+    def torn_down_run():
+        start_rerun_profile(root_file=__file__, session_id="s1")
+        busy(0.03)
+
+    thread = threading.Thread(target=torn_down_run)
+    thread.start()
+    thread.join()
+    abandoned = profiling._sessions["s1"]
+
+    profile = start_rerun_profile(root_file=__file__, session_id="s1")
+    assert abandoned.stopped
+    assert profiling._sessions["s1"] is profile
+    summaries = slowest_reruns(directory=str(profile_dir))
+    assert [summary["ended_by"] for summary in summaries] == ["abandoned"]
+    # Measured to its last sample, not until the next run started
+    assert summaries[0]["seconds"] < 0.5
+    profile.stop()
+
+
+def test_other_sessions_are_left_running():
+    other = start_rerun_profile(session_id="s2")
+    start_rerun_profile(session_id="s1").stop()
+    assert not other.stopped
+    other.stop()
+
+
+def test_stop_records_the_exception_ending_the_run():
+    profile = RerunProfile("sample").start()
+    try:
+        raise KeyboardInterrupt
+    except KeyboardInterrupt:
+        summary = profile.stop()
+    assert summary["ended_by"] == "KeyboardInterrupt"
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+import advisor
+from advisor import RateLimiter, _limiter_hook, make_client
+
+
+class FakeTime:
+    """Stands in for the time module in advisor: sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(advisor, "time", fake)
+    return fake
+
+
+def test_burst_then_one_token_per_interval(clock):
+    limiter = RateLimiter(rate=60, burst=3)
+    assert [limiter.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.try_acquire() == pytest.approx(1.0)
+    clock.now += 0.5
+    assert limiter.try_acquire() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert limiter.try_acquire() == 0.0
+
+
+def test_tokens_do_not_accumulate_past_burst(clock):
+    limiter = RateLimiter(rate=120, burst=2)
+    clock.now += 3600
+    assert [limiter.try_acquire() for _ in range(3)] == [0.0, 0.0, pytest.approx(0.5)]
+
+
+def test_acquire_sleeps_until_a_token_is_free(clock):
+    limiter = RateLimiter(rate=30)
+    for _ in range(4):
+        limiter.acquire()
+    assert clock.sleeps == [pytest.approx(2.0)] * 3
+    assert clock.now == pytest.approx(1006.0)
+
+
+def test_concurrent_callers_never_exceed_the_rate(clock):
+    limiter = RateLimiter(rate=600, burst=5)
+    granted = []
+    lock = threading.Lock()
+
+    def take():
+        for _ in range(50):
+            if limiter.try_acquire() == 0.0:
+                with lock:
+                    granted.append(1)
+
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # The clock never moved, so only the burst was available
+    assert len(granted) == 5
+
+
+def test_client_hooks_take_a_token_per_request(clock):
+    limiter = RateLimiter(rate=60, burst=1)
+    hook = _limiter_hook(limiter, async_client=False)
+    request = httpx.Request("POST", "https://api.example/v1/chat/completions")
+    hook(request)
+    hook(request)
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+    client = make_client(api_key="test", limiter=limiter)
+    assert len(client._client.event_hooks["request"]) == 1
+
+
+def test_async_hook_waits_without_blocking(clock, monkeypatch):
+    limiter = RateLimiter(rate=60, burst=1)
+    waits = []
+
+    async def fake_sleep(seconds):
+        waits.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(advisor.asyncio, "sleep", fake_sleep)
+    hook = _limiter_hook(limiter, async_client=True)
+    request = httpx.Request("POST", "https://api.example/v1/chat/completions")
+
+    async def run():
+        await hook(request)
+        await hook(request)
+
+    asyncio.run(run())
+    assert waits == [pytest.approx(1.0)]
+    assert clock.sleeps == []
@@ -0,0 +1,107 @@
+import os
+import stat
+
+import pytest
+
+import session_manager
+from session_manager import SessionManager, private_dir
+
+
+@pytest.fixture
+def manager(tmp_path):
+    woken = []
+    manager = SessionManager(spooled_keys=("chat_history", "attachments"), dropped_keys=("user_database",),
+                             ttl=60, spool_dir=str(tmp_path / "spool"), wake=woken.append)
+    manager.woken = woken
+    return manager
+
+
+def new_state():
+    return {"chat_history": [{"user": "q", "assistant": "a"}], "attachments": {"a.csv": b"x,y\n1,2\n"},
+            "user_database": {"ann": {}}, "page": "chat"}
+
+
+def test_default_spool_dir_is_private_and_unpredictable():
+    first, second = private_dir(), private_dir()
+    assert first != second
+    for path in (first, second):
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o700
+
+
+def test_shared_spool_dir_is_refused(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    with pytest.raises(PermissionError):
+        private_dir(str(shared))
+    target = tmp_path / "target"
+    target.mkdir(mode=0o700)
+    os.symlink(target, tmp_path / "link")
+    with pytest.raises(PermissionError):
+        private_dir(str(tmp_path / "link"))
+
+
+def test_sweep_only_marks_idle_sessions_and_wakes_them(manager):
+    idle_state = new_state()
+    manager.touch("idle", idle_state)
+    manager.touch("active", new_state())
+    manager.sessions["idle"]["last_seen"] -= 30
+    manager.sweep(now=manager.sessions["active"]["last_seen"] + 45)
+    assert manager.woken == ["idle"]
+    # Nothing is taken from the session until its own run ends
+    assert idle_state == new_state()
+    assert manager.sessions["idle"]["state"] is None
+    assert manager.sessions["active"]["state"] is not None
+    assert manager.metrics()["evicting_sessions"] == 1
+    # Sweeping again does not wake it twice
+    manager.sweep(now=manager.sessions["active"]["last_seen"] + 50)
+    assert manager.woken == ["idle"]
+
+
+def test_eviction_run_spools_and_next_run_restores(manager):
+    state = new_state()
+    manager.touch("s1", state)
+    last_seen = manager.sessions["s1"]["last_seen"]
+    manager.sweep(now=last_seen + 61)
+
+    # The run requested by wake() spools the state at its end
+    assert not manager.touch("s1", state)
+    assert manager.sessions["s1"]["last_seen"] == last_seen
+    assert manager.finish_run("s1")
+    assert state == {"page": "chat"}
+    spool = os.path.join(manager.spool_dir, "s1.pickle")
+    assert stat.S_IMODE(os.stat(spool).st_mode) == 0o600
+    assert manager.metrics()["offloaded_sessions"] == 1
+    assert manager.sessions["s1"]["state"] is None
+
+    # The next run is the user coming back
+    assert manager.touch("s1", state)
+    assert state["chat_history"] == new_state()["chat_history"]
+    assert state["attachments"] == new_state()["attachments"]
+    # Dropped keys are rebuilt by the app, not restored
+    assert "user_database" not in state
+    assert not os.path.exists(spool)
+    assert not manager.finish_run("s1")
+    assert manager.stats["offloaded"] == manager.stats["restored"] == 1
+
+
+def test_ordinary_runs_do_not_offload(manager):
+    state = new_state()
+    manager.touch("s1", state)
+    assert not manager.finish_run("s1")
+    assert not manager.finish_run("unknown")
+    assert state == new_state()
+
+
+def test_long_abandoned_sessions_are_forgotten(manager):
+    state = new_state()
+    manager.touch("s1", state)
+    manager.sweep(now=manager.sessions["s1"]["last_seen"] + 61)
+    manager.touch("s1", state)
+    manager.finish_run("s1")
+    manager.touch("s2", new_state())
+    manager.sweep(now=manager.sessions["s2"]["last_seen"] + 61)
+    # s2 never ran again: its marked entry goes too, without holding its state
+    manager.sweep(now=manager.sessions["s1"]["last_seen"] + session_manager.SPOOL_MAX_AGE + 1)
+    assert manager.sessions == {}
+    assert os.listdir(manager.spool_dir) == []
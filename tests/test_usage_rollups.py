@@ -0,0 +1,87 @@
+import logging
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from usage_rollups import RollupHandler, UsageRollups
+
+
+def event(name, created, **fields):
+    return logging.makeLogRecord({"msg": name, "created": created.timestamp(), "fields": fields})
+
+
+def rows(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("""
+            SELECT period, bucket, username, model, requests, errors, tokens, latency_ms_sum, latency_ms_max
+            FROM usage ORDER BY period, bucket, username, model
+        """).fetchall()
+
+
+@pytest.fixture
+def rollups(tmp_path):
+    return UsageRollups(str(tmp_path / "usage.db"))
+
+
+def test_handler_upserts_hourly_and_daily_rows(rollups):
+    handler = RollupHandler(rollups)
+    handler.handle(event("chat_response", datetime(2025, 1, 31, 14, 5, tzinfo=timezone.utc),
+                         username="ana", model="m1", tokens=100, ms=250.0))
+    handler.handle(event("chat_response", datetime(2025, 1, 31, 14, 55, tzinfo=timezone.utc),
+                         username="ana", model="m1", tokens=40, ms=900.0))
+    handler.handle(event("chat_error", datetime(2025, 1, 31, 15, 1, tzinfo=timezone.utc),
+                         username="ana", model="m1", ms=5000.0))
+    handler.handle(event("chat_response", datetime(2025, 1, 31, 15, 30, tzinfo=timezone.utc),
+                         username="bo", model="m2", tokens=7, ms=80.0))
+    assert rows(rollups.path) == [
+        ("day", "2025-01-31", "ana", "m1", 3, 1, 140, 1150.0, 900.0),
+        ("day", "2025-01-31", "bo", "m2", 1, 0, 7, 80.0, 80.0),
+        ("hour", "2025-01-31T14", "ana", "m1", 2, 0, 140, 1150.0, 900.0),
+        ("hour", "2025-01-31T15", "ana", "m1", 1, 1, 0, 0.0, 0.0),
+        ("hour", "2025-01-31T15", "bo", "m2", 1, 0, 7, 80.0, 80.0),
+    ]
+
+
+def test_handler_ignores_other_events(rollups):
+    handler = RollupHandler(rollups)
+    handler.handle(event("cache", datetime.now(timezone.utc), cache="prefetch", hit=True))
+    handler.handle(event("login", datetime.now(timezone.utc), username="ana"))
+    assert rows(rollups.path) == []
+
+
+def test_missing_fields_are_counted_under_empty_keys(rollups):
+    RollupHandler(rollups).handle(event("chat_response", datetime(2025, 2, 1, tzinfo=timezone.utc)))
+    assert ("day", "2025-02-01", "", "", 1, 0, 0, 0.0, 0.0) in rows(rollups.path)
+
+
+def test_old_hourly_rows_are_pruned_but_daily_rows_kept(rollups):
+    handler = RollupHandler(rollups)
+    handler.handle(event("chat_response", datetime(2025, 1, 1, 12, tzinfo=timezone.utc), username="ana", model="m1"))
+    handler.handle(event("chat_response", datetime(2025, 2, 1, 12, tzinfo=timezone.utc), username="ana", model="m1"))
+    assert [row[:2] for row in rows(rollups.path)] == [
+        ("day", "2025-01-01"), ("day", "2025-02-01"), ("hour", "2025-02-01T12"),
+    ]
+
+
+def test_reports_average_latency_over_successful_requests(rollups):
+    handler = RollupHandler(rollups)
+    now = datetime.now(timezone.utc)
+    handler.handle(event("chat_response", now, username="ana", model="m1", tokens=10, ms=100.0))
+    handler.handle(event("chat_response", now, username="ana", model="m2", tokens=20, ms=300.0))
+    handler.handle(event("chat_error", now, username="bo", model="m2"))
+    assert rollups.by_user() == [
+        {"username": "ana", "requests": 2, "errors": 0, "tokens": 30, "avg_latency_ms": 200.0, "max_latency_ms": 300.0},
+        {"username": "bo", "requests": 1, "errors": 1, "tokens": 0, "avg_latency_ms": None, "max_latency_ms": 0.0},
+    ]
+    by_model = [(row["model"], row["requests"], row["errors"]) for row in rollups.by_model()]
+    assert by_model == [("m1", 1, 0), ("m2", 2, 1)]
+    assert [row["requests"] for row in rollups.hourly()] == [3]
+    assert [row["bucket"] for row in rollups.daily()] == [now.strftime("%Y-%m-%d")]
+
+
+def test_rollups_are_shared_between_connections(rollups):
+    when = datetime(2025, 3, 1, 9, tzinfo=timezone.utc)
+    RollupHandler(rollups).handle(event("chat_response", when, username="ana", model="m1", tokens=1))
+    RollupHandler(UsageRollups(rollups.path)).handle(event("chat_response", when, username="ana", model="m1", tokens=2))
+    assert ("day", "2025-03-01", "ana", "m1", 2, 0, 3, 0.0, 0.0) in rows(rollups.path)
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from user_store import UserStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UserStore(str(tmp_path / "user_data.json"))
+
+
+def set_key(key, value):
+    def mutate(data):
+        data[key] = value
+        return value
+    return mutate
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_update_persists_and_returns_result(store):
+    assert store.update(set_key("ann", {"password": "x"})) == {"password": "x"}
+    assert UserStore(store.path).load() == {"ann": {"password": "x"}}
+    assert store.snapshot() == {"ann": {"password": "x"}}
+
+
+def test_updates_queued_during_a_commit_share_the_next_one(store):
+    in_commit, release = threading.Event(), threading.Event()
+
+    def slow(data):
+        in_commit.set()
+        release.wait()
+        data["first"] = True
+
+    leader = threading.Thread(target=store.update, args=(slow,))
+    leader.start()
+    in_commit.wait()
+    writers = [threading.Thread(target=store.update, args=(set_key(f"user{i}", i),)) for i in range(8)]
+    for writer in writers:
+        writer.start()
+    wait_for(lambda: len(store._pending) == 8)
+    release.set()
+    for thread in [leader, *writers]:
+        thread.join()
+
+    assert store.stats == {"updates": 9, "commits": 2}
+    data = store.load()
+    assert data["first"] is True
+    assert all(data[f"user{i}"] == i for i in range(8))
+
+
+def test_failed_update_raises_for_its_caller_only(store):
+    in_commit, release = threading.Event(), threading.Event()
+    results = {}
+
+    def hold(data):
+        in_commit.set()
+        release.wait()
+
+    def fail(data):
+        raise ValueError("username taken")
+
+    def run(name, mutate):
+        try:
+            results[name] = store.update(mutate)
+        except Exception as e:
+            results[name] = e
+
+    leader = threading.Thread(target=store.update, args=(hold,))
+    leader.start()
+    in_commit.wait()
+    # Queued behind the leader, so both land in the same batch
+    threads = [threading.Thread(target=run, args=("bad", fail)),
+               threading.Thread(target=run, args=("good", set_key("bob", 1)))]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: len(store._pending) == 2)
+    release.set()
+    for thread in [leader, *threads]:
+        thread.join()
+
+    assert isinstance(results["bad"], ValueError)
+    assert results["good"] == 1
+    assert store.load() == {"bob": 1}
+    assert store.stats["commits"] == 2
+
+
+def test_failed_write_fails_the_whole_batch_and_keeps_the_file(store, monkeypatch):
+    store.update(set_key("ann", 1))
+
+    def broken_write(data):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "_write", broken_write)
+    with pytest.raises(OSError):
+        store.update(set_key("bob", 2))
+    assert store.load() == {"ann": 1}
+    monkeypatch.undo()
+    # The store keeps working once writes succeed again
+    store.update(set_key("bob", 2))
+    assert store.load() == {"ann": 1, "bob": 2}
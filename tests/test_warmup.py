@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import chat_store
+from user_store import UserStore
+from warmup import FAILED, READY, Warmup
+
+
+class GatedModels:
+    """Stands in for client.models: list() blocks until the test opens the gate"""
+
+    def __init__(self, error=None):
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+        self.error = error
+
+    def list(self):
+        self.entered.set()
+        assert self.gate.wait(5.0)
+        if self.error:
+            raise self.error
+
+
+class FakeClient:
+    def __init__(self, models):
+        self.models = models
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat_store, "CHAT_DATA_DIR", str(tmp_path / "chat_data"))
+    chat_store.append_turns("ann", "t1", [{"user": "q", "assistant": "a", "timestamp": "1"}])
+    store = UserStore(str(tmp_path / "user_data.json"))
+    store.update(lambda data: data.update(ann={"threads": {"t1": {"title": "T", "updated_at": "1", "turns": 1}}}))
+    return store
+
+
+def test_ready_turns_from_503_to_200_when_warmup_finishes(store, monkeypatch):
+    models = GatedModels()
+    warmup = Warmup(store, client_factory=lambda: FakeClient(models), probe=False)
+    monkeypatch.setattr(api, "warmup", warmup)
+    client = TestClient(api.app)
+
+    assert client.get("/ready").status_code == 503
+    warmup.start()
+    assert models.entered.wait(5.0)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "running"
+    assert [step["name"] for step in response.json()["steps"]] == ["user_data", "storage_indexes", "caches"]
+
+    models.gate.set()
+    deadline = time.monotonic() + 5.0
+    while warmup.status == "running" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == READY
+    assert client.get("/health").status_code == 200
+
+
+def test_optional_step_failure_still_becomes_ready(store):
+    models = GatedModels(error=ConnectionError("provider down"))
+    models.gate.set()
+    warmup = Warmup(store, client_factory=lambda: FakeClient(models), probe=False)
+    assert warmup.run() == READY
+    assert warmup.steps[-1]["error"] == "ConnectionError: provider down"
+    assert warmup.run() == READY
+
+
+def test_required_step_failure_stays_unready(store, monkeypatch):
+    def unreadable():
+        raise OSError("disk gone")
+
+    monkeypatch.setattr(store, "snapshot", unreadable)
+    warmup = Warmup(store, client_factory=None)
+    assert warmup.run() == FAILED
+    assert not warmup.ready
+    assert [step["name"] for step in warmup.steps] == ["user_data"]
@@ -0,0 +1,144 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+USAGE_DB_FILE = os.environ.get("GEOADVISOR_USAGE_DB", "usage.db")
+
+# Hourly rows are kept this many days; daily rows are kept indefinitely
+HOURLY_RETENTION_DAYS = 14
+
+# Events folded into the rollups
+ROLLUP_EVENTS = ("chat_response", "chat_error")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    period TEXT NOT NULL,          -- 'hour' or 'day'
+    bucket TEXT NOT NULL,          -- UTC start of the period, e.g. 2025-01-31T14 or 2025-01-31
+    username TEXT NOT NULL,
+    model TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms_sum REAL NOT NULL DEFAULT 0,
+    latency_ms_max REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, bucket, username, model)
+) WITHOUT ROWID;
+"""
+
+_UPSERT = """
+INSERT INTO usage (period, bucket, username, model, requests, errors, tokens, latency_ms_sum, latency_ms_max)
+VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+ON CONFLICT (period, bucket, username, model) DO UPDATE SET
+    requests = requests + 1,
+    errors = errors + excluded.errors,
+    tokens = tokens + excluded.tokens,
+    latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum,
+    latency_ms_max = max(latency_ms_max, excluded.latency_ms_max)
+"""
+
+
+class UsageRollups:
+    """Requests, errors, tokens and latency per user, model and hour/day in SQLite
+
+    Each answered or failed request updates one hourly and one daily row,
+    so reports read a bounded number of summary rows no matter how much
+    chat history exists. Several processes may write the same database.
+    """
+
+    def __init__(self, path=USAGE_DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = None
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self):
+        # sqlite3 connections belong to the thread that opened them
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            # WAL stays consistent without a fsync per commit
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def record(self, username, model, tokens=0, latency_ms=0.0, error=False, when=None):
+        """Count one request in its hourly and daily rows"""
+        when = when or datetime.now(timezone.utc)
+        values = (username or "", model or "", int(bool(error)), tokens or 0, latency_ms or 0.0, latency_ms or 0.0)
+        with self._connect() as db:
+            db.execute(_UPSERT, ("hour", when.strftime("%Y-%m-%dT%H"), *values))
+            db.execute(_UPSERT, ("day", when.strftime("%Y-%m-%d"), *values))
+            today = when.date()
+            if self._last_prune != today:
+                cutoff = (when - timedelta(days=HOURLY_RETENTION_DAYS)).strftime("%Y-%m-%dT%H")
+                db.execute("DELETE FROM usage WHERE period = 'hour' AND bucket < ?", (cutoff,))
+                self._last_prune = today
+
+    def _totals(self, group_by, period, since):
+        rows = self._connect().execute(f"""
+            SELECT {group_by}, SUM(requests), SUM(errors), SUM(tokens), SUM(latency_ms_sum), MAX(latency_ms_max)
+            FROM usage WHERE period = ? AND bucket >= ?
+            GROUP BY {group_by} ORDER BY {group_by}
+        """, (period, since)).fetchall()
+        return [
+            {
+                group_by: key, "requests": requests, "errors": errors, "tokens": tokens,
+                # Failed requests carry no latency
+                "avg_latency_ms": round(latency_sum / (requests - errors), 1) if requests > errors else None,
+                "max_latency_ms": round(latency_max, 1),
+            }
+            for key, requests, errors, tokens, latency_sum, latency_max in rows
+        ]
+
+    def by_user(self, days=7):
+        """Totals per user over the last days (today included)"""
+        return self._totals("username", "day", self._day_since(days))
+
+    def by_model(self, days=7):
+        """Totals per model over the last days (today included)"""
+        return self._totals("model", "day", self._day_since(days))
+
+    def daily(self, days=30):
+        """Totals per day, oldest first"""
+        return self._totals("bucket", "day", self._day_since(days))
+
+    def hourly(self, hours=48):
+        """Totals per hour, oldest first; hours older than HOURLY_RETENTION_DAYS are gone"""
+        since = (datetime.now(timezone.utc) - timedelta(hours=hours - 1)).strftime("%Y-%m-%dT%H")
+        return self._totals("bucket", "hour", since)
+
+    @staticmethod
+    def _day_since(days):
+        return (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+
+
+class RollupHandler(logging.Handler):
+    """Event log handler that folds chat events into the usage rollups
+
+    Added to the event log's background writer, so the rollups are kept
+    current on every request without adding to its latency.
+    """
+
+    def __init__(self, rollups):
+        super().__init__()
+        self.rollups = rollups
+
+    def emit(self, record):
+        if record.msg not in ROLLUP_EVENTS:
+            return
+        fields = getattr(record, "fields", {})
+        error = record.msg == "chat_error"
+        try:
+            self.rollups.record(
+                fields.get("username"),
+                fields.get("model"),
+                tokens=fields.get("tokens", 0),
+                latency_ms=0.0 if error else fields.get("ms", 0.0),
+                error=error,
+                when=datetime.fromtimestamp(record.created, timezone.utc),
+            )
+        except Exception:
+            self.handleError(record)
@@ -0,0 +1,124 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from event_log import log_event
+
+DEFAULT_USER_DATA_FILE = "user_data.json"
+
+
+@contextmanager
+def file_lock(path, exclusive=True):
+    """Hold an advisory flock on path for the duration of the block"""
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _fsync_dir(path):
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class UserStore:
+    """The user database as one JSON file, safe for concurrent writers across processes
+
+    Every update re-reads the file under an exclusive lock, applies its
+    change and atomically renames a fsynced copy into place, so no replica
+    can overwrite another's changes with a stale copy. Updates that arrive
+    while a commit is in flight are queued and applied together by the next
+    commit (group commit), sharing one read, one write and one fsync.
+    """
+
+    def __init__(self, path=DEFAULT_USER_DATA_FILE):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.stats = {"updates": 0, "commits": 0}
+        self._snapshot = (None, {})
+        self._pending = []
+        self._committing = False
+        self._cond = threading.Condition()
+
+    def load(self):
+        """Read the current database; renames are atomic, so no lock is needed"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def snapshot(self):
+        """The database as last read, re-read only after the file has been replaced; do not mutate"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return {}
+        # Every commit renames a new file into place, so the inode changes
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached_key, data = self._snapshot
+        if cached_key != key:
+            data = self.load()
+            self._snapshot = (key, data)
+        return data
+
+    def _write(self, data):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        _fsync_dir(self.path)
+
+    def _commit(self, batch):
+        started = time.perf_counter()
+        try:
+            with file_lock(self.lock_path):
+                data = self.load()
+                for slot in batch:
+                    # Mutators validate before changing anything, so a failed
+                    # one leaves the rest of the batch unaffected
+                    try:
+                        slot["result"] = slot["mutate"](data)
+                    except Exception as e:
+                        slot["error"] = e
+                self._write(data)
+        except Exception as e:
+            for slot in batch:
+                slot.setdefault("error", e)
+        self.stats["updates"] += len(batch)
+        self.stats["commits"] += 1
+        log_event("storage_write", store="users", updates=len(batch),
+                  errors=sum("error" in slot for slot in batch), ms=round((time.perf_counter() - started) * 1000, 3))
+
+    def update(self, mutate):
+        """Apply mutate(data) to the freshest database, persist it and return mutate's result"""
+        slot = {"mutate": mutate}
+        with self._cond:
+            self._pending.append(slot)
+            while "result" not in slot and "error" not in slot:
+                if self._committing:
+                    self._cond.wait()
+                    continue
+                # Lead a commit of everything queued so far, including our own update
+                self._committing = True
+                batch, self._pending = self._pending, []
+                self._cond.release()
+                try:
+                    self._commit(batch)
+                finally:
+                    self._cond.acquire()
+                    self._committing = False
+                    self._cond.notify_all()
+        if "error" in slot:
+            raise slot["error"]
+        return slot["result"]
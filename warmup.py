@@ -0,0 +1,129 @@
+import logging
+import os
+import threading
+import time
+
+import chat_store
+from advisor import DEFAULT_MODEL, build_context, make_client
+from crs_catalog import answer_crs_question
+from event_log import log_event
+from history_search import tokenize
+
+# Threads, most recently updated first, whose storage indexes are preloaded
+WARMUP_THREADS = int(os.environ.get("GEOADVISOR_WARMUP_THREADS", 200))
+
+# Set GEOADVISOR_WARMUP_PROBE=1 to send a one-token completion during warm-up
+WARMUP_PROBE = os.environ.get("GEOADVISOR_WARMUP_PROBE") == "1"
+
+PENDING, RUNNING, READY, FAILED = "pending", "running", "ready", "failed"
+
+
+def _load_users(store):
+    store.snapshot()
+
+
+def _load_storage_indexes(store):
+    # Line offsets and cold block indexes of the threads most likely to be opened next
+    threads = [
+        (thread["updated_at"], username, thread_id)
+        for username, record in store.snapshot().items()
+        for thread_id, thread in record.get("threads", {}).items()
+    ]
+    for _, username, thread_id in sorted(threads, reverse=True)[:WARMUP_THREADS]:
+        chat_store.count_turns(username, thread_id)
+
+
+def _prime_caches(store):
+    answer_crs_question("What is EPSG:4326?")
+    build_context("reproject EPSG:3857 to EPSG:4326")
+    tokenize("warm up the tokenizer")
+
+
+class Warmup:
+    """Runs a process's cold-start work once and reports when it is done
+
+    Steps run in order and are timed. A failed required step leaves the
+    process not ready; optional steps, which depend on the model provider,
+    only record their error, so an outage there does not keep an otherwise
+    healthy instance out of rotation. Without a client_factory (no API key
+    configured) the model steps are left out.
+    """
+
+    def __init__(self, store, client_factory=make_client, probe=WARMUP_PROBE):
+        self.store = store
+        self.client_factory = client_factory
+        self.probe = probe
+        self.status = PENDING
+        self.steps = []
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def _open_connection(self, store):
+        # A model listing costs no tokens and leaves a pooled keep-alive connection
+        self.client_factory().models.list()
+
+    def _probe_completion(self, store):
+        self.client_factory().chat.completions.create(
+            model=DEFAULT_MODEL,
+            messages=[{"role": "user", "content": "ping"}],
+            max_tokens=1,
+        )
+
+    def plan(self):
+        """(name, step, required) in run order"""
+        steps = [
+            ("user_data", _load_users, True),
+            ("storage_indexes", _load_storage_indexes, True),
+            ("caches", _prime_caches, True),
+        ]
+        if self.client_factory is None:
+            return steps
+        steps.append(("model_connection", self._open_connection, False))
+        if self.probe:
+            steps.append(("probe_completion", self._probe_completion, False))
+        return steps
+
+    def run(self):
+        """Run every step once; later calls return at once"""
+        with self._lock:
+            if self.status != PENDING:
+                return self.status
+            self.status = RUNNING
+            self.started = time.time()
+        status = READY
+        for name, step, required in self.plan():
+            started = time.perf_counter()
+            result = {"name": name, "required": required}
+            try:
+                step(self.store)
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+                if required:
+                    status = FAILED
+            result["seconds"] = round(time.perf_counter() - started, 4)
+            self.steps.append(result)
+            if status == FAILED:
+                break
+        self.finished = time.time()
+        self.status = status
+        log_event("warmup", level=logging.INFO if status == READY else logging.ERROR, **self.report())
+        return status
+
+    def start(self):
+        """Run the warm-up on a background thread"""
+        threading.Thread(target=self.run, name="warmup", daemon=True).start()
+        return self
+
+    @property
+    def ready(self):
+        return self.status == READY
+
+    def report(self):
+        """Status, total seconds and per-step timings"""
+        end = self.finished or time.time()
+        return {
+            "status": self.status,
+            "seconds": round(end - self.started, 4) if self.started else None,
+            "steps": list(self.steps),
+        }